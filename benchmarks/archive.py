@@ -0,0 +1,60 @@
+"""
+Compares reprocessing an archive of form bodies, one per line, by reading
+the file and parsing each line as bytes, against `formality.archive` parsing
+memoryviews of the mapped file, both in this process and spread over a
+`ProcessPoolExecutor` (without sending the results back).
+
+Usage:
+    python -m benchmarks.archive [records] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from formality import archive, query
+
+
+def main(records=100000, workers=os.cpu_count() or 1):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "archive.txt")
+        with open(path, "wb") as f:
+            for i in range(records):
+                f.write(
+                    f"q=shoes+{i}&page={i % 20}&sort[field]=price&sort[dir]=asc"
+                    f"&filters[0][field]=size&filters[0][value]={i % 13}&ids[]={i}&ids[]={i + 1}\n".encode()
+                )
+        size = os.path.getsize(path)
+
+        def read_lines():
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        query.loads(line.rstrip(b"\n"))
+                    except Exception:
+                        pass
+
+        def mapped():
+            for parsed in archive.parse_archive(path, keep_results=False):
+                pass
+
+        def parallel():
+            with ProcessPoolExecutor(workers) as executor:
+                for parsed in archive.parse_archive(path, executor=executor, keep_results=False):
+                    pass
+
+        print(f"{records} records, {size / 1e6:.1f} MB")
+        for label, func in (
+            ("read lines", read_lines),
+            ("archive", mapped),
+            (f"archive, {workers} processes", parallel),
+        ):
+            began = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - began
+            print(f"{label:<24} {elapsed:>8.3f} s {size / 1e6 / elapsed:>8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,38 @@
+"""
+Compares `formality.query.loads` with and without `batch_coerce`, on the
+inputs it's for (long runs of ids, unique or repeated, and rows of numbers
+and flags), and on one with nothing repeated, for what it costs elsewhere.
+
+Usage:
+    python -m benchmarks.batch [fields] [repeat]
+"""
+import sys
+import timeit
+
+from formality import query
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=5, repeat=repeat)) / 5
+
+
+def main(fields=20000, repeat=5):
+    inputs = (
+        ("unique ids", "&".join(f"ids[]={i}" for i in range(fields))),
+        ("repeated ids", "&".join(f"ids[]={i % 10}" for i in range(fields))),
+        (
+            "rows",
+            "&".join(f"rows[{i % 50}][qty]={i % 7}&rows[{i % 50}][flag]=true" for i in range(fields // 2)),
+        ),
+        ("unique keys", "&".join(f"k{i}=v{i}" for i in range(fields))),
+    )
+    print(f"{fields} fields, best of {repeat}")
+    print(f"{'':<14} {'sequential':>12} {'batch':>12} {'speedup':>8}")
+    for label, qs in inputs:
+        sequential = best(lambda: query.loads(qs, max_num_fields=fields * 3), repeat)
+        batch = best(lambda: query.loads(qs, max_num_fields=fields * 3, batch_coerce=True), repeat)
+        print(f"{label:<14} {sequential * 1000:>9.3f} ms {batch * 1000:>9.3f} ms {sequential / batch:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,38 @@
+"""
+Prints how parse time and peak memory grow for each of the adversarial input
+families in `formality.tests.test_complexity`, as the input gets bigger.
+
+Usage:
+    python -m benchmarks.complexity [max_size]
+"""
+import sys
+
+import formality
+from formality.tests.test_complexity import FAMILIES, measure, parse_or_reject
+
+
+def main(max_size=64000):
+    sizes = []
+    size = 1000
+    while size <= max_size:
+        sizes.append(size)
+        size *= 2
+
+    print(f"{'family':<18} {'size':>8} {'bytes':>10} {'loads ms':>10} {'peak KiB':>10} {'dumps ms':>10}")
+    for name, family in FAMILIES.items():
+        for size in sizes:
+            qs, kwargs = family(size)
+            loads_time, loads_peak = measure(lambda: parse_or_reject(qs, kwargs))
+            data = parse_or_reject(qs, kwargs)
+            if data:
+                dumps_time, _ = measure(lambda: formality.query.dumps(data))
+                dumps_ms = f"{dumps_time * 1000:>10.2f}"
+            else:
+                dumps_ms = f"{'rejected':>10}"
+            print(
+                f"{name:<18} {size:>8} {len(qs):>10} {loads_time * 1000:>10.2f} {loads_peak / 1024:>10.1f} {dumps_ms}"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
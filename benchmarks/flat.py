@@ -0,0 +1,89 @@
+"""
+Compares `formality.flat.loads` against `formality.query.loads` on a search
+form with a growing number of filters: the time to parse it, the memory the
+result keeps and the peak while parsing; then the time to read every value
+under one small prefix (sort) and one large one (filters), with `items`
+against walking the nested dictionaries, which should only depend on the
+size of what's under the prefix rather than of the whole result.
+
+Usage:
+    python -m benchmarks.flat [filters] [repeat]
+"""
+import sys
+import timeit
+import tracemalloc
+
+from formality import flat, query
+
+
+def form(filters):
+    return "&".join(
+        (
+            "q=running+shoes",
+            "page=2",
+            "sort[field]=price",
+            "sort[dir]=asc",
+            *(f"filters[{i}][field]=size&filters[{i}][op]=gte&filters[{i}][value]={i}" for i in range(filters)),
+        )
+    )
+
+
+def walk(data, *prefix):
+    # The equivalent of PathIndex.items on the result of query.loads.
+    for key in prefix:
+        data = data[key]
+    stack = [(prefix, data)]
+    while stack:
+        path, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(((*path, key), value) for key, value in reversed(node.items()))
+        elif isinstance(node, list):
+            stack.extend(((*path, key), value) for key, value in reversed(list(enumerate(node))))
+        else:
+            yield path, node
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=10, repeat=repeat)) / 10
+
+
+def allocated(func):
+    """
+    The memory still held by the result of `func`, and the peak while calling it.
+    """
+    func()
+    tracemalloc.start()
+    try:
+        result = func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained, peak
+
+
+def main(filters=300, repeat=5):
+    for size in (filters, filters * 10):
+        qs = form(size)
+        limit = size * 10
+        parsers = (
+            ("query.loads", lambda: query.loads(qs, max_num_fields=limit)),
+            ("flat.loads", lambda: flat.loads(qs, max_num_fields=limit)),
+        )
+        print(f"{size} filters, best of {repeat}")
+        print(f"{'':<12} {'parse ms':>10} {'kept KiB':>10} {'peak KiB':>10}")
+        for label, parse in parsers:
+            retained, peak = allocated(parse)
+            print(f"{label:<12} {best(parse, repeat) * 1000:>10.3f} {retained / 1024:>10.1f} {peak / 1024:>10.1f}")
+        nested = query.loads(qs, max_num_fields=limit)
+        index = flat.loads(qs, max_num_fields=limit)
+        print(f"{'':<12} {'sort µs':>10} {'filters µs':>10}")
+        for label, scan in (("walk", lambda *prefix: list(walk(nested, *prefix))), ("items", lambda *prefix: list(index.items(*prefix)))):
+            print(
+                f"{label:<12} {best(lambda: scan('sort'), repeat) * 1e6:>10.1f} {best(lambda: scan('filters'), repeat) * 1e6:>10.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,96 @@
+"""
+Compares validating a bulk-edit style submission of `rows` rows with a
+Django formset (bound to the flat, prefixed QueryDict) against a
+`formality.forms.FormSetField` (bound to the nested data `query.loads` gives
+for the same rows), including the parsing each needs, both with and without
+the rows sharing their fields (`copy_fields = False`).
+
+Usage:
+    python -m benchmarks.forms [rows] [runs]
+"""
+import sys
+import timeit
+from functools import partial
+
+import django
+from django.conf import settings
+
+settings.configure(USE_I18N=False, DATA_UPLOAD_MAX_NUMBER_FIELDS=None)
+django.setup()
+
+from django import forms
+from django.http import QueryDict
+
+from formality import query
+from formality.forms import FormSetField, NestedForm
+
+
+class RowForm(forms.Form):
+    name = forms.CharField(max_length=100)
+    quantity = forms.IntegerField(min_value=0)
+    price = forms.DecimalField(max_digits=10, decimal_places=2)
+    active = forms.BooleanField(required=False)
+
+
+class NestedRowForm(NestedForm):
+    copy_fields = False
+
+    name = forms.CharField(max_length=100)
+    quantity = forms.IntegerField(min_value=0)
+    price = forms.DecimalField(max_digits=10, decimal_places=2)
+    active = forms.BooleanField(required=False)
+
+
+def main(rows=300, runs=20):
+    RowFormSet = forms.formset_factory(RowForm, max_num=rows, absolute_max=rows)
+
+    max_num = rows
+
+    class CopiedRowForm(NestedRowForm):
+        copy_fields = True
+
+    class BulkEditForm(NestedForm):
+        rows = FormSetField(NestedRowForm, max_num=max_num)
+
+    class CopiedBulkEditForm(NestedForm):
+        rows = FormSetField(CopiedRowForm, max_num=max_num)
+
+    flat = [
+        ("form-TOTAL_FORMS", str(rows)),
+        ("form-INITIAL_FORMS", "0"),
+    ]
+    nested = []
+    for i in range(rows):
+        for name, value in (
+            ("name", f"item {i}"),
+            ("quantity", str(i)),
+            ("price", f"{i}.99"),
+            ("active", "true"),
+        ):
+            flat.append((f"form-{i}-{name}", value))
+            nested.append((f"rows[{i}][{name}]", value))
+    flat_qs = "&".join(f"{key}={value}" for key, value in flat)
+    nested_qs = "&".join(f"{key}={value}" for key, value in nested)
+
+    def django_formset():
+        formset = RowFormSet(QueryDict(flat_qs))
+        assert formset.is_valid()
+
+    def nested_formset(form_class=BulkEditForm):
+        form = form_class(
+            query.loads(nested_qs, max_depth=3, max_num_fields=rows * 12)
+        )
+        assert form.is_valid()
+
+    print(f"{rows} rows, best of {runs}")
+    for label, func in (
+        ("django formset", django_formset),
+        ("FormSetField", partial(nested_formset, CopiedBulkEditForm)),
+        ("+ copy_fields=False", nested_formset),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=runs))
+        print(f"{label:<22} {best * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,58 @@
+"""
+Measures how long a cold `import formality.query` takes in a fresh
+interpreter, compared to importing Django's exceptions (which it used to
+require), so that short-lived workers keep starting quickly.
+
+Each import is timed in its own subprocess, since anything already in
+`sys.modules` would make the second one free.
+
+Usage:
+    python -m benchmarks.import_time [runs]
+"""
+import subprocess
+import sys
+
+STATEMENTS = {
+    "interpreter": "pass",
+    "formality": "import formality",
+    "formality.query": "import formality.query",
+    "formality.flat": "import formality.flat",
+    "formality.http": "import formality.http",
+    "django.core.exceptions": "import django.core.exceptions",
+    "formality.views": "import formality.views",
+}
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, sum(1 for name in sys.modules if name.split('.')[0] == 'django'))
+"""
+
+
+def cold_import(statement):
+    output = subprocess.run(
+        [sys.executable, "-X", "frozen_modules=on", "-c", TIMER.format(statement=statement)],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    elapsed, django_modules = output.split()
+    return float(elapsed), int(django_modules)
+
+
+def main(runs=10):
+    print(f"{'import':<24} {'best ms':>8} {'django modules':>15}")
+    for label, statement in STATEMENTS.items():
+        try:
+            timings = [cold_import(statement) for _ in range(runs)]
+        except subprocess.CalledProcessError:
+            print(f"{label:<24} {'failed':>8}")
+            continue
+        best = min(elapsed for elapsed, _ in timings)
+        print(f"{label:<24} {best * 1000:>8.2f} {timings[0][1]:>15}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
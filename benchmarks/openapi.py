@@ -0,0 +1,86 @@
+"""
+Compares generating the OpenAPI document for a URLconf of `views` form-based
+views against serving it from `SchemaView` once cached, both as a full
+response and as a 304 for a client which already has it.
+
+Usage:
+    python -m benchmarks.openapi [views] [runs]
+"""
+import sys
+import timeit
+
+import django
+from django.conf import settings
+
+settings.configure(USE_I18N=False, ALLOWED_HOSTS=["*"])
+django.setup()
+
+from django import forms
+from django.test import RequestFactory
+from django.urls import path
+from django.views.generic import FormView
+
+from formality import openapi
+from formality.forms import FormField, FormSetField, NestedForm
+
+
+class AddressForm(NestedForm):
+    street = forms.CharField(max_length=100)
+    city = forms.CharField(max_length=100)
+    country = forms.ChoiceField(choices=[("gb", "GB"), ("fr", "FR"), ("de", "DE")])
+
+
+class LineForm(NestedForm):
+    sku = forms.CharField(max_length=12)
+    quantity = forms.IntegerField(min_value=1)
+    price = forms.DecimalField(max_digits=10, decimal_places=2)
+
+
+def main(views=500, runs=20):
+    class urls:
+        urlpatterns = []
+
+    for i in range(views):
+        form_class = type(
+            f"OrderForm{i}",
+            (NestedForm,),
+            {
+                "email": forms.EmailField(),
+                "shipping": FormField(AddressForm),
+                "lines": FormSetField(LineForm, max_num=100),
+            },
+        )
+        view = type(f"OrderView{i}", (FormView,), {"form_class": form_class})
+        urls.urlpatterns.append(path(f"orders/{i}/<int:pk>/", view.as_view()))
+
+    view = openapi.SchemaView.as_view(urlconf=urls)
+    factory = RequestFactory()
+
+    def generate():
+        openapi.generate(urls)
+
+    def first_request():
+        openapi._schemas.clear()
+        view(factory.get("/openapi.json"))
+
+    etag = openapi.get_schema(urls).etag
+
+    def cached():
+        view(factory.get("/openapi.json"))
+
+    def not_modified():
+        view(factory.get("/openapi.json", HTTP_IF_NONE_MATCH=etag))
+
+    print(f"{views} views, {len(openapi.get_schema(urls).content)} bytes, best of {runs}")
+    for label, func in (
+        ("generate", generate),
+        ("first request", first_request),
+        ("cached", cached),
+        ("304", not_modified),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=runs))
+        print(f"{label:<14} {best * 1000:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,62 @@
+"""
+Compares parsing the same nested payload with `formality.parsers` as a
+urlencoded body, as a JSON body (with whichever of orjson and json is
+available, including the limit checks), and as a JSON stream read in chunks,
+against a bare `json.loads` with no limits at all.
+
+Usage:
+    python -m benchmarks.parsers [rows] [repeat]
+"""
+import json
+import sys
+import timeit
+from io import BytesIO
+from unittest import mock
+
+from formality import parsers, query
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=10, repeat=repeat)) / 10
+
+
+def main(rows=500, repeat=5):
+    data = {
+        "q": "running shoes",
+        "filters": [{"field": f"size{i}", "op": "gte", "value": i + 0.5} for i in range(rows)],
+        "ids": list(range(rows)),
+    }
+    limit = rows * 12
+    as_json = json.dumps(data).encode()
+    as_qs = query.dumps(data).encode()
+    loops = (
+        ("json.loads (no limits)", lambda: json.loads(as_json)),
+        (
+            "urlencoded",
+            lambda: parsers.parse(as_qs, "application/x-www-form-urlencoded", max_num_fields=limit),
+        ),
+        (
+            f"json ({parsers.JSON_BACKEND})",
+            lambda: parsers.parse(as_json, "application/json", max_num_fields=limit),
+        ),
+    )
+    if parsers.JSON_BACKEND != "json":
+
+        def stdlib():
+            with mock.patch.object(parsers, "_json_loads", parsers._stdlib_json_loads):
+                parsers.parse(as_json, "application/json", max_num_fields=limit)
+
+        loops += (("json (json)", stdlib),)
+    loops += (
+        (
+            "json (streamed)",
+            lambda: parsers.parse(BytesIO(as_json), "application/json", max_num_fields=limit),
+        ),
+    )
+    print(f"{rows} rows, {len(as_json)} bytes of JSON, {len(as_qs)} urlencoded")
+    for label, func in loops:
+        print(f"{label:<24} {best(func, repeat) * 1000:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,37 @@
+"""
+Compares compiling a large `formality.query.PathPlan` as a worker starts,
+against loading one compiled ahead of time and saved with `PathPlan.save`.
+
+Usage:
+    python -m benchmarks.plans [sections] [repeat]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from formality.query import PathPlan
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=5, repeat=repeat)) / 5
+
+
+def main(sections=50, repeat=5):
+    shapes = [f"section{i}[N][field{j}]" for i in range(sections) for j in range(20)]
+    plan = PathPlan.from_shapes(shapes, indexes=5)
+    paths = list(plan.paths.values())
+    with tempfile.TemporaryDirectory() as directory:
+        saved = os.path.join(directory, "plan.json")
+        plan.save(saved)
+        loops = (
+            ("compile", lambda: PathPlan(paths)),
+            ("load saved", lambda: PathPlan.load(saved)),
+        )
+        print(f"{len(plan)} paths, best of {repeat}")
+        for label, func in loops:
+            print(f"{label:<12} {best(func, repeat) * 1000:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
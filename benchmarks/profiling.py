@@ -0,0 +1,41 @@
+"""
+Measures what a `formality.profiling.KeyShapeProfiler` adds to parsing: with
+none, sampling the default 1% of results, and walking every one of them.
+
+Usage:
+    python -m benchmarks.profiling [rows] [repeat]
+"""
+import sys
+import timeit
+
+from formality import query
+from formality.profiling import KeyShapeProfiler
+
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=100, repeat=repeat)) / 100
+
+
+def main(rows=100, repeat=5):
+    qs = query.dumps(
+        {
+            "q": "shoes",
+            "page": 2,
+            "filters": [{"field": f"field{i}", "op": "eq", "value": i} for i in range(rows)],
+        }
+    )
+    limit = rows * 10
+    sampled = KeyShapeProfiler(0.01, seed=0)
+    everything = KeyShapeProfiler(1)
+    loops = (
+        ("no profiler", lambda: query.loads(qs, max_num_fields=limit)),
+        ("sample_rate=0.01", lambda: query.loads(qs, max_num_fields=limit, profiler=sampled)),
+        ("sample_rate=1", lambda: query.loads(qs, max_num_fields=limit, profiler=everything)),
+    )
+    print(f"{rows} rows, best of {repeat}")
+    for label, func in loops:
+        print(f"{label:<18} {best(func, repeat) * 1000:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,63 @@
+"""
+Runs `loads` and `dumps` concurrently from a ThreadPoolExecutor with an
+increasing number of threads, and prints the throughput at each, along with
+how it scales compared to a single thread.
+
+On a regular build the GIL means there's no scaling to be had; on a
+free-threaded build it should go up roughly with the number of cores, and if it
+doesn't, something in the parser is contended.
+
+Usage:
+    python -m benchmarks.threads [max_threads] [calls_per_thread]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import formality
+
+QS = "&".join(
+    (
+        "q=running+shoes",
+        "page=2",
+        "sort[field]=price",
+        "sort[dir]=asc",
+        *(f"filters[{i}][field]=size&filters[{i}][op]=gte&filters[{i}][value]={i}" for i in range(10)),
+        *(f"ids[]={i}" for i in range(50)),
+    )
+)
+DATA = formality.query.loads(QS)
+
+
+def work(calls, interner):
+    for _ in range(calls):
+        formality.query.loads(QS, interner=interner)
+        formality.query.dumps(DATA)
+    return calls
+
+
+def run(threads, calls, interner):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        done = sum(executor.map(work, [calls] * threads, [interner] * threads))
+        return done / (time.perf_counter() - start)
+
+
+def main(max_threads=os.cpu_count() or 1, calls=2000):
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs")
+    for label, interner in (("no interner", None), ("shared interner", formality.query.INTERNER)):
+        print(f"\n{label}")
+        print(f"{'threads':>8} {'calls/s':>12} {'scaling':>8}")
+        baseline = None
+        threads = 1
+        while threads <= max_threads:
+            throughput = run(threads, calls, interner)
+            baseline = baseline or throughput
+            print(f"{threads:>8} {throughput:>12.0f} {throughput / baseline:>7.2f}x")
+            threads *= 2
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,9 +1,27 @@
-
-
-from . import query
-from . import views
+import importlib
 
 __all__ = [
     'query',
+    'flat',
+    'http',
+    'transcode',
+    'parsers',
+    'coercion',
+    'archive',
+    'profiling',
     'views',
+    'forms',
+    'openapi',
 ]
+
+
+# Submodules are only imported once they're used, so that `import formality`
+# doesn't drag Django in (via `views`, `forms` or `openapi`) for anything which only wants to parse.
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
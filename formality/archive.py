@@ -0,0 +1,366 @@
+"""
+Reprocessing archives of raw request bodies and query strings, such as are
+kept for incident forensics or replaying load tests, at the speed the
+parser allows, rather than that of reading them.
+
+An `Archive` memory-maps the file and gives each record as a `memoryview`
+of it, which `query.loads` decodes straight from the mapped pages without
+first copying it into `bytes`. Three formats are understood:
+
+- "lines": one record per line (with or without a trailing "\\r").
+- "length-prefixed": each record preceded by its length, packed as
+  `prefix` (a `struct` format, by default a 4 byte big-endian unsigned int).
+- "har": an HTTP Archive export, giving the body of each request which has
+  one, and the query string of each which doesn't. Being JSON, the whole
+  document is read in to find them, so its records are `str`, not views.
+
+`parse_archive` parses every record, giving a `ParsedRecord` for each with
+the result or the exception it threw, and how long it took; given an
+`executor`, the file is split into spans at record boundaries, and each is
+mapped and parsed by a worker, so a `ProcessPoolExecutor` can use every core.
+"""
+import heapq
+import mmap
+import os
+import struct
+import sys
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from . import parsers, query
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+__all__ = [
+    "FORMATS",
+    "Archive",
+    "ParsedRecord",
+    "parse_archive",
+]
+
+FORMATS = ("lines", "length-prefixed", "har")
+
+Record = Union[memoryview, str]
+
+
+class ParsedRecord:
+    """
+    The outcome of parsing one record: `result` if it parsed, or the `error`
+    it threw if not, and the `elapsed` seconds it took either way.
+
+    `offset` is where the record starts in the file (after its length prefix,
+    for "length-prefixed"), or the index of the entry in a HAR, and `length`
+    is its size in bytes (characters for a HAR).
+    """
+
+    __slots__ = ("offset", "length", "result", "error", "elapsed")
+
+    def __init__(
+        self,
+        offset: int,
+        length: int,
+        result: Any = None,
+        error: Optional[Exception] = None,
+        elapsed: float = 0.0,
+    ):
+        self.offset = offset
+        self.length = length
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        outcome = "ok" if self.error is None else repr(self.error)
+        return f"<{self.__class__.__name__}: {self.offset}+{self.length} {outcome} in {self.elapsed:.6f}s>"
+
+    def __reduce__(self):
+        return self.__class__, (self.offset, self.length, self.result, self.error, self.elapsed)
+
+
+class Archive:
+    """
+    A memory-mapped archive of records, in one of the `FORMATS`.
+
+    Iterating gives each record, and `records()` each with its offset.
+    The views are only valid until the archive is closed (which it is on
+    leaving a `with` block), and any still held stop it from closing.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], format: str = "lines", *, prefix: str = "!I"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown archive format {format!r}, expected one of {FORMATS!r}")
+        self.path = path
+        self.format = format
+        self.prefix = struct.Struct(prefix)
+        self._entries: Optional[List[Tuple[str, Optional[str]]]] = None
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # Empty files can't be mapped.
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if self._mmap is not None and hasattr(self._mmap, "madvise"):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return 0 if self._mmap is None else len(self._mmap)
+
+    def __iter__(self) -> Iterator[Record]:
+        for offset, record in self.records():
+            yield record
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def records(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, Record]]:
+        """
+        Give the offset and contents of every record starting from `start`
+        (which must be the start of a record) and before `end`.
+        """
+        if self._mmap is None:
+            return
+        if end is None:
+            end = len(self._mmap)
+        if self.format == "har":
+            yield from self._har_records(start, end)
+            return
+        view = memoryview(self._mmap)
+        try:
+            if self.format == "lines":
+                yield from self._lines(view, start, end)
+            else:
+                yield from self._length_prefixed(view, start, end)
+        finally:
+            view.release()
+
+    def _lines(self, view: memoryview, start: int, end: int) -> Iterator[Tuple[int, memoryview]]:
+        find = self._mmap.find
+        while start < end:
+            stop = find(b"\n", start, end)
+            if stop == -1:
+                stop = end
+            record_end = stop
+            if record_end > start and view[record_end - 1] == 13:  # \r
+                record_end -= 1
+            if record_end > start:
+                yield start, view[start:record_end]
+            start = stop + 1
+
+    def _length_prefixed(self, view: memoryview, start: int, end: int) -> Iterator[Tuple[int, memoryview]]:
+        unpack_from = self.prefix.unpack_from
+        size = self.prefix.size
+        while start < end:
+            if end < start + size:
+                raise ValueError(f"Truncated length prefix at offset {start} of {self.path}")
+            (length,) = unpack_from(self._mmap, start)
+            start += size
+            if end < start + length:
+                raise ValueError(
+                    f"Truncated record at offset {start} of {self.path}: expected {length} bytes, found {end - start}"
+                )
+            yield start, view[start : start + length]
+            start += length
+
+    def _har_records(self, start: int, end: int) -> Iterator[Tuple[int, str]]:
+        for index, (record, content_type) in enumerate(self._har_entries()):
+            if start <= index < end:
+                yield index, record
+
+    def _har_entries(self) -> List[Tuple[str, Optional[str]]]:
+        """
+        The body (and its content type) of every request in a HAR, or the
+        query string (and None) for requests without a body, found the first
+        time they're asked for.
+        """
+        if self._entries is None:
+            document = parsers._json_loads(self._mmap[:])
+            entries = []
+            for entry in document["log"]["entries"]:
+                request = entry["request"]
+                post = request.get("postData")
+                if post is not None and post.get("text"):
+                    entries.append((post["text"], post.get("mimeType", "")))
+                else:
+                    entries.append((urlsplit(request["url"]).query, None))
+            self._entries = entries
+        return self._entries
+
+    def spans(self, count: int) -> List[Tuple[int, int]]:
+        """
+        Split the archive into (up to) `count` (start, end) spans of roughly
+        equal size, each starting and ending on a record boundary, for
+        `parse` to be given to separate workers.
+        """
+        size = len(self)
+        if not size:
+            return []
+        if self.format == "har":
+            entries = len(self._har_entries())
+            step = -(-entries // count)
+            return [(start, min(start + step, entries)) for start in range(0, entries, step)]
+        target = -(-size // count)
+        boundaries = [0]
+        if self.format == "lines":
+            while boundaries[-1] + target < size:
+                stop = self._mmap.find(b"\n", boundaries[-1] + target)
+                if stop == -1:
+                    break
+                boundaries.append(stop + 1)
+        else:
+            # Every record has to be stepped over to find where they start,
+            # but that's only reading the prefixes.
+            offset = 0
+            unpack_from = self.prefix.unpack_from
+            while offset + self.prefix.size <= size:
+                (length,) = unpack_from(self._mmap, offset)
+                offset += self.prefix.size + length
+                if boundaries[-1] + target <= offset < size:
+                    boundaries.append(offset)
+        boundaries.append(size)
+        return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+    def parse(
+        self,
+        parser: Optional[Callable[..., Any]] = None,
+        *,
+        start: int = 0,
+        end: Optional[int] = None,
+        keep_results: bool = True,
+        **options,
+    ) -> Iterator[ParsedRecord]:
+        """
+        Parse every record (in the span from `start` to `end`, if given) with
+        `parser`, passing it any other `options`, and give a `ParsedRecord`
+        for each. Exceptions a record throws are caught and reported against
+        it, and parsing carries on with the next.
+
+        By default, records are parsed with `query.loads`, apart from the
+        bodies in a HAR, which go to `parsers.parse` with their content type.
+        Without `keep_results`, only the errors and timings are kept.
+        """
+        content_types: Dict[int, Optional[str]] = {}
+        if self.format == "har" and parser is None:
+            content_types = dict(enumerate(content_type for record, content_type in self._har_entries()))
+        clock = time.perf_counter
+        for offset, record in self.records(start, end):
+            use = parser or query.loads
+            content_type = content_types.get(offset)
+            if content_type is not None:
+                use = partial(parsers.parse, content_type=content_type)
+            result = error = None
+            began = clock()
+            try:
+                result = use(record, **options)
+            except Exception as e:
+                error = e
+            elapsed = clock() - began
+            length = len(record)
+            if isinstance(record, memoryview):
+                record.release()
+            yield ParsedRecord(offset, length, result if keep_results else None, error, elapsed)
+
+
+def _parse_span(
+    path: Union[str, os.PathLike],
+    format: str,
+    prefix: str,
+    span: Tuple[int, int],
+    parser: Optional[Callable[..., Any]],
+    keep_results: bool,
+    options: Dict[str, Any],
+) -> List[ParsedRecord]:
+    """
+    Map the archive and parse one span of it, for running inside an executor.
+    """
+    with Archive(path, format, prefix=prefix) as archive:
+        start, end = span
+        return list(
+            archive.parse(parser, start=start, end=end, keep_results=keep_results, **options)
+        )
+
+
+def parse_archive(
+    path: Union[str, os.PathLike],
+    format: str = "lines",
+    *,
+    parser: Optional[Callable[..., Any]] = None,
+    prefix: str = "!I",
+    executor: Optional["Executor"] = None,
+    spans: Optional[int] = None,
+    keep_results: bool = True,
+    **options,
+) -> Iterator[ParsedRecord]:
+    """
+    Parse every record in the archive at `path`, as `Archive.parse` does,
+    giving a `ParsedRecord` for each, in order.
+
+    Given an `executor`, the archive is split into `spans` pieces (by default
+    four per CPU) which are each parsed by a worker; with a
+    `ProcessPoolExecutor`, the `parser` must be picklable, and each span's
+    records are sent back together, so `keep_results=False` saves a lot of
+    pickling when only the errors and timings are wanted.
+    """
+    if executor is None:
+        with Archive(path, format, prefix=prefix) as archive:
+            yield from archive.parse(parser, keep_results=keep_results, **options)
+        return
+    with Archive(path, format, prefix=prefix) as archive:
+        pieces = archive.spans(spans or 4 * (os.cpu_count() or 1))
+    parse = partial(
+        _parse_span,
+        path,
+        format,
+        prefix,
+        parser=parser,
+        keep_results=keep_results,
+        options=options,
+    )
+    for parsed in executor.map(parse, pieces):
+        yield from parsed
+
+
+def main(path: str, format: str = "lines", workers: str = "0"):
+    """
+    Parse every record of an archive with the default limits, and print how
+    many failed (and why) and the slowest few records.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(int(workers)) if int(workers) else None
+    began = time.perf_counter()
+    count = size = 0
+    errors: Dict[str, int] = {}
+    slowest: List[Tuple[float, int, ParsedRecord]] = []
+    try:
+        for parsed in parse_archive(path, format, executor=executor, keep_results=False):
+            count += 1
+            size += parsed.length
+            if parsed.error is not None:
+                name = type(parsed.error).__name__
+                errors[name] = errors.get(name, 0) + 1
+            # The count breaks ties, so records are never compared.
+            if len(slowest) < 5:
+                heapq.heappush(slowest, (parsed.elapsed, count, parsed))
+            else:
+                heapq.heappushpop(slowest, (parsed.elapsed, count, parsed))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - began
+    print(f"{count} records, {size / 1e6:.1f} MB in {elapsed:.3f}s ({size / 1e6 / (elapsed or 1):.1f} MB/s)")
+    for name, number in sorted(errors.items(), key=lambda item: -item[1]):
+        print(f"{number:>10} {name}")
+    for elapsed, _, parsed in sorted(slowest, reverse=True):
+        print(f"slowest: {parsed!r}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
@@ -0,0 +1,305 @@
+"""
+Typed coercion of values, beyond the JSON-ish constants and numbers `query`
+coerces by default, such as dates, `Decimal` and UUIDs.
+
+A `Coercers` registry may be given as `coerce` anywhere a bool is accepted
+(`query.loads`, `query.load`, `query.extract`, `flat.loads` and `parsers`),
+and to `query.dumps`, which writes values of the registered types back out
+in the form they'll be coerced from again:
+
+    >>> from formality import coercion, query
+    >>> coercers = coercion.Coercers(coercion.DATE, coercion.DECIMAL)
+    >>> query.loads("start=2024-01-31&price=9.99&page=2", coerce=coercers)
+    {'start': datetime.date(2024, 1, 31), 'price': Decimal('9.99'), 'page': 2}
+
+Each `Coercer` declares cheap checks (the lengths, first characters and
+characters a value can have, and a character it must have) which are compiled, along with every other
+registered coercer, into a single function, so that each value is tested
+once while it's parsed, and anything not claimed goes on to the default
+coercion.
+"""
+import datetime
+import decimal
+import json.scanner
+import string
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from .query import COERCE_LOAD_CONSTANTS, _coerce_value, _dump_value
+
+__all__ = [
+    "Coercer",
+    "Coercers",
+    "DATE",
+    "DATETIME",
+    "DECIMAL",
+    "UUID",
+]
+
+
+class Coercer:
+    """
+    A single typed conversion: `load` turns a (decoded, non-empty) string into
+    a value of `type`, or throws `ValueError` if it isn't one after all, in which
+    case the next coercer is tried; `dump` turns such a value back into the
+    string `load` accepts.
+
+    `load` is only called for strings which pass all of the given checks:
+    one of the `lengths` (an int or a collection of them), a first character
+    in `first`, made up only of characters in `chars`, and including the
+    character `contains` somewhere. The tighter they are, the less anything
+    else pays for the coercer being registered.
+    """
+
+    __slots__ = ("name", "type", "load", "dump", "lengths", "first", "chars", "contains")
+
+    def __init__(
+        self,
+        name: str,
+        type: Union[type, Tuple[type, ...]],
+        load: Callable[[str], Any],
+        dump: Callable[[Any], str] = str,
+        *,
+        lengths: Union[int, Iterable[int], None] = None,
+        first: Optional[str] = None,
+        chars: Optional[str] = None,
+        contains: Optional[str] = None,
+    ):
+        if first == "" or chars == "":
+            raise ValueError(f"{name!r} can never match an empty set of characters")
+        if contains is not None and len(contains) != 1:
+            raise ValueError(f"{name!r} must be given a single character to contain")
+        self.name = name
+        self.type = type
+        self.load = load
+        self.dump = dump
+        self.lengths = (
+            None
+            if lengths is None
+            else frozenset((lengths,) if isinstance(lengths, int) else lengths)
+        )
+        self.first = None if first is None else frozenset(first)
+        self.chars = chars
+        self.contains = contains
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self.name}>"
+
+    def claims_digits(self) -> bool:
+        """
+        Whether the checks could let through a plain integer like "123",
+        which would then never reach the default coercion without trying
+        `load` first.
+        """
+        return (
+            (self.first is None or not self.first.isdisjoint(string.digits))
+            and (self.chars is None or not set(self.chars).isdisjoint(string.digits))
+            and (self.contains is None or self.contains in string.digits)
+        )
+
+
+class Coercers:
+    """
+    A registry of `Coercer` instances, tried in the order they were
+    registered, before the default coercion of `query` is.
+
+    `load` is compiled from the coercers whenever one is registered (so
+    should be looked up each time rather than kept hold of), doing each of
+    their checks inline, with the length and first character of the value
+    only worked out once. `dump` picks the coercer to use by the exact type
+    of the value, falling back on what `query.dumps` would otherwise write.
+
+    Safe to share between threads, as registering a coercer swaps in a new
+    `load` rather than changing the one in use; registries are pickled as
+    their coercers, for use with a `ProcessPoolExecutor`.
+    """
+
+    __slots__ = ("coercers", "load", "claims_digits", "_dumpers")
+
+    def __init__(self, *coercers: Coercer):
+        self.coercers: Tuple[Coercer, ...] = ()
+        self._compile(coercers)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {[c.name for c in self.coercers]!r}>"
+
+    def __iter__(self) -> Iterator[Coercer]:
+        return iter(self.coercers)
+
+    def __contains__(self, name: str) -> bool:
+        return any(coercer.name == name for coercer in self.coercers)
+
+    def __reduce__(self):
+        return self.__class__, self.coercers
+
+    def register(self, coercer: Coercer) -> Coercer:
+        """
+        Add `coercer`, to be tried after any already registered, or in place
+        of an existing one with the same name.
+        """
+        names = [c.name for c in self.coercers]
+        if coercer.name in names:
+            coercers = list(self.coercers)
+            coercers[names.index(coercer.name)] = coercer
+        else:
+            coercers = [*self.coercers, coercer]
+        self._compile(coercers)
+        return coercer
+
+    def dump(self, value: Any) -> str:
+        """
+        Format a single value as the string `query.dumps` should write for it.
+        """
+        dumper = self._dumpers.get(value.__class__)
+        if dumper is None:
+            return _dump_value(value)
+        return dumper(value)
+
+    def _compile(self, coercers: Iterable[Coercer]):
+        coercers = tuple(coercers)
+        dumpers: Dict[type, Callable[[Any], str]] = {}
+        for coercer in reversed(coercers):
+            types = coercer.type if isinstance(coercer.type, tuple) else (coercer.type,)
+            dumpers.update(dict.fromkeys(types, coercer.dump))
+        # Everything is built before anything is replaced, so a thread using
+        # the old `load` carries on with it unaffected.
+        load = _compile_load(coercers)
+        self.claims_digits = any(coercer.claims_digits() for coercer in coercers)
+        self.coercers = coercers
+        self._dumpers = dumpers
+        self.load = load
+
+
+def _compile_load(coercers: Tuple[Coercer, ...]) -> Callable[[Any], Any]:
+    """
+    Build the source of a single function which tries each of `coercers` in
+    turn (if the value passes its checks), followed by an inlined copy of the
+    default `_coerce_value`, and execute it, as `collections.namedtuple` does.
+    """
+    namespace: Dict[str, Any] = {
+        "_coerce_value": _coerce_value,
+        "str": str,
+        "float": float,
+        "int": int,
+        "constants": COERCE_LOAD_CONSTANTS,
+        "number": json.scanner.NUMBER_RE.fullmatch,
+        "number_first": frozenset("-0123456789"),
+    }
+    lines = [
+        "def load(val):",
+        "    if val.__class__ is not str or not val:",
+        "        return _coerce_value(val)",
+        "    first = val[0]",
+    ]
+    if any(coercer.lengths is not None for coercer in coercers):
+        lines.append("    length = len(val)")
+    for i, coercer in enumerate(coercers):
+        checks = []
+        if coercer.lengths is not None:
+            namespace[f"lengths_{i}"] = coercer.lengths
+            checks.append(f"length in lengths_{i}")
+        if coercer.first is not None:
+            namespace[f"first_{i}"] = coercer.first
+            checks.append(f"first in first_{i}")
+        if coercer.contains is not None:
+            checks.append(f"{coercer.contains!r} in val")
+        if coercer.chars is not None:
+            namespace[f"chars_{i}"] = coercer.chars
+            checks.append(f"not val.strip(chars_{i})")
+        namespace[f"load_{i}"] = coercer.load
+        lines += [
+            f"    if {' and '.join(checks) or 'True'}:",
+            "        try:",
+            f"            return load_{i}(val)",
+            "        except ValueError:",
+            "            pass",
+        ]
+    # The same as _coerce_value, but only trying NUMBER_RE on something which
+    # could be a number (its \d also matches digits outside of ASCII).
+    lines += [
+        "    if val in constants:",
+        "        return constants[val]",
+        "    if first in number_first or first.isdigit():",
+        "        match = number(val)",
+        "        if match is not None:",
+        "            integer, frac, exp = match.groups()",
+        "            if frac or exp:",
+        "                return float(integer + (frac or '') + (exp or ''))",
+        "            return int(integer)",
+        "    return val",
+    ]
+    exec("\n".join(lines), namespace)
+    return namespace["load"]
+
+
+def _load_decimal(val: str) -> decimal.Decimal:
+    # Only numbers with a fractional part, and no exponent, so that integers
+    # are still ints and 1e3 is still a float; otherwise the same numbers the
+    # default coercion accepts (so not 007.5).
+    match = json.scanner.NUMBER_RE.fullmatch(val)
+    if match is None:
+        raise ValueError(f"{val!r} is not a decimal number")
+    integer, frac, exp = match.groups()
+    if not frac or exp:
+        raise ValueError(f"{val!r} is not a decimal number")
+    return decimal.Decimal(val)
+
+
+def _dump_decimal(value: decimal.Decimal) -> str:
+    # Not str(), which gives 1E+1 for Decimal("1E+1"), and always with a
+    # fractional part, so that it's loaded as a Decimal rather than an int.
+    dumped = format(value, "f")
+    if value.is_finite() and "." not in dumped:
+        dumped += ".0"
+    return dumped
+
+
+def _load_uuid(val: str) -> uuid.UUID:
+    # uuid.UUID would ignore hyphens wherever they are.
+    if val[8] != "-" or val[13] != "-" or val[18] != "-" or val[23] != "-":
+        raise ValueError(f"{val!r} is not a UUID")
+    return uuid.UUID(val)
+
+
+DATE = Coercer(
+    "date",
+    datetime.date,
+    datetime.date.fromisoformat,
+    datetime.date.isoformat,
+    lengths=10,
+    first=string.digits,
+    chars="0123456789-",
+    contains="-",
+)
+DATETIME = Coercer(
+    "datetime",
+    datetime.datetime,
+    datetime.datetime.fromisoformat,
+    datetime.datetime.isoformat,
+    # 2024-01-31T12:00 up to 2024-01-31T12:00:00.000000+00:00
+    lengths=range(16, 33),
+    first=string.digits,
+    chars="0123456789-:T .+Z",
+    contains=":",
+)
+# Floats are written out the same as decimals are, so with this registered
+# they come back as Decimal.
+DECIMAL = Coercer(
+    "decimal",
+    decimal.Decimal,
+    _load_decimal,
+    _dump_decimal,
+    first="-0123456789",
+    chars="-0123456789.",
+    contains=".",
+)
+UUID = Coercer(
+    "uuid",
+    uuid.UUID,
+    _load_uuid,
+    str,
+    lengths=36,
+    first=string.hexdigits,
+    chars=string.hexdigits + "-",
+    contains="-",
+)
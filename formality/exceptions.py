@@ -0,0 +1,181 @@
+"""
+The exceptions thrown while parsing.
+
+When Django is installed they're subclasses of its `SuspiciousOperation`
+(and `TooManyFieldsSent` and `TooManyFilesSent` are Django's own), so that
+Django turns them into 400 responses; otherwise they're subclasses of
+stand-ins with the same names.
+
+Either way, Django isn't imported until one of them is first needed,
+so that using `formality.query` outside of a Django project (or before one
+is set up) doesn't pay for it.
+"""
+import threading
+
+__all__ = [
+    "SuspiciousOperation",
+    "TooManyFieldsSent",
+    "TooManyFilesSent",
+    "MalformedData",
+    "KeyTooLong",
+    "ValueTooLong",
+    "TooManyKeys",
+    "DataTooLarge",
+    "MalformedJSON",
+]
+
+_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name in __all__:
+        with _lock:
+            # Another thread may have got here first, and the classes must
+            # only ever be made once, or they won't match in `except` clauses.
+            if name not in globals():
+                globals().update(_define())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
+
+
+def _define():
+    try:
+        from django.core.exceptions import SuspiciousOperation, TooManyFieldsSent
+    except ImportError:
+
+        class SuspiciousOperation(Exception):
+            """
+            Stands in for django.core.exceptions.SuspiciousOperation
+            """
+
+            __qualname__ = "SuspiciousOperation"
+
+        class TooManyFieldsSent(SuspiciousOperation):
+            """
+            Stands in for django.core.exceptions.TooManyFieldsSent
+            """
+
+            __qualname__ = "TooManyFieldsSent"
+
+    try:
+        # Only in Django 3.2.18, 4.0.10, 4.1.7 and later.
+        from django.core.exceptions import TooManyFilesSent
+    except ImportError:
+
+        class TooManyFilesSent(SuspiciousOperation):
+            """
+            Stands in for django.core.exceptions.TooManyFilesSent
+            """
+
+            __qualname__ = "TooManyFilesSent"
+
+    class MalformedData(SuspiciousOperation):
+        """
+        When encountering fields like a[[[] or b[]]] just drop them immediately
+        and loudly.
+        """
+
+        __qualname__ = "MalformedData"
+        __slots__ = ("message", "key")
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.key = args[0]
+
+        def __str__(self):
+            return f"Invalid nesting characters in key {self.key!r}"
+
+    class KeyTooLong(SuspiciousOperation):
+        """
+        When a single key is longer than the allowed `max_key_length`, before any
+        decoding of it has been attempted.
+        """
+
+        __qualname__ = "KeyTooLong"
+        __slots__ = ("key", "max_key_length")
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.key, self.max_key_length = args
+
+        def __str__(self):
+            return f"Key of length {len(self.key)!r} exceeded {self.max_key_length!r}: {self.key[:32]!r}..."
+
+    class ValueTooLong(SuspiciousOperation):
+        """
+        When a single value is longer than the allowed `max_value_length`, before
+        any decoding or coercing of it has been attempted.
+        """
+
+        __qualname__ = "ValueTooLong"
+        __slots__ = ("key", "length", "max_value_length")
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.key, self.length, self.max_value_length = args
+
+        def __str__(self):
+            return f"Value of length {self.length!r} for key {self.key!r} exceeded {self.max_value_length!r}"
+
+    class TooManyKeys(SuspiciousOperation):
+        """
+        When a single (possibly nested) dictionary would grow to have more distinct
+        keys than `max_keys_per_mapping`, like a[b1]=1&a[b2]=2&a[b3]=3...
+        """
+
+        __qualname__ = "TooManyKeys"
+        __slots__ = ("key", "max_keys_per_mapping")
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.key, self.max_keys_per_mapping = args
+
+        def __str__(self):
+            return f"Adding key {self.key!r} exceeded {self.max_keys_per_mapping!r} keys in a single mapping"
+
+    class DataTooLarge(SuspiciousOperation):
+        """
+        When the whole input is larger than `max_input_bytes`, before anything
+        else about it is looked at.
+        """
+
+        __qualname__ = "DataTooLarge"
+        __slots__ = ("length", "max_input_bytes")
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.length, self.max_input_bytes = args
+
+        def __str__(self):
+            return f"Input of length {self.length!r} exceeded {self.max_input_bytes!r}"
+
+    class MalformedJSON(SuspiciousOperation):
+        """
+        When a JSON body can't be decoded, or isn't an object at the top level.
+        """
+
+        __qualname__ = "MalformedJSON"
+        __slots__ = ("reason",)
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.reason = args[0]
+
+        def __str__(self):
+            return f"Invalid JSON: {self.reason}"
+
+    return {
+        "SuspiciousOperation": SuspiciousOperation,
+        "TooManyFieldsSent": TooManyFieldsSent,
+        "TooManyFilesSent": TooManyFilesSent,
+        "MalformedData": MalformedData,
+        "KeyTooLong": KeyTooLong,
+        "ValueTooLong": ValueTooLong,
+        "TooManyKeys": TooManyKeys,
+        "DataTooLarge": DataTooLarge,
+        "MalformedJSON": MalformedJSON,
+    }
@@ -0,0 +1,409 @@
+import string
+from typing import TYPE_CHECKING, AbstractSet, Dict, Union, Any, List, Tuple, Iterator, Optional
+
+from . import exceptions
+from .query import (
+    Interner,
+    ParseBudget,
+    _is_wanted,
+    _load_key_value,
+    _split_fields,
+    _too_many_nested_fields,
+)
+
+if TYPE_CHECKING:
+    from .coercion import Coercers
+
+Path = Tuple[Union[str, int], ...]
+
+_MISSING = object()
+
+
+class _Keys:
+    """
+    The keys of dictionaries in a `PathIndex`, in the order they were added,
+    shared by every dictionary whose keys start the same way (like each of
+    filters[0][field]=...&filters[0][op]=...&filters[1][field]=...), so that
+    the dictionaries themselves only need to hold their values.
+
+    A dictionary with n values has the first n of `keys`. Adding another key
+    to it either follows along `keys` (when it's the next one already), extends
+    them in place (when no dictionary has gone any further), or branches off a
+    copy of the first n, which is kept in `branches` for the next dictionary
+    to do the same.
+    """
+
+    __slots__ = ("keys", "positions", "branches")
+
+    def __init__(self, keys: List[Union[str, int]]):
+        self.keys = keys
+        self.positions: Dict[Union[str, int], int] = {
+            key: position for position, key in enumerate(keys)
+        }
+        self.branches: Optional[Dict[Tuple[int, Union[str, int]], "_Keys"]] = None
+
+    def add(self, size: int, key: Union[str, int]) -> "_Keys":
+        """
+        The keys of a dictionary which has `size` of these, once `key` (which
+        it doesn't have) has been added to it.
+        """
+        keys = self.keys
+        if size == len(keys):
+            keys.append(key)
+            self.positions[key] = size
+            return self
+        if keys[size] == key:
+            return self
+        if self.branches is None:
+            self.branches = {}
+        try:
+            return self.branches[size, key]
+        except KeyError:
+            branch = self.branches[size, key] = _Keys([*keys[:size], key])
+            return branch
+
+
+class _Mapping(list):
+    """
+    A dictionary in a `PathIndex`, as its values, in the order of `keys`.
+    """
+
+    __slots__ = ("keys",)
+
+    keys: _Keys
+
+
+def _new_mapping(index: "PathIndex") -> _Mapping:
+    # Not done in _Mapping.__init__, as calling that is most of the cost of
+    # making one.
+    mapping = _Mapping()
+    mapping.keys = index._keys
+    return mapping
+
+
+class _Sequence(list):
+    """
+    A list in a `PathIndex`, kept apart from any lists which are values.
+    """
+
+    __slots__ = ()
+
+
+def _children(node) -> Iterator[Tuple[Union[str, int], Any]]:
+    if type(node) is _Mapping:
+        # The keys may go on further than this dictionary does.
+        return zip(node.keys.keys, node)
+    return enumerate(node)
+
+
+class PathIndex:
+    """
+    The result of parsing a query string, held more compactly than the nested
+    dictionaries `query.loads` builds: each dictionary only holds its values,
+    sharing its keys with every other dictionary which has the same ones (like
+    each of filters[0][field]=...&filters[1][field]=...), and real dictionaries
+    and lists are only built when they're asked for.
+
+    Individual values can be fetched with `lookup("a", 0, "b")`, everything
+    under a given path with `items("a")`, and the nested version (exactly as
+    `query.loads` would have returned it) with `to_dict()`. Each only looks at
+    the part of the index under the path it's given.
+    """
+
+    __slots__ = ("_keys", "_root")
+
+    def __init__(self):
+        # Where the keys of every dictionary start from, so that all of the
+        # dictionaries with the same keys end up sharing them.
+        self._keys = _Keys([])
+        self._root = _new_mapping(self)
+
+    def __contains__(self, path: Path) -> bool:
+        return self._find(path) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._root)
+
+    def __bool__(self) -> bool:
+        return bool(self._root)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self.to_dict()!r}>"
+
+    def lookup(self, *path: Union[str, int], default: Any = _MISSING) -> Any:
+        """
+        Get the value at `path`, building the nested dictionary or list if
+        the path refers to one. Throws `KeyError` if nothing exists there, unless
+        a `default` is given.
+        """
+        value = self._find(path)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(path)
+            return default
+        if type(value) is _Mapping or type(value) is _Sequence:
+            return self._build(value)
+        return value
+
+    def items(self, *prefix: Union[str, int]) -> Iterator[Tuple[Path, Any]]:
+        """
+        Yield the full path and value of every value under `prefix`, in the
+        order `to_dict` has them; items("filters") finds everything that
+        filters[*]... would.
+        """
+        node = self._find(prefix)
+        if node is _MISSING:
+            return
+        if type(node) is not _Mapping and type(node) is not _Sequence:
+            yield prefix, node
+            return
+        stack = [(prefix, _children(node))]
+        while stack:
+            path, children = stack[-1]
+            for key, value in children:
+                if type(value) is _Mapping or type(value) is _Sequence:
+                    stack.append(((*path, key), _children(value)))
+                    break
+                yield (*path, key), value
+            else:
+                stack.pop()
+
+    def to_dict(self) -> Dict[Union[str, int], Any]:
+        """
+        Build the nested dictionary, as `query.loads` would produce it.
+        """
+        return self._build(self._root)
+
+    def _find(self, path: Path) -> Any:
+        node = self._root
+        for key in path:
+            if type(node) is _Mapping:
+                position = node.keys.positions.get(key)
+                if position is None or len(node) <= position:
+                    return _MISSING
+            elif type(node) is _Sequence and type(key) is int and 0 <= key < len(node):
+                position = key
+            else:
+                return _MISSING
+            node = node[position]
+        return node
+
+    @staticmethod
+    def _build(node):
+        root = {} if type(node) is _Mapping else []
+        stack = [(node, root)]
+        while stack:
+            node, built = stack.pop()
+            is_mapping = type(node) is _Mapping
+            for key, value in _children(node):
+                if type(value) is _Mapping:
+                    stack.append((value, {}))
+                    value = stack[-1][1]
+                elif type(value) is _Sequence:
+                    stack.append((value, []))
+                    value = stack[-1][1]
+                if is_mapping:
+                    built[key] = value
+                else:
+                    built.append(value)
+        return root
+
+
+def _set_path(
+    index: PathIndex,
+    keys: List[str],
+    val: Any,
+    *,
+    max_num_fields: int = 1000,
+    max_keys_per_mapping: Optional[int] = None,
+    count_holes: bool = False,
+    seen_fields: int = 0,
+):
+    """
+    The `PathIndex` equivalent of `query._set_value`, which places `val` at the
+    path described by `keys`, following exactly the same rules for appending to
+    and backfilling arrays and for repeated keys.
+    """
+    cur = index._root
+    keys_last = len(keys) - 1
+
+    if keys_last:
+        for i, key in enumerate(keys):
+            cur_type = type(cur)
+            if not key:
+                if cur_type is not _Mapping and cur_type is not _Sequence:
+                    # Same as trying to do len(1)
+                    raise TypeError(
+                        f"'{cur_type.__name__}' object cannot be appended to"
+                    )
+                key = len(cur)
+            elif isinstance(key, str):
+                for chr in key:
+                    if chr in string.digits:
+                        continue
+                    else:
+                        break
+                else:
+                    key = int(key)
+                    if max_num_fields < key:
+                        raise exceptions.TooManyFieldsSent(
+                            f"The index [{key}] of parameter exceeded {max_num_fields!r} total allowed parameters"
+                        )
+
+            existing = _MISSING
+            if cur_type is _Mapping:
+                position = cur.keys.positions.get(key)
+                if position is not None and position < len(cur):
+                    existing = cur[position]
+            elif cur_type is _Sequence:
+                if not isinstance(key, int):
+                    raise TypeError(
+                        f"list indices must be integers or slices, not {type(key).__name__}"
+                    )
+                if key < len(cur):
+                    existing = cur[key]
+            else:
+                raise TypeError(
+                    f"'{cur_type.__name__}' object does not support item assignment"
+                )
+
+            if i < keys_last:
+                if existing is not _MISSING:
+                    bit = existing
+                elif keys[i + 1]:
+                    for chr in keys[i + 1]:
+                        if chr in string.digits:
+                            continue
+                        else:
+                            bit = _Mapping()
+                            bit.keys = index._keys
+                            break
+                    else:
+                        bit = _Sequence()
+                else:
+                    bit = _Sequence()
+            else:
+                bit = val
+
+            if cur_type is _Sequence:
+                holes = key - len(cur)
+                if holes > 0:
+                    if count_holes:
+                        seen_fields += holes
+                        if max_num_fields < seen_fields:
+                            raise _too_many_nested_fields(max_num_fields, seen_fields)
+                    bit_type = type(bit)
+                    for _ in range(holes):
+                        if bit_type is _Mapping:
+                            empty_val = _new_mapping(index)
+                        else:
+                            try:
+                                empty_val = bit_type()
+                            except TypeError:
+                                empty_val = None
+                        cur.append(empty_val)
+                if existing is _MISSING:
+                    cur.append(bit)
+                else:
+                    cur[key] = bit
+            elif existing is _MISSING:
+                if (
+                    max_keys_per_mapping is not None
+                    and max_keys_per_mapping <= len(cur)
+                ):
+                    raise exceptions.TooManyKeys(key, max_keys_per_mapping)
+                size = len(cur)
+                shared = cur.keys
+                # Following on from other dictionaries with the same keys is
+                # by far the most common case, so is checked for here first.
+                if size == len(shared.keys) or shared.keys[size] != key:
+                    cur.keys = shared.add(size, key)
+                cur.append(bit)
+            else:
+                cur[position] = bit
+            cur = bit
+        return index, seen_fields
+
+    # Simple key, even simpler rules, since only scalars and shallow
+    # arrays are allowed.
+    key = keys[0]
+    position = cur.keys.positions.get(key)
+    if position is not None and position < len(cur):
+        existing = cur[position]
+        if type(existing) is _Sequence:
+            existing.append(val)
+        else:
+            # A second value for the same key turns it into a list of both.
+            cur[position] = _Sequence((existing, val))
+    elif max_keys_per_mapping is not None and max_keys_per_mapping <= len(cur):
+        raise exceptions.TooManyKeys(key, max_keys_per_mapping)
+    else:
+        cur.keys = cur.keys.add(len(cur), key)
+        cur.append(val)
+    return index, seen_fields
+
+
+def loads(
+    qs: Union[str, bytes, memoryview],
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    count_holes: bool = False,
+    interner: Optional[Interner] = None,
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+    budget: Optional[ParseBudget] = None,
+) -> PathIndex:
+    """
+    Parse a string or bytestring into a `PathIndex`, rather than a nested
+    dictionary. Accepts the same arguments, applies the same limits and throws
+    the same exceptions as `query.loads`; the only difference is the
+    shape of the result.
+    """
+    index = PathIndex()
+    # Fast path, empty query-string.
+    if not qs:
+        return index
+
+    if budget is not None:
+        max_num_fields = budget.limit_fields(max_num_fields)
+        max_input_bytes = budget.limit_bytes(max_input_bytes)
+    parts = _split_fields(
+        qs,
+        encoding=encoding,
+        max_num_fields=max_num_fields,
+        max_input_bytes=max_input_bytes,
+    )
+    filtered = only is not None or bool(exclude)
+    seen_fields = 0
+    for part in parts:
+        key, sep, val = part.partition("=")
+        if not key:
+            continue
+        if filtered and not _is_wanted(key, encoding, only, exclude):
+            continue
+        index, seen_fields = _load_key_value(
+            key,
+            val,
+            obj=index,
+            encoding=encoding,
+            coerce=coerce,
+            max_num_fields=max_num_fields,
+            max_depth=max_depth,
+            seen_fields=seen_fields,
+            max_key_length=max_key_length,
+            max_value_length=max_value_length,
+            max_keys_per_mapping=max_keys_per_mapping,
+            count_holes=count_holes,
+            interner=interner,
+            set_value=_set_path,
+        )
+    if budget is not None:
+        budget.charge(fields=seen_fields, input_bytes=len(qs))
+    return index
@@ -0,0 +1,375 @@
+"""
+Django forms which bind straight to the nested data `query` produces, rather
+than to flat, prefixed field names.
+
+A `NestedForm` takes the nested dictionary (such as `request.POST` once
+`views.RequestParser` has run) as its data, and other forms can be nested
+inside it with `FormField` (a single dictionary) and `FormSetField` (a list of
+dictionaries, like a formset):
+
+    class AddressForm(NestedForm):
+        street = forms.CharField()
+
+    class PersonForm(NestedForm):
+        name = forms.CharField()
+        address = FormField(AddressForm)
+        previous = FormSetField(AddressForm, max_num=10)
+
+Validating the outer form validates everything inside it as it goes, in a
+single pass over the data, and how each field gets its value is worked out
+once per form class rather than for every form.
+
+Like `views`, this imports Django, so is only loaded once it's asked for.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.forms import DeclarativeFieldsMetaclass
+from django.utils.translation import gettext_lazy as _, ngettext_lazy
+
+from .query import _dump_value
+
+__all__ = ["NestedForm", "FormField", "FormSetField"]
+
+# How each field gets its value out of the (nested) data and files.
+_VALUE = 0
+_LIST = 1
+_FILE = 2
+_FORM = 3
+_FORMSET = 4
+
+
+class FormField(forms.Field):
+    """
+    A field whose value is a dictionary, validated by its own `form_class`
+    (a `NestedForm`), and cleaned to that form's `cleaned_data`.
+    """
+
+    default_error_messages = {
+        "invalid": _("Correct the errors below."),
+    }
+
+    def __init__(self, form_class, **kwargs):
+        if not issubclass(form_class, NestedForm):
+            raise TypeError(
+                f"{form_class.__name__} must be a subclass of NestedForm"
+            )
+        self.form_class = form_class
+        super().__init__(**kwargs)
+
+    def bind(self, value, files=None, renderer=None) -> Optional["NestedForm"]:
+        """
+        Return the bound form for `value`, or None if there's nothing to bind.
+        """
+        if value in self.empty_values:
+            if self.required:
+                raise ValidationError(
+                    self.error_messages["required"], code="required"
+                )
+            return None
+        if not isinstance(value, dict):
+            raise ValidationError(self.error_messages["invalid"], code="invalid")
+        return self.form_class(
+            data=value,
+            files=files if isinstance(files, dict) else None,
+            use_required_attribute=False,
+            renderer=renderer,
+        )
+
+    def clean_bound(self, form: Optional["NestedForm"]) -> Optional[Dict[str, Any]]:
+        if form is None:
+            return None
+        if not form.is_valid():
+            raise ValidationError(self.error_messages["invalid"], code="invalid")
+        self.run_validators(form.cleaned_data)
+        return form.cleaned_data
+
+    def clean(self, value, files=None):
+        return self.clean_bound(self.bind(value, files))
+
+
+class FormSetField(forms.Field):
+    """
+    A field whose value is a list of dictionaries, each validated by its own
+    `form_class` (a `NestedForm`), and cleaned to the list of their
+    `cleaned_data`.
+
+    Rows which are empty (like those backfilled for a sparse index such as
+    rows[0]...&rows[5]...), and with `can_delete`, those with a true DELETE
+    value, are skipped, and left out of the result. At least `min_num` and
+    at most `max_num` rows must be given; the latter is checked before any of
+    them are bound.
+    """
+
+    default_error_messages = {
+        "invalid": _("Correct the errors below."),
+        "too_few_forms": ngettext_lazy(
+            "Please submit at least %(num)d form.",
+            "Please submit at least %(num)d forms.",
+            "num",
+        ),
+        "too_many_forms": ngettext_lazy(
+            "Please submit at most %(num)d form.",
+            "Please submit at most %(num)d forms.",
+            "num",
+        ),
+    }
+
+    def __init__(
+        self,
+        form_class,
+        *,
+        min_num: int = 0,
+        max_num: int = 1000,
+        can_delete: bool = False,
+        required: bool = False,
+        **kwargs,
+    ):
+        if not issubclass(form_class, NestedForm):
+            raise TypeError(
+                f"{form_class.__name__} must be a subclass of NestedForm"
+            )
+        self.form_class = form_class
+        self.min_num = min_num
+        self.max_num = max_num
+        self.can_delete = can_delete
+        super().__init__(required=required, **kwargs)
+
+    def bind(self, value, files=None, renderer=None) -> List[Optional["NestedForm"]]:
+        """
+        Return a bound form for each row of `value`, with None in place of
+        any which are skipped.
+        """
+        if value in self.empty_values:
+            if self.required:
+                raise ValidationError(
+                    self.error_messages["required"], code="required"
+                )
+            return []
+        if not isinstance(value, list):
+            raise ValidationError(self.error_messages["invalid"], code="invalid")
+        if len(value) > self.max_num:
+            raise ValidationError(
+                self.error_messages["too_many_forms"] % {"num": self.max_num},
+                code="too_many_forms",
+            )
+
+        if not isinstance(files, list):
+            files = ()
+        form_class = self.form_class
+        bound = []
+        for i, row in enumerate(value):
+            if row in self.empty_values:
+                bound.append(None)
+                continue
+            if not isinstance(row, dict):
+                raise ValidationError(
+                    self.error_messages["invalid"], code="invalid"
+                )
+            if self.can_delete and _DELETE.clean(row.get("DELETE")):
+                bound.append(None)
+                continue
+            row_files = files[i] if i < len(files) else None
+            bound.append(
+                form_class(
+                    data=row,
+                    files=row_files if isinstance(row_files, dict) else None,
+                    use_required_attribute=False,
+                    renderer=renderer,
+                )
+            )
+        return bound
+
+    def clean_bound(self, bound: List[Optional["NestedForm"]]) -> List[Dict[str, Any]]:
+        # Every row is validated (so all their errors are available), before
+        # any of them are reported.
+        invalid = False
+        for form in bound:
+            if form is not None and not form.is_valid():
+                invalid = True
+        if invalid:
+            raise ValidationError(self.error_messages["invalid"], code="invalid")
+        cleaned = [form.cleaned_data for form in bound if form is not None]
+        if len(cleaned) < self.min_num:
+            raise ValidationError(
+                self.error_messages["too_few_forms"] % {"num": self.min_num},
+                code="too_few_forms",
+            )
+        self.run_validators(cleaned)
+        return cleaned
+
+    def clean(self, value, files=None):
+        return self.clean_bound(self.bind(value, files))
+
+
+# Only used for interpreting DELETE values the same way a formset would.
+_DELETE = forms.BooleanField(required=False)
+
+
+def _describe(form_class, name: str, field: forms.Field) -> Tuple[int, Optional[str]]:
+    if isinstance(field, FormSetField):
+        kind = _FORMSET
+    elif isinstance(field, FormField):
+        kind = _FORM
+    elif isinstance(field, forms.FileField):
+        kind = _FILE
+    elif isinstance(field, forms.MultiValueField) or getattr(
+        field.widget, "allow_multiple_selected", False
+    ):
+        kind = _LIST
+    else:
+        kind = _VALUE
+    clean_method = f"clean_{name}"
+    return kind, clean_method if hasattr(form_class, clean_method) else None
+
+
+class _SharedFields(dict):
+    """
+    The `base_fields` of a form class with `copy_fields = False`, which every
+    instance uses as it is, rather than each having a deep copy.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class NestedFormMetaclass(DeclarativeFieldsMetaclass):
+    """
+    Works out how each of the declared fields gets its value, and whether
+    there's a clean_<name> method for it, once for the whole class.
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        new_class = super().__new__(mcs, name, bases, attrs)
+        if not new_class.copy_fields:
+            new_class.base_fields = _SharedFields(new_class.base_fields)
+        new_class._field_kinds = {
+            field_name: _describe(new_class, field_name, field)
+            for field_name, field in new_class.base_fields.items()
+        }
+        return new_class
+
+
+class NestedForm(forms.BaseForm, metaclass=NestedFormMetaclass):
+    """
+    A form whose `data` (and `files`) are nested dictionaries, as produced by
+    `query.loads` or `views.RequestParser`, with each field's value being
+    found directly under its name. Values which were coerced are turned back
+    into the strings that were sent (as `query.dumps` would write them) before
+    being cleaned, so fields see the same thing they would from a `QueryDict`.
+
+    Fields whose widgets take several values (such as `MultipleChoiceField`)
+    and `MultiValueField`s take a list; any other field given a list takes the
+    last value, as it would from a `QueryDict`.
+
+    After validation, `nested` holds the bound form for each `FormField` and
+    the list of bound forms (None for skipped rows) for each `FormSetField`,
+    for getting at their errors.
+
+    Like any Django form, each instance gets its own deep copy of the fields,
+    so that they can be changed for just that instance. That's most of the
+    cost of binding a small form, so forms which never change their fields
+    (for instance, the rows of a large `FormSetField`) can set
+    `copy_fields = False` to have every instance share the class's fields.
+    """
+
+    copy_fields = True
+
+    nested: Dict[str, Any]
+
+    @classmethod
+    def key_shapes(cls) -> List[str]:
+        """
+        The shapes of the keys this form reads its values from, in the form
+        `query.PathPlan.from_shapes` takes, with the indexes of lists as [N]:
+        "name", "address[street]" and "previous[N][street]" for the form in
+        the module's docstring. Files, which aren't in the query string or
+        form body as such, are left out.
+        """
+        shapes = []
+        for name, (kind, clean_method) in cls._field_kinds.items():
+            if kind == _FORM or kind == _FORMSET:
+                prefix = f"{name}[N]" if kind == _FORMSET else name
+                for shape in cls.base_fields[name].form_class.key_shapes():
+                    # street[x] becomes address[street][x]
+                    first, bracket, rest = shape.partition("[")
+                    shapes.append(f"{prefix}[{first}]{bracket}{rest}")
+            elif kind == _LIST:
+                shapes.append(f"{name}[N]")
+            elif kind == _VALUE:
+                shapes.append(name)
+        return shapes
+
+    def _field_kind(self, name: str, field: forms.Field) -> Tuple[int, Optional[str]]:
+        try:
+            return self._field_kinds[name]
+        except KeyError:
+            # Added to this instance's fields after the class was made.
+            return _describe(self.__class__, name, field)
+
+    def _value(self, name: str, kind: int) -> Any:
+        if kind == _FILE:
+            value = self.files.get(name)
+            if isinstance(value, list) and not getattr(
+                self.fields[name].widget, "allow_multiple_selected", False
+            ):
+                value = value[-1] if value else None
+            return value
+        value = self.data.get(name)
+        if kind == _FORM or kind == _FORMSET:
+            return value
+        if kind == _LIST:
+            if value is None:
+                return []
+            if not isinstance(value, list):
+                value = [value]
+            return [
+                item if isinstance(item, str) or item is None else _dump_value(item)
+                for item in value
+            ]
+        if isinstance(value, list):
+            value = value[-1] if value else None
+        if isinstance(value, (dict, list)):
+            raise ValidationError(_("Enter a valid value."), code="invalid")
+        if isinstance(value, str) or value is None:
+            return value
+        return _dump_value(value)
+
+    def _widget_data_value(self, widget, html_name):
+        # Used by BoundField (for rendering and has_changed()), which only
+        # has the prefixed name to go on.
+        name = html_name[len(self.prefix) + 1 :] if self.prefix else html_name
+        field = self.fields.get(name)
+        if field is None:
+            return super()._widget_data_value(widget, html_name)
+        try:
+            return self._value(name, self._field_kind(name, field)[0])
+        except ValidationError:
+            return None
+
+    def _clean_fields(self):
+        self.nested = {}
+        cleaned_data = self.cleaned_data
+        for name, field in self.fields.items():
+            kind, clean_method = self._field_kind(name, field)
+            try:
+                if field.disabled:
+                    value = self.get_initial_for_field(field, name)
+                else:
+                    value = self._value(name, kind)
+                if kind == _FORM or kind == _FORMSET:
+                    bound = field.bind(
+                        value, self.files.get(name), renderer=self.renderer
+                    )
+                    self.nested[name] = bound
+                    value = field.clean_bound(bound)
+                elif kind == _FILE:
+                    value = field.clean(value, self.get_initial_for_field(field, name))
+                else:
+                    value = field.clean(value)
+                cleaned_data[name] = value
+                if clean_method is not None:
+                    cleaned_data[name] = getattr(self, clean_method)()
+            except ValidationError as e:
+                self.add_error(name, e)
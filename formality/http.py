@@ -0,0 +1,261 @@
+import copy
+from functools import partial
+from urllib.parse import quote, quote_plus
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Tuple, Union
+
+from .query import _coerce_value, _dump_value, _index_or_key, _set_value, _split_key
+
+if TYPE_CHECKING:
+    from .coercion import Coercers
+
+
+class NestedQueryDict(dict):
+    """
+    The nested dictionary produced by `query.loads` or `query.load`, which
+    also provides the flat, multiple-values-per-key API of Django's `QueryDict`
+    (`getlist`, `setlist`, `appendlist`, `lists`, `dict`, `urlencode` and
+    `copy`), so that it can replace `request.GET` or `request.POST` without
+    keeping both around.
+
+    Getting items, iterating and comparing all work on the nested data, as
+    they would for a dictionary. That's where it isn't a drop-in replacement
+    for `QueryDict`: `data["q"]` and `data.get("q")` give the nested, coerced
+    value (a dictionary, a list of every value, or an int) rather than the
+    last value as a string, so code like `request.GET.get("q", "").strip()`
+    needs to use `getlist("q")` or `dict().get("q", "")` instead, which give
+    strings for the flat keys as `QueryDict` would. The flat keys and values are never stored,
+    but worked out from the nested data when asked for: keys are the paths
+    `query.dumps` would use (e.g. a[0][b]), apart from lists of values at the
+    top level, which are repeated under the same key (c=1&c=2&c=3), as Django
+    would have them. If the data was coerced, values are turned back into the
+    strings `query.dumps` would write (given the same `coercion.Coercers`
+    registry, if it was coerced with one); otherwise they're given as they are.
+
+    Like `QueryDict`, it's immutable unless `mutable=True` is given, and
+    `copy()` gives back a mutable (deep) copy.
+    """
+
+    __slots__ = ("_mutable", "encoding", "coerced")
+
+    def __init__(
+        self,
+        data=None,
+        *,
+        mutable: bool = False,
+        encoding: str = "utf-8",
+        coerced: Union[bool, "Coercers"] = True,
+    ):
+        super().__init__(data or ())
+        self._mutable = mutable
+        self.encoding = encoding
+        self.coerced = coerced
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {dict.__repr__(self)}>"
+
+    def _assert_mutable(self):
+        if not self._mutable:
+            raise AttributeError(
+                f"This {self.__class__.__name__} instance is immutable"
+            )
+
+    def __setitem__(self, key, value):
+        self._assert_mutable()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._assert_mutable()
+        super().__delitem__(key)
+
+    def __ior__(self, other):
+        self._assert_mutable()
+        return super().__ior__(other)
+
+    def clear(self):
+        self._assert_mutable()
+        super().clear()
+
+    def pop(self, *args):
+        self._assert_mutable()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._assert_mutable()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._assert_mutable()
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._assert_mutable()
+        super().update(*args, **kwargs)
+
+    def __copy__(self):
+        return self.__class__(
+            self, mutable=True, encoding=self.encoding, coerced=self.coerced
+        )
+
+    def __deepcopy__(self, memo):
+        result = self.__class__(
+            mutable=True, encoding=self.encoding, coerced=self.coerced
+        )
+        memo[id(self)] = result
+        for key, value in self.items():
+            dict.__setitem__(result, copy.deepcopy(key, memo), copy.deepcopy(value, memo))
+        return result
+
+    def __reduce__(self):
+        # The default would set the items before restoring whether that's
+        # allowed, so rebuild it with everything in one go instead.
+        return (
+            partial(
+                self.__class__,
+                mutable=self._mutable,
+                encoding=self.encoding,
+                coerced=self.coerced,
+            ),
+            (dict(self),),
+        )
+
+    def copy(self) -> "NestedQueryDict":
+        """
+        Return a mutable copy of this object, as `QueryDict.copy` does.
+        """
+        return copy.deepcopy(self)
+
+    def _format(self, value: Any) -> Any:
+        if self.coerced is True:
+            return _dump_value(value)
+        return self.coerced.dump(value) if self.coerced else value
+
+    def _parse(self, value: Any) -> Any:
+        if not self.coerced or not value or not isinstance(value, str):
+            return value
+        if self.coerced is True:
+            return _coerce_value(value)
+        return self.coerced.load(value)
+
+    def getlist(self, key: str, default: Optional[List[Any]] = None) -> List[Any]:
+        """
+        Return the list of values for the flat `key` (e.g. a[0][b]), or
+        `default` (an empty list unless given) if there isn't one. Besides the
+        keys `lists()` gives, the path of any list of values may be used, with
+        or without a trailing [], like a[b] or a[b][] for a[b][]=1&a[b][]=2.
+        """
+        value = _lookup(self, _split_key(key)) if key else _MISSING
+        if isinstance(value, list) and not _has_containers(value):
+            return [self._format(item) for item in value]
+        if value is _MISSING or isinstance(value, (dict, list)):
+            return [] if default is None else default
+        return [self._format(value)]
+
+    def setlist(self, key: str, list_: List[Any]):
+        """
+        Set the values for the flat `key` (any key `getlist` takes) to those
+        in `list_`, coerced as they would have been when parsed, so that
+        `getlist` gives them back. As when parsing, a single value is stored
+        on its own rather than as a list of one, and the dictionaries and lists
+        on the way to it are created if needed.
+        """
+        self._assert_mutable()
+        parts = _split_key(key)
+        # a[b][] is the list at a[b], as for getlist.
+        if 1 < len(parts) and not parts[-1]:
+            parts.pop()
+        values = [self._parse(value) for value in list_]
+        value = values[0] if len(values) == 1 else values
+        if len(parts) == 1:
+            self[parts[0]] = value
+        else:
+            _set_value(self, parts, value)
+
+    def appendlist(self, key: str, value: Any):
+        """
+        Add `value` to the values for the flat `key`, as `setlist` would,
+        turning a single value into a list of both.
+        """
+        self.setlist(key, [*self.getlist(key), value])
+
+    def lists(self) -> Iterator[Tuple[str, List[Any]]]:
+        """
+        Yield each flat key, along with the list of values for it.
+        """
+        for key, value in self.items():
+            key = str(key)
+            if isinstance(value, list) and not _has_containers(value):
+                if value:
+                    yield key, [self._format(item) for item in value]
+            else:
+                for path, item in _flatten(key, value):
+                    yield path, [self._format(item)]
+
+    def dict(self) -> dict:
+        """
+        Return the flat keys with the last value for each, as `QueryDict.dict`
+        does.
+        """
+        return {key: values[-1] for key, values in self.lists()}
+
+    def urlencode(self, safe: Optional[str] = None) -> str:
+        """
+        Return the flat keys and values as a query string. Characters in `safe`
+        are left unencoded, as with `QueryDict.urlencode`.
+        """
+        if safe:
+            encode = partial(quote, safe=safe, encoding=self.encoding)
+        else:
+            encode = partial(quote_plus, encoding=self.encoding)
+        return "&".join(
+            f"{encode(key)}={encode(value if isinstance(value, str) else str(value))}"
+            for key, values in self.lists()
+            for value in values
+        )
+
+
+_MISSING = object()
+
+
+def _has_containers(values: List[Any]) -> bool:
+    return any(isinstance(value, (dict, list)) for value in values)
+
+
+def _lookup(data: dict, parts: List[str]) -> Any:
+    """
+    Follow the `parts` of a split key down through `data`, trying each part
+    as it is and then as a list index. A trailing empty part (as in a[]) refers
+    to the list itself.
+    """
+    value = data
+    last = len(parts) - 1
+    for i, part in enumerate(parts):
+        if isinstance(value, list) and not part and i == last:
+            return value
+        if not isinstance(value, (dict, list)):
+            return _MISSING
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+            continue
+        part = _index_or_key(part)
+        if isinstance(value, dict):
+            if part not in value:
+                return _MISSING
+        elif not isinstance(part, int) or len(value) <= part:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _flatten(prefix: str, value: Any) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield the path and value of everything under `prefix`, using the same
+    paths as `query.dumps`.
+    """
+    if isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from _flatten(f"{prefix}[{i}]", item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(f"{prefix}[{key}]", item)
+    else:
+        yield prefix, value
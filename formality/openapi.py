@@ -0,0 +1,493 @@
+"""
+OpenAPI documents generated from the forms of form-based views, using the
+bracketed (deepObject-style) parameters `query.loads` understands.
+
+A view is documented if it has a `form_class` (describing the body of its
+POST, PUT and PATCH requests) and/or a `query_form_class` (describing the
+query string of its GET requests), either as attributes of a class-based
+view (or given to `as_view()`), or set on a function view.
+
+Generating the document means walking the whole URLconf, so `get_schema`
+only does it once per process (for each set of arguments), or not at all if
+given an `artifact` written at deploy time with `Schema.save()`, or by
+running::
+
+    DJANGO_SETTINGS_MODULE=... python -m formality.openapi openapi.json
+
+`SchemaView` then serves the document from memory, with an ETag so that
+clients (such as Swagger UI or ReDoc) that already have it get a 304.
+
+Like `views`, this imports Django, so is only loaded once it's asked for.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django import forms
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.urls.resolvers import RegexPattern
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from .forms import FormField, FormSetField
+
+__all__ = ["Schema", "generate", "get_schema", "SchemaView"]
+
+OPENAPI_VERSION = "3.1.0"
+
+_BODY_METHODS = ("post", "put", "patch")
+_PATH_PARAMETER = re.compile(r"<(?:(?P<converter>[^>:]+):)?(?P<name>[^>]+)>")
+_REGEX_GROUP = re.compile(r"\(\?P<(?P<name>\w+)>(?:[^()]|\([^()]*\))*\)")
+_CONVERTER_SCHEMAS = {
+    "int": {"type": "integer"},
+    "uuid": {"type": "string", "format": "uuid"},
+}
+
+
+class Schema:
+    """
+    A generated (or loaded) OpenAPI document, kept as the exact bytes which
+    are served, along with the ETag for them.
+    """
+
+    __slots__ = ("content", "etag", "_document")
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()}"'
+        self._document = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {self.etag}>"
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "Schema":
+        return cls(json.dumps(document, separators=(",", ":")).encode())
+
+    @classmethod
+    def load(cls, path: str) -> "Schema":
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.content)
+
+    @property
+    def document(self) -> Dict[str, Any]:
+        """
+        The document as a dictionary, only decoded if it's asked for.
+        """
+        if self._document is None:
+            self._document = json.loads(self.content)
+        return self._document
+
+
+def generate(
+    urlconf=None, *, title: str = "API", version: str = "1.0.0"
+) -> Dict[str, Any]:
+    """
+    Build the OpenAPI document for every form-based view in `urlconf`
+    (the project's ROOT_URLCONF unless given).
+    """
+    builder = _Builder()
+    paths: Dict[str, Dict[str, Any]] = {}
+    for path, callback, converters in _iter_views(get_resolver(urlconf)):
+        form_class, query_form_class = _view_forms(callback)
+        if form_class is None and query_form_class is None:
+            continue
+        path_parameters = [
+            {
+                "name": name,
+                "in": "path",
+                "required": True,
+                "schema": _CONVERTER_SCHEMAS.get(converter, {"type": "string"}),
+            }
+            for name, converter in converters
+        ]
+        operations = paths.setdefault(path, {})
+        for method in _view_methods(callback, form_class, query_form_class):
+            operation = builder.operation(
+                callback, method, form_class, query_form_class
+            )
+            if path_parameters:
+                operation["parameters"] = [
+                    *path_parameters,
+                    *operation.get("parameters", ()),
+                ]
+            operations[method] = operation
+    return {
+        "openapi": OPENAPI_VERSION,
+        "info": {"title": title, "version": version},
+        "paths": paths,
+        "components": {"schemas": builder.components},
+    }
+
+
+_schemas: Dict[Tuple[Any, ...], Schema] = {}
+_lock = threading.Lock()
+
+
+def get_schema(
+    urlconf=None,
+    *,
+    title: str = "API",
+    version: str = "1.0.0",
+    artifact: Optional[str] = None,
+) -> Schema:
+    """
+    Return the `Schema` for `urlconf`, only generating it the first time it's
+    asked for in this process. If `artifact` is the path of an existing file
+    (written by `Schema.save()`), that's loaded instead, and nothing is
+    introspected at all.
+    """
+    key = (urlconf, title, version, artifact)
+    try:
+        return _schemas[key]
+    except KeyError:
+        pass
+    with _lock:
+        # Another thread may have got here first.
+        if key not in _schemas:
+            if artifact is not None and os.path.exists(artifact):
+                schema = Schema.load(artifact)
+            else:
+                schema = Schema.from_document(
+                    generate(urlconf, title=title, version=version)
+                )
+            _schemas[key] = schema
+        return _schemas[key]
+
+
+class SchemaView(View):
+    """
+    Serves the (cached) OpenAPI document from `get_schema`, with an ETag, and
+    a 304 Not Modified for requests which already have it. The arguments for
+    `get_schema` are attributes, so can be given to `as_view()`:
+
+        path("openapi.json", SchemaView.as_view(title="Shop", artifact="openapi.json"))
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    urlconf = None
+    title = "API"
+    version = "1.0.0"
+    artifact: Optional[str] = None
+
+    def get_schema(self) -> Schema:
+        return get_schema(
+            self.urlconf,
+            title=self.title,
+            version=self.version,
+            artifact=self.artifact,
+        )
+
+    def get(self, request, *args, **kwargs):
+        schema = self.get_schema()
+        response = get_conditional_response(request, etag=schema.etag)
+        if response is None:
+            response = HttpResponse(
+                schema.content, content_type="application/vnd.oai.openapi+json"
+            )
+        response["ETag"] = schema.etag
+        return response
+
+
+def _iter_views(
+    resolver: URLResolver, prefix: str = "", converters: Tuple = ()
+) -> Iterator[Tuple[str, Any, Tuple[Tuple[str, str], ...]]]:
+    """
+    Yield the OpenAPI path, callback and path parameters (name and converter)
+    of every view in `resolver`, including those of any it includes.
+    """
+    for pattern in resolver.url_patterns:
+        route, parameters = _route(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _iter_views(
+                pattern, prefix + route, converters + parameters
+            )
+        elif isinstance(pattern, URLPattern):
+            yield "/" + prefix + route, pattern.callback, converters + parameters
+
+
+def _route(pattern) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    route = str(pattern)
+    if isinstance(pattern, RegexPattern):
+        # A re_path(), which can only be approximated.
+        parameters = tuple(
+            (match["name"], "str") for match in _REGEX_GROUP.finditer(route)
+        )
+        route = _REGEX_GROUP.sub(r"{\g<name>}", route.lstrip("^").rstrip("$"))
+        return route.replace("\\", ""), parameters
+    parameters = tuple(
+        (match["name"], match["converter"] or "str")
+        for match in _PATH_PARAMETER.finditer(route)
+    )
+    return _PATH_PARAMETER.sub(r"{\g<name>}", route), parameters
+
+
+def _view_forms(callback) -> Tuple[Optional[type], Optional[type]]:
+    initkwargs = getattr(callback, "view_initkwargs", {})
+    view = getattr(callback, "view_class", callback)
+    return (
+        initkwargs.get("form_class", getattr(view, "form_class", None)),
+        initkwargs.get("query_form_class", getattr(view, "query_form_class", None)),
+    )
+
+
+def _view_methods(callback, form_class, query_form_class) -> List[str]:
+    view_class = getattr(callback, "view_class", None)
+    if view_class is not None:
+        return [
+            method
+            for method in view_class.http_method_names
+            if method not in ("head", "options") and hasattr(view_class, method)
+        ]
+    methods = []
+    if query_form_class is not None:
+        methods.append("get")
+    if form_class is not None:
+        methods.append("post")
+    return methods
+
+
+class _Builder:
+    """
+    Builds the operations of a document, collecting a component schema for
+    each distinct form class along the way, so that forms used by several
+    views (or nested in several forms) are only described once.
+    """
+
+    __slots__ = ("components", "names", "operation_ids")
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.names: Dict[type, str] = {}
+        self.operation_ids: Dict[str, int] = {}
+
+    def operation(self, callback, method, form_class, query_form_class):
+        view = getattr(callback, "view_class", callback)
+        operation_id = f"{view.__name__}_{method}"
+        # Views may be routed more than once.
+        seen = self.operation_ids.get(operation_id, 0)
+        self.operation_ids[operation_id] = seen + 1
+        if seen:
+            operation_id = f"{operation_id}_{seen + 1}"
+
+        operation: Dict[str, Any] = {
+            "operationId": operation_id,
+            "responses": {"default": {"description": "The view's response"}},
+        }
+        if view.__doc__:
+            operation["description"] = view.__doc__.strip()
+        if method == "get" and query_form_class is not None:
+            operation["parameters"] = self.parameters(query_form_class)
+        elif method in _BODY_METHODS and form_class is not None:
+            operation["requestBody"] = self.request_body(form_class)
+        return operation
+
+    def parameters(self, form_class) -> List[Dict[str, Any]]:
+        parameters = []
+        for name, field in form_class.base_fields.items():
+            schema = self.field(field)
+            parameter = {"name": name, "in": "query", "schema": schema}
+            if field.required and not field.disabled:
+                parameter["required"] = True
+            if field.help_text:
+                parameter["description"] = str(field.help_text)
+            kind = schema.get("type")
+            if kind == "object" or "$ref" in schema:
+                parameter.update(style="deepObject", explode=True)
+            elif kind == "array":
+                if _is_object_array(schema):
+                    parameter.update(style="deepObject", explode=True)
+                else:
+                    # Repeated a[]=1&a[]=2, as dumps writes them.
+                    parameter.update(name=f"{name}[]", style="form", explode=True)
+            parameters.append(parameter)
+        return parameters
+
+    def request_body(self, form_class) -> Dict[str, Any]:
+        schema = {"$ref": self.component(form_class)}
+        if _has_files(form_class):
+            content = {"multipart/form-data": {"schema": schema}}
+        else:
+            content = {
+                "application/x-www-form-urlencoded": {
+                    "schema": schema,
+                    "encoding": {
+                        name: {"style": "deepObject", "explode": True}
+                        for name, field in form_class.base_fields.items()
+                        if isinstance(field, (FormField, FormSetField))
+                        or _is_list_field(field)
+                    },
+                }
+            }
+        return {"required": True, "content": content}
+
+    def component(self, form_class) -> str:
+        name = self.names.get(form_class)
+        if name is None:
+            name = form_class.__name__
+            if name in self.components:
+                # A different form with the same name.
+                name = f"{form_class.__module__}.{form_class.__qualname__}".replace(
+                    "<locals>.", ""
+                )
+            self.names[form_class] = name
+            # Reserved before describing the fields, in case one refers back.
+            self.components[name] = {}
+            self.components[name] = self.form(form_class)
+        return f"#/components/schemas/{name}"
+
+    def form(self, form_class) -> Dict[str, Any]:
+        properties = {}
+        required = []
+        for name, field in form_class.base_fields.items():
+            properties[name] = self.field(field)
+            if field.required and not field.disabled:
+                required.append(name)
+        schema: Dict[str, Any] = {"type": "object", "properties": properties}
+        if required:
+            schema["required"] = required
+        if form_class.__doc__:
+            schema["description"] = form_class.__doc__.strip()
+        return schema
+
+    def field(self, field: forms.Field) -> Dict[str, Any]:
+        if isinstance(field, FormSetField):
+            schema = {"type": "array", "items": {"$ref": self.component(field.form_class)}}
+            if field.min_num:
+                schema["minItems"] = field.min_num
+            schema["maxItems"] = field.max_num
+        elif isinstance(field, FormField):
+            schema = {"$ref": self.component(field.form_class)}
+        else:
+            schema = _field_schema(field)
+        if field.label:
+            schema = {**schema, "title": str(field.label)}
+        if field.help_text:
+            schema = {**schema, "description": str(field.help_text)}
+        initial = field.initial
+        if isinstance(initial, (str, int, float, bool)) and initial != "":
+            schema = {**schema, "default": initial}
+        return schema
+
+
+def _field_schema(field: forms.Field) -> Dict[str, Any]:
+    # The more specific fields come first, as many are subclasses of others.
+    if isinstance(field, forms.FileField):
+        schema = {"type": "string", "format": "binary"}
+    elif isinstance(field, forms.NullBooleanField):
+        schema = {"type": ["boolean", "null"]}
+    elif isinstance(field, forms.BooleanField):
+        schema = {"type": "boolean"}
+    elif isinstance(field, forms.IntegerField) and not isinstance(
+        field, (forms.FloatField, forms.DecimalField)
+    ):
+        schema = {"type": "integer"}
+        _add_limits(field, schema)
+    elif isinstance(field, (forms.FloatField, forms.DecimalField)):
+        schema = {"type": "number"}
+        _add_limits(field, schema)
+    elif isinstance(field, (forms.ModelChoiceField, forms.ModelMultipleChoiceField)):
+        # Listing the choices would mean querying the database.
+        schema = {"type": "string"}
+        if isinstance(field, forms.ModelMultipleChoiceField):
+            schema = {"type": "array", "items": schema}
+    elif isinstance(field, forms.MultipleChoiceField):
+        schema = {"type": "array", "items": {"type": "string", "enum": _choices(field)}}
+    elif isinstance(field, forms.ChoiceField):
+        schema = {"type": "string", "enum": _choices(field)}
+    elif isinstance(field, forms.MultiValueField):
+        schema = {
+            "type": "array",
+            "prefixItems": [_field_schema(subfield) for subfield in field.fields],
+        }
+    elif isinstance(field, forms.JSONField):
+        schema = {}
+    else:
+        schema = {"type": "string"}
+        for field_class, format in (
+            (forms.EmailField, "email"),
+            (forms.URLField, "uri"),
+            (forms.UUIDField, "uuid"),
+            (forms.DateTimeField, "date-time"),
+            (forms.DateField, "date"),
+            (forms.TimeField, "time"),
+            (forms.DurationField, "duration"),
+        ):
+            if isinstance(field, field_class):
+                schema["format"] = format
+                break
+        if getattr(field, "max_length", None) is not None:
+            schema["maxLength"] = field.max_length
+        if getattr(field, "min_length", None) is not None:
+            schema["minLength"] = field.min_length
+    return schema
+
+
+def _add_limits(field: forms.Field, schema: Dict[str, Any]):
+    for attr, keyword in (("max_value", "maximum"), ("min_value", "minimum")):
+        value = getattr(field, attr, None)
+        if value is not None:
+            # DecimalField's may be Decimals, which JSON can't have.
+            schema[keyword] = value if isinstance(value, int) else float(value)
+
+
+def _choices(field: forms.ChoiceField) -> List[str]:
+    values = []
+    for value, label in field.choices:
+        # Named groups have their choices in place of a label.
+        if isinstance(label, (list, tuple)):
+            values.extend(str(value) for value, _ in label)
+        elif value != "":
+            values.append(str(value))
+    return values
+
+
+def _is_list_field(field: forms.Field) -> bool:
+    return isinstance(field, forms.MultiValueField) or getattr(
+        field.widget, "allow_multiple_selected", False
+    )
+
+
+def _is_object_array(schema: Dict[str, Any]) -> bool:
+    items = schema.get("items", {})
+    return "$ref" in items or items.get("type") == "object"
+
+
+def _has_files(form_class, seen=None) -> bool:
+    seen = set() if seen is None else seen
+    seen.add(form_class)
+    for field in form_class.base_fields.values():
+        if isinstance(field, forms.FileField):
+            return True
+        if (
+            isinstance(field, (FormField, FormSetField))
+            and field.form_class not in seen
+            and _has_files(field.form_class, seen)
+        ):
+            return True
+    return False
+
+
+def main(path: str = "openapi.json", title: str = "API", version: str = "1.0.0"):
+    """
+    Write the document for the project's ROOT_URLCONF to `path`, to be used
+    as the `artifact` for `get_schema` or `SchemaView`.
+    """
+    import django
+
+    django.setup()
+    Schema.from_document(generate(title=title, version=version)).save(path)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
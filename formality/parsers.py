@@ -0,0 +1,502 @@
+"""
+Parsing request bodies into the nested dictionaries `query.loads` produces,
+picking the parser by Content-Type, so that urlencoded, multipart and JSON
+bodies all end up the same shape, and are all held to the same limits
+(`max_num_fields`, `max_depth` and the rest, counted the same way for JSON
+as for the equivalent query string).
+
+`parse(body, content_type)` does the choosing, from `PARSERS` (which more
+can be added to), and every parser takes the same arguments, so that callers
+don't need to know which one they get; including a `query.ParseBudget` as
+`budget`, to share one allowance with the rest of the request.
+
+For JSON, `orjson` is used if it's installed (see `JSON_BACKEND`), and the
+standard library's `json` otherwise; bodies given as file-like objects (or
+iterables of chunks) are instead parsed as they're read, so that the limits
+are enforced without ever holding the whole body.
+"""
+import json
+import math
+from functools import partial
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from . import exceptions
+from .query import (
+    ParseBudget,
+    load,
+    loads,
+    _coerce_value,
+    _too_deep,
+    _too_many_nested_fields,
+)
+from .transcode import _chunks, _json_tokens, _STRING, _VALUE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from .coercion import Coercers
+
+__all__ = [
+    "JSON_BACKEND",
+    "PARSERS",
+    "get_parser",
+    "parse",
+    "parse_urlencoded",
+    "parse_json",
+    "parse_multipart",
+]
+
+Body = Union[bytes, str, BinaryIO, Iterable[bytes]]
+
+
+def _reject_constant(name: str):
+    raise ValueError(f"{name} is not allowed")
+
+
+def _finite_float(text: str) -> float:
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"{text} is too big for a float")
+    return value
+
+
+# Refuses NaN and Infinity, and numbers too big for a float, as orjson does.
+_stdlib_json_loads = partial(
+    json.loads, parse_constant=_reject_constant, parse_float=_finite_float
+)
+# Nor are they allowed when streaming, which gives them as these.
+_NON_FINITE = frozenset(("NaN", "Infinity", "-Infinity"))
+
+# orjson is several times quicker, but unlike json it turns integers too big
+# for 64 bits into floats, and refuses byte order marks.
+JSON_BACKEND = "json" if orjson is None else "orjson"
+_json_loads = _stdlib_json_loads if orjson is None else orjson.loads
+
+
+def _read(body: Body, max_input_bytes: Optional[int], chunk_size: int) -> Union[bytes, str]:
+    """
+    Return the whole of `body`, reading no more than one chunk past
+    `max_input_bytes` if it's a file-like object or an iterable of chunks.
+    """
+    if isinstance(body, (bytes, str)):
+        return body
+    if isinstance(body, (bytearray, memoryview)):
+        return bytes(body)
+    return b"".join(_limited(body, max_input_bytes, chunk_size))
+
+
+def _limited(
+    body: Union[BinaryIO, Iterable[bytes]],
+    max_input_bytes: Optional[int],
+    chunk_size: int,
+    budget: Optional[ParseBudget] = None,
+) -> Iterator[bytes]:
+    if hasattr(body, "read"):
+        body = iter(partial(body.read, chunk_size), b"")
+    length = 0
+    for chunk in body:
+        length += len(chunk)
+        if max_input_bytes is not None and max_input_bytes < length:
+            raise exceptions.DataTooLarge(length, max_input_bytes)
+        if budget is not None:
+            budget.charge(input_bytes=len(chunk))
+        yield chunk
+
+
+def parse_urlencoded(
+    body: Body,
+    content_type: str = "application/x-www-form-urlencoded",
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    chunk_size: int = 65536,
+    budget: Optional[ParseBudget] = None,
+) -> Dict[Union[str, int], Any]:
+    """
+    Parse an `application/x-www-form-urlencoded` body (or a query string)
+    with `query.loads`, using the charset from `content_type` if it has one.
+    """
+    read_limit = max_input_bytes if budget is None else budget.limit_bytes(max_input_bytes)
+    return loads(
+        _read(body, read_limit, chunk_size),
+        encoding=_parameters(content_type).get("charset", encoding),
+        coerce=coerce,
+        max_num_fields=max_num_fields,
+        max_depth=max_depth,
+        max_key_length=max_key_length,
+        max_value_length=max_value_length,
+        max_keys_per_mapping=max_keys_per_mapping,
+        max_input_bytes=max_input_bytes,
+        budget=budget,
+    )
+
+
+def parse_json(
+    body: Body,
+    content_type: str = "application/json",
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    chunk_size: int = 65536,
+    budget: Optional[ParseBudget] = None,
+) -> Dict[Union[str, int], Any]:
+    """
+    Parse a JSON object, which (being UTF-8 and already typed) ignores
+    `encoding` and `coerce`.
+
+    The limits count the same as they would for the query string `query.dumps`
+    would give for the result: every value (or empty object or array) counts
+    once for each part of its path towards `max_num_fields`, so {"a": [{"b": 1}]}
+    counts 3, as a[0][b]=1 would; `max_depth` is how far it's nested below the
+    top level; `max_key_length` applies to each key of each object, and
+    `max_value_length` to each string.
+
+    A bytes or str `body` is decoded in one go by `JSON_BACKEND`, and then
+    checked. Anything else (a file-like object, or an iterable of chunks) is
+    read `chunk_size` at a time, and the result built and checked as it goes,
+    so it stops as soon as any limit is exceeded. Keys repeated in the same
+    object count each time they appear when read that way.
+
+    Throws `MalformedJSON` if it's not valid JSON, or not an object. Whichever
+    way it's read, NaN and Infinity (or numbers too big for a float, which
+    would become Infinity) aren't allowed, as `orjson` doesn't allow them.
+    """
+    if budget is not None:
+        max_num_fields = budget.limit_fields(max_num_fields)
+    limits = dict(
+        max_num_fields=max_num_fields,
+        max_depth=max_depth,
+        max_key_length=max_key_length,
+        max_value_length=max_value_length,
+        max_keys_per_mapping=max_keys_per_mapping,
+    )
+    if isinstance(body, (bytearray, memoryview)):
+        body = bytes(body)
+    if not isinstance(body, (bytes, str)):
+        tokens = _json_tokens(
+            _chunks(_limited(body, max_input_bytes, chunk_size, budget), chunk_size)
+        )
+        try:
+            data, seen_fields = _build_json(tokens, **limits)
+        except ValueError as e:
+            raise exceptions.MalformedJSON(str(e)) from e
+        if budget is not None:
+            budget.charge(fields=seen_fields)
+        return data
+
+    if max_input_bytes is not None and max_input_bytes < len(body):
+        raise exceptions.DataTooLarge(len(body), max_input_bytes)
+    if budget is not None:
+        budget.charge(input_bytes=len(body))
+    try:
+        data = _json_loads(body)
+    except (ValueError, RecursionError) as e:
+        raise exceptions.MalformedJSON(str(e)) from e
+    if not isinstance(data, dict):
+        raise exceptions.MalformedJSON(
+            f"The top level must be an object, not {type(data).__name__}"
+        )
+    seen_fields = _check_json(data, **limits)
+    if budget is not None:
+        budget.charge(fields=seen_fields)
+    return data
+
+
+def _check_json(
+    data: Dict[str, Any],
+    *,
+    max_num_fields: int,
+    max_depth: int,
+    max_key_length: Optional[int],
+    max_value_length: Optional[int],
+    max_keys_per_mapping: Optional[int],
+) -> int:
+    """
+    Apply the limits to an already decoded JSON object, returning the number
+    of fields it counts as.
+    """
+    seen_fields = 0
+    # Each object or array still to check, and the path length of its items.
+    pending = [(data, 1)]
+    while pending:
+        container, length = pending.pop()
+        if max_depth < length - 1:
+            raise _too_deep(max_depth, length - 1)
+        if isinstance(container, dict):
+            if max_keys_per_mapping is not None and max_keys_per_mapping < len(container):
+                raise exceptions.TooManyKeys(
+                    list(container)[max_keys_per_mapping], max_keys_per_mapping
+                )
+            items = container.items()
+        else:
+            items = enumerate(container)
+        for key, value in items:
+            if max_key_length is not None and isinstance(key, str) and max_key_length < len(key):
+                raise exceptions.KeyTooLong(key, max_key_length)
+            if value and isinstance(value, (dict, list)):
+                pending.append((value, length + 1))
+                continue
+            seen_fields += length
+            if max_num_fields < seen_fields:
+                raise _too_many_nested_fields(max_num_fields, seen_fields)
+            if (
+                max_value_length is not None
+                and isinstance(value, str)
+                and max_value_length < len(value)
+            ):
+                raise exceptions.ValueTooLong(key, len(value), max_value_length)
+    return seen_fields
+
+
+def _build_json(
+    tokens: Iterator[Tuple[str, Any]],
+    *,
+    max_num_fields: int,
+    max_depth: int,
+    max_key_length: Optional[int],
+    max_value_length: Optional[int],
+    max_keys_per_mapping: Optional[int],
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Build the object from the tokens of `transcode._json_tokens`, applying the
+    same limits as `_check_json` as each value is added, and return it along
+    with the number of fields it counted as.
+    """
+    kind, value = next(tokens, (None, None))
+    if kind != "{":
+        raise ValueError(
+            f"The top level must be an object, not {kind or 'nothing'!r}"
+        )
+    root: Dict[str, Any] = {}
+    # Each open object or array, along with the key its next value goes in.
+    stack = [[root, None]]
+    expecting = "key_or_end"
+    seen_fields = 0
+    for kind, value in tokens:
+        if expecting == "value" or expecting == "value_or_end":
+            if kind == _STRING or kind == _VALUE or kind == "{" or kind == "[":
+                container, key = stack[-1]
+                length = len(stack)
+                if max_depth < length - 1:
+                    raise _too_deep(max_depth, length - 1)
+                if kind == "{":
+                    item = {}
+                elif kind == "[":
+                    item = []
+                elif kind == _VALUE:
+                    if value in _NON_FINITE:
+                        raise ValueError(f"{value} is not allowed")
+                    item = _coerce_value(value)
+                else:
+                    if max_value_length is not None and max_value_length < len(value):
+                        raise exceptions.ValueTooLong(
+                            len(container) if key is None else key,
+                            len(value),
+                            max_value_length,
+                        )
+                    item = value
+                if key is None:
+                    container.append(item)
+                else:
+                    if (
+                        max_keys_per_mapping is not None
+                        and max_keys_per_mapping <= len(container)
+                        and key not in container
+                    ):
+                        raise exceptions.TooManyKeys(key, max_keys_per_mapping)
+                    container[key] = item
+                if kind == "{":
+                    stack.append([item, None])
+                    expecting = "key_or_end"
+                elif kind == "[":
+                    stack.append([item, None])
+                    expecting = "value_or_end"
+                else:
+                    seen_fields += length
+                    if max_num_fields < seen_fields:
+                        raise _too_many_nested_fields(max_num_fields, seen_fields)
+                    expecting = "comma_or_end"
+                continue
+        elif expecting == "key" or expecting == "key_or_end":
+            if kind == _STRING:
+                if max_key_length is not None and max_key_length < len(value):
+                    raise exceptions.KeyTooLong(value, max_key_length)
+                stack[-1][1] = value
+                expecting = "colon"
+                continue
+        elif expecting == "colon":
+            if kind == ":":
+                expecting = "value"
+                continue
+        elif expecting == "comma_or_end":
+            if kind == ",":
+                is_array = isinstance(stack[-1][0], list)
+                expecting = "value" if is_array else "key"
+                continue
+
+        # Anything else has to be closing the current object or array, and
+        # only where that's allowed.
+        if expecting.endswith("_or_end") and kind == (
+            "]" if isinstance(stack[-1][0], list) else "}"
+        ):
+            container, _ = stack.pop()
+            if not container and stack:
+                # Empty ones count like any other value.
+                seen_fields += len(stack)
+                if max_num_fields < seen_fields:
+                    raise _too_many_nested_fields(max_num_fields, seen_fields)
+            expecting = "comma_or_end" if stack else "nothing"
+            continue
+        raise ValueError(f"Unexpected {kind!r} when expecting {expecting}")
+    if stack:
+        raise ValueError(f"Unexpected end of the JSON when expecting {expecting}")
+    return root, seen_fields
+
+
+def parse_multipart(
+    body: Body,
+    content_type: str,
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    chunk_size: int = 65536,
+    budget: Optional[ParseBudget] = None,
+) -> Dict[Union[str, int], Any]:
+    """
+    Parse a `multipart/form-data` body with Django's parser (using the
+    project's upload handlers and settings), and then nest the fields and the
+    uploaded files together with `query.load`. The boundary comes from
+    `content_type`.
+
+    Unlike the others, this needs Django (with settings configured), which is
+    only imported once it's used.
+    """
+    from django.conf import settings
+    from django.core.files.uploadhandler import load_handler
+    from django.http.multipartparser import MultiPartParser
+
+    if budget is not None:
+        # The body is only checked against what's left, not charged for:
+        # `load` charges for the keys and values, and each file is below.
+        max_input_bytes = budget.limit_bytes(max_input_bytes)
+    body = _read(body, max_input_bytes, chunk_size)
+    if isinstance(body, str):
+        body = body.encode(encoding)
+    if max_input_bytes is not None and max_input_bytes < len(body):
+        raise exceptions.DataTooLarge(len(body), max_input_bytes)
+    encoding = _parameters(content_type).get("charset", encoding)
+    post, files = MultiPartParser(
+        {"CONTENT_TYPE": content_type, "CONTENT_LENGTH": len(body)},
+        BytesIO(body),
+        [load_handler(handler) for handler in settings.FILE_UPLOAD_HANDLERS],
+        encoding,
+    ).parse()
+    if budget is not None:
+        budget.charge(files=sum(len(uploads) for name, uploads in files.lists()))
+    return load(
+        [*post.lists(), *files.lists()],
+        encoding=encoding,
+        coerce=coerce,
+        max_num_fields=max_num_fields,
+        max_depth=max_depth,
+        max_key_length=max_key_length,
+        max_value_length=max_value_length,
+        max_keys_per_mapping=max_keys_per_mapping,
+        budget=budget,
+    )
+
+
+PARSERS: Dict[str, Callable[..., Dict[Union[str, int], Any]]] = {
+    "application/x-www-form-urlencoded": parse_urlencoded,
+    "application/json": parse_json,
+    "multipart/form-data": parse_multipart,
+}
+
+
+def _media_type(content_type: str) -> str:
+    return content_type.partition(";")[0].strip().lower()
+
+
+def _parameters(content_type: str) -> Dict[str, str]:
+    parameters = {}
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        parameters[name.strip().lower()] = value.strip().strip('"')
+    return parameters
+
+
+def get_parser(content_type: str) -> Optional[Callable[..., Dict[Union[str, int], Any]]]:
+    """
+    Return the parser for `content_type` (which may include parameters like
+    the charset), or None if there isn't one. Any +json media type (like
+    application/vnd.api+json) is parsed as JSON.
+    """
+    media_type = _media_type(content_type)
+    parser = PARSERS.get(media_type)
+    if parser is None and media_type.endswith("+json"):
+        parser = PARSERS.get("application/json")
+    return parser
+
+
+def parse(
+    body: Body,
+    content_type: str,
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    chunk_size: int = 65536,
+    budget: Optional[ParseBudget] = None,
+) -> Dict[Union[str, int], Any]:
+    """
+    Parse `body` (bytes, str, a binary file-like object or an iterable of
+    bytes) with the parser for its `content_type`, applying the same limits,
+    and throwing the same exceptions, as `query.loads` whatever the format.
+
+    Throws `ValueError` if there's no parser for the `content_type`; use
+    `get_parser` to check first.
+    """
+    parser = get_parser(content_type)
+    if parser is None:
+        raise ValueError(f"No parser for {_media_type(content_type)!r}")
+    return parser(
+        body,
+        content_type,
+        encoding=encoding,
+        coerce=coerce,
+        max_num_fields=max_num_fields,
+        max_depth=max_depth,
+        max_key_length=max_key_length,
+        max_value_length=max_value_length,
+        max_keys_per_mapping=max_keys_per_mapping,
+        max_input_bytes=max_input_bytes,
+        chunk_size=chunk_size,
+        budget=budget,
+    )
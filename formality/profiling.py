@@ -0,0 +1,172 @@
+"""
+Finding out which keys real traffic actually sends, before tuning limits or
+building `PathPlan`s for it, by sampling the results of parsing.
+
+A `KeyShapeProfiler` given as `profiler` to `query.loads` or `query.load`
+(or set as `RequestParser.profiler`) looks at a random `sample_rate` of the
+results, and tallies the shape of every key in them, with list indexes
+normalised so that filters[0][field] and filters[7][field] are both
+filters[N][field]; how often each is seen, and the types of value it has;
+and histograms of how deep each value is, how wide each dictionary and list
+is, and how many fields each result has. Everything it keeps is bounded, so
+it can be left running, and `to_json()` exports the summary.
+"""
+import json
+import random
+import threading
+from typing import Any, Dict, Optional
+
+__all__ = [
+    "KeyShapeProfiler",
+]
+
+
+def _bucket(number: int) -> str:
+    """
+    The power of two histogram bucket `number` falls into, like "0", "1",
+    "2-3", "4-7" and so on, which keeps the histograms small however wide
+    or large the input is.
+    """
+    if number < 2:
+        return str(number)
+    low = 1 << (number.bit_length() - 1)
+    return f"{low}-{low * 2 - 1}"
+
+
+class KeyShapeProfiler:
+    """
+    Sample parsed results, and aggregate the shapes of their keys.
+
+    `observe(data)` is all the parsing functions call: only a `sample_rate`
+    proportion (0 to 1) of calls go on to walk `data`, so that the rest pay
+    for a single random number. At most `max_shapes` distinct key shapes are
+    tracked; once there are that many, values under new shapes are only
+    counted in total as "other_shapes".
+
+    Safe to share between threads; the tallies are only updated while holding
+    a lock, which is only taken for sampled results (so the count of calls
+    `observed` may come up a little short when threads race to update it).
+    """
+
+    def __init__(self, sample_rate: float = 0.01, *, max_shapes: int = 1000, seed: Optional[int] = None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be between 0 and 1, not {sample_rate!r}")
+        self.sample_rate = sample_rate
+        self.max_shapes = max_shapes
+        self._random = random.Random(seed).random
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {len(self.shapes)} shapes from {self.sampled} samples>"
+
+    def reset(self):
+        """
+        Forget everything observed so far.
+        """
+        with self._lock:
+            self.observed = 0
+            self.sampled = 0
+            self.other_shapes = 0
+            # shape -> [count, {type name: count}]
+            self.shapes: Dict[str, list] = {}
+            self.depths: Dict[int, int] = {}
+            self.widths: Dict[str, int] = {}
+            self.fields: Dict[str, int] = {}
+
+    def observe(self, data: Any):
+        """
+        Tally the shapes in `data` (a result of parsing), if this call is
+        sampled.
+        """
+        self.observed += 1
+        if self._random() < self.sample_rate:
+            self.record(data)
+
+    def record(self, data: Any):
+        """
+        Tally the shapes in `data`, regardless of sampling.
+        """
+        shapes: Dict[str, Dict[str, int]] = {}
+        depths: Dict[int, int] = {}
+        widths: Dict[str, int] = {}
+        fields = 0
+        stack = [(name, value, 0) for name, value in _items(data)]
+        while stack:
+            shape, value, depth = stack.pop()
+            if isinstance(value, dict) and value:
+                widths[_bucket(len(value))] = widths.get(_bucket(len(value)), 0) + 1
+                stack.extend(
+                    (f"{shape}[{'N' if isinstance(key, int) else key}]", item, depth + 1)
+                    for key, item in value.items()
+                )
+                continue
+            if isinstance(value, list) and value:
+                widths[_bucket(len(value))] = widths.get(_bucket(len(value)), 0) + 1
+                index = f"{shape}[N]"
+                stack.extend((index, item, depth + 1) for item in value)
+                continue
+            fields += 1
+            depths[depth] = depths.get(depth, 0) + 1
+            types = shapes.setdefault(shape, {})
+            name = type(value).__name__
+            types[name] = types.get(name, 0) + 1
+
+        with self._lock:
+            self.sampled += 1
+            for shape, types in shapes.items():
+                tally = self.shapes.get(shape)
+                if tally is None:
+                    if len(self.shapes) >= self.max_shapes:
+                        self.other_shapes += sum(types.values())
+                        continue
+                    tally = self.shapes[shape] = [0, {}]
+                tally[0] += sum(types.values())
+                for name, count in types.items():
+                    tally[1][name] = tally[1].get(name, 0) + count
+            for depth, count in depths.items():
+                self.depths[depth] = self.depths.get(depth, 0) + count
+            for width, count in widths.items():
+                self.widths[width] = self.widths.get(width, 0) + count
+            bucket = _bucket(fields)
+            self.fields[bucket] = self.fields.get(bucket, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Everything observed so far, as a JSON-compatible dictionary, with
+        the shapes most often seen first.
+        """
+        with self._lock:
+            shapes = sorted(self.shapes.items(), key=lambda item: (-item[1][0], item[0]))
+            return {
+                "sample_rate": self.sample_rate,
+                "observed": self.observed,
+                "sampled": self.sampled,
+                "shapes": {
+                    shape: {"count": count, "types": dict(types)}
+                    for shape, (count, types) in shapes
+                },
+                "other_shapes": self.other_shapes,
+                "depth": {str(depth): self.depths[depth] for depth in sorted(self.depths)},
+                "width": _sorted_buckets(self.widths),
+                "fields": _sorted_buckets(self.fields),
+            }
+
+    def to_json(self, **kwargs) -> str:
+        """
+        The `summary()` as JSON, passing any `kwargs` on to `json.dumps`.
+        """
+        return json.dumps(self.summary(), **kwargs)
+
+
+def _items(data: Any):
+    if isinstance(data, dict):
+        return [(str(key), value) for key, value in data.items()]
+    return []
+
+
+def _sorted_buckets(buckets: Dict[str, int]) -> Dict[str, int]:
+    return {
+        bucket: buckets[bucket]
+        for bucket in sorted(buckets, key=lambda bucket: int(bucket.partition("-")[0]))
+    }
@@ -4,26 +4,39 @@ import types
 from urllib.parse import unquote, quote_plus
 
 import json.scanner
-from typing import Dict, Union, Text, Any, List, Tuple, Iterator
-from django.core.exceptions import SuspiciousOperation, TooManyFieldsSent
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Callable,
+    Dict,
+    Union,
+    Text,
+    Any,
+    List,
+    Tuple,
+    Iterator,
+    Optional,
+    Iterable,
+)
 
+from . import exceptions
 
-class MalformedData(SuspiciousOperation):
-    """
-    When encountering fields like a[[[] or b[]]] just drop them immediately
-    and loudly.
-    """
+if TYPE_CHECKING:
+    import os
 
-    __slots__ = ("args", "message", "key")
+    from .coercion import Coercers
+    from .profiling import KeyShapeProfiler
 
-    def __init__(self, *args):
-        super().__init__(*args)
-        self.key = args[0]
 
-    def __str__(self):
-        return f"Invalid nesting characters in key {self.key!r}"
+# The exceptions used to live here, and are still available from here, without
+# importing Django until one of them is actually asked for.
+def __getattr__(name):
+    if name in exceptions.__all__:
+        return getattr(exceptions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+# These are read-only views, so sharing them between threads is always safe.
 COERCE_LOAD_CONSTANTS = types.MappingProxyType(
     {
         "true": True,
@@ -47,13 +60,164 @@ COERCE_DUMP_CONSTANTS = types.MappingProxyType(
 )
 
 
+class Interner:
+    """
+    A bounded table of strings, so that key segments (and short values) which
+    get parsed over and over again, like "page" or "asc", resolve to the same
+    str object every time rather than a fresh copy per request.
+
+    Strings longer than `max_length` are never interned. The table is kept
+    in two generations of up to half of `max_size` each: new strings go into
+    the current one, and once that's full it becomes the old one, replacing
+    (and dropping) the previous old generation. Strings from the old
+    generation are moved back into the current one whenever they're used
+    again, so whatever is in use stays interned, and a burst of junk only
+    pushes out strings which haven't been seen since the last time the
+    table filled up.
+
+    Safe to share between threads without any locking (including on free-threaded
+    builds), because every operation on the table is a single dict operation or
+    swapping one generation for another; once warmed up, looking up strings
+    already in the current generation is only ever a read. Threads racing
+    to add entries may take it a handful of entries over `max_size`, or
+    intern the same string twice.
+    """
+
+    __slots__ = ("max_size", "max_length", "_table", "_old")
+
+    def __init__(self, max_size: int = 10000, max_length: int = 64):
+        self.max_size = max_size
+        self.max_length = max_length
+        self._table: Dict[str, str] = {}
+        self._old: Dict[str, str] = {}
+
+    def __call__(self, value: str) -> str:
+        try:
+            return self._table[value]
+        except KeyError:
+            if self.max_length < len(value):
+                return value
+        generation = self.max_size // 2
+        if not generation:
+            return value
+        # Still in use, so carried over from the old generation.
+        value = self._old.pop(value, value)
+        table = self._table
+        if generation <= len(table):
+            self._old = table
+            self._table = table = {}
+        return table.setdefault(value, value)
+
+    def __len__(self):
+        return len(self._table) + len(self._old)
+
+    def __contains__(self, value):
+        return value in self._table or value in self._old
+
+    def clear(self):
+        self._table = {}
+        self._old = {}
+
+
+# A shared table for use as loads(..., interner=INTERNER), so that every
+# request (and every thread) gets to benefit from the ones before it.
+INTERNER = Interner()
+
+
+class ParseBudget:
+    """
+    One allowance of fields, bytes and uploaded files for everything parsed
+    for the same request, so that the query string, the body and any files
+    can't each use up their own `max_num_fields` (or `max_input_bytes`), and
+    together several times what was intended.
+
+    Given as `budget` to `loads`, `load`, `extract`, `flat.loads`,
+    `transcode.loads_to_json` or any of `parsers`, the call's own limits are
+    lowered to whatever the budget has left, and once it's done, the budget is
+    charged with what it used: fields counted as for `max_num_fields` (so once
+    for each part of a key's path, which is what nesting costs), and the size
+    of the input as for `max_input_bytes`. `parsers.parse_multipart` and
+    `views.RequestParser` charge it for each uploaded file, up to `max_files`.
+    Going over throws the same exceptions the per-call limits do, and
+    `TooManyFilesSent` for files.
+
+    There's no locking: a budget belongs to a single request, whose parts are
+    parsed one after the other, and isn't meant to be shared between threads.
+    """
+
+    __slots__ = ("max_num_fields", "max_input_bytes", "max_files", "fields", "input_bytes", "files")
+
+    def __init__(
+        self,
+        max_num_fields: Union[int, float] = 1000,
+        max_input_bytes: Optional[int] = None,
+        max_files: Optional[int] = None,
+    ):
+        self.max_num_fields = max_num_fields
+        self.max_input_bytes = max_input_bytes
+        self.max_files = max_files
+        # What's been used so far.
+        self.fields = 0
+        self.input_bytes = 0
+        self.files = 0
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}: {self.fields!r}/{self.max_num_fields!r} fields, "
+            f"{self.input_bytes!r}/{self.max_input_bytes!r} bytes, {self.files!r}/{self.max_files!r} files>"
+        )
+
+    def limit_fields(self, max_num_fields: Union[int, float]) -> Union[int, float]:
+        """
+        Lower a call's `max_num_fields` to the number of fields left.
+        """
+        return min(max_num_fields, self.max_num_fields - self.fields)
+
+    def limit_bytes(self, max_input_bytes: Optional[int]) -> Optional[int]:
+        """
+        Lower a call's `max_input_bytes` (which may be None) to the number of
+        bytes left.
+        """
+        if self.max_input_bytes is None:
+            return max_input_bytes
+        left = self.max_input_bytes - self.input_bytes
+        return left if max_input_bytes is None else min(max_input_bytes, left)
+
+    def charge(self, *, fields: int = 0, input_bytes: int = 0, files: int = 0):
+        """
+        Take what a call used out of the budget, throwing if it's gone over.
+        """
+        self.fields += fields
+        if self.max_num_fields < self.fields:
+            raise _too_many_nested_fields(self.max_num_fields, self.fields)
+        self.input_bytes += input_bytes
+        if self.max_input_bytes is not None and self.max_input_bytes < self.input_bytes:
+            raise exceptions.DataTooLarge(self.input_bytes, self.max_input_bytes)
+        self.files += files
+        if self.max_files is not None and self.max_files < self.files:
+            raise exceptions.TooManyFilesSent(
+                f"The number of files exceeded {self.max_files!r}; received {self.files!r} files"
+            )
+
+
 def loads(
-    qs: Union[str, bytes],
+    qs: Union[str, bytes, memoryview],
     *,
     encoding: str = "utf-8",
-    coerce: bool = True,
+    coerce: Union[bool, "Coercers"] = True,
     max_num_fields: int = 1000,
     max_depth: int = 5,
+    batch_coerce: bool = False,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    count_holes: bool = False,
+    interner: Optional[Interner] = None,
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+    profiler: Optional["KeyShapeProfiler"] = None,
+    budget: Optional[ParseBudget] = None,
 ) -> Dict[
     Union[str, int],
     Union[Dict[Union[str, int], Any], List[Any], int, float, bool, None],
@@ -75,6 +239,47 @@ def loads(
 
     By default, coercing to Python-specific types a-la JSON is enabled, so
     that the request may pass around a consistent representation of data.
+    Giving a `coercion.Coercers` registry as `coerce` coerces to further types
+    (like dates or `Decimal`) in the same pass.
+
+    With `batch_coerce` enabled, all the fields are decoded first and then
+    all of the values are coerced together, with each distinct key only being
+    decoded and each distinct value only being converted once, before being
+    placed into the result. For inputs which repeat the same keys or values or
+    are mostly numbers (e.g. ids[]=1&ids[]=2&...) this avoids most of the
+    per-field overhead.
+
+    The worst-case cost of any single field can be capped with `max_key_length`
+    and `max_value_length` (checked before decoding), the number of distinct
+    keys any one dictionary may have with `max_keys_per_mapping`, and the size of
+    the whole input (in bytes, or characters for a str) with `max_input_bytes`.
+    Each throws its own `SuspiciousOperation` subclass (`KeyTooLong`,
+    `ValueTooLong`, `TooManyKeys` and `DataTooLarge` respectively), and all
+    are disabled by default.
+
+    With `count_holes`, the holes left by backfilling an array up to an index
+    (like the 999 empty items before a[999]=1) also count towards
+    `max_num_fields`, so that a few fields can't inflate into far more items
+    than it allows. It's off by default, because a limit big enough for every
+    index expected then has to be given.
+
+    Given an `interner` (such as the shared `INTERNER`), all the key segments
+    and any short string values are interned in it, which saves memory for
+    results that are kept around (e.g. cached) and makes looking up those keys
+    cheaper.
+
+    Fields can be dropped wholesale by name (the part of the key before any "[")
+    with either `only` (a set of names to keep) or `exclude` (a set of names to
+    skip), which is checked before anything else is done with the field, so
+    skipped fields cost next to nothing and aren't counted in `max_num_fields`
+    beyond the up-front check.
+
+    Given a `profiling.KeyShapeProfiler` as `profiler`, the result is handed
+    to it once parsed, for it to sample the shapes of the keys.
+
+    Given a `ParseBudget` as `budget`, `max_num_fields` and `max_input_bytes`
+    are lowered to what's left of it, and it's charged for the fields and
+    bytes used.
 
     References:
         https://benalman.com/projects/jquery-bbq-plugin/
@@ -86,49 +291,432 @@ def loads(
     ] = {}
     # Fast path, empty query-string.
     if not qs:
+        if profiler is not None:
+            profiler.observe(obj)
         return obj
 
-    if isinstance(qs, bytes):
+    if budget is not None:
+        max_num_fields = budget.limit_fields(max_num_fields)
+        max_input_bytes = budget.limit_bytes(max_input_bytes)
+    parts = _split_fields(
+        qs,
+        encoding=encoding,
+        max_num_fields=max_num_fields,
+        max_input_bytes=max_input_bytes,
+    )
+    if batch_coerce:
+        prepared = _prepare_fields(
+            parts,
+            encoding=encoding,
+            max_depth=max_depth,
+            max_key_length=max_key_length,
+            max_value_length=max_value_length,
+            only=only,
+            exclude=exclude,
+        )
+        if coerce:
+            prepared = _coerce_prepared(prepared, coerce=coerce)
+        obj, seen_fields = _merge_prepared(
+            obj,
+            prepared,
+            max_num_fields=max_num_fields,
+            max_keys_per_mapping=max_keys_per_mapping,
+            count_holes=count_holes,
+            interner=interner,
+        )
+    else:
+        filtered = only is not None or bool(exclude)
+        seen_fields = 0
+        # Iterate over all name=value pairs.
+        for part in parts:
+            key, sep, val = part.partition("=")
+            if not key:
+                continue
+            if filtered and not _is_wanted(key, encoding, only, exclude):
+                continue
+            obj, seen_fields = _load_key_value(
+                key,
+                val,
+                obj=obj,
+                encoding=encoding,
+                coerce=coerce,
+                max_num_fields=max_num_fields,
+                max_depth=max_depth,
+                seen_fields=seen_fields,
+                max_key_length=max_key_length,
+                max_value_length=max_value_length,
+                max_keys_per_mapping=max_keys_per_mapping,
+                count_holes=count_holes,
+                interner=interner,
+            )
+    if budget is not None:
+        budget.charge(fields=seen_fields, input_bytes=len(qs))
+    if profiler is not None:
+        profiler.observe(obj)
+    return obj
+
+
+def _split_fields(
+    qs: Union[str, bytes, memoryview],
+    *,
+    encoding: str = "utf-8",
+    max_num_fields: int = 1000,
+    max_input_bytes: Optional[int] = None,
+) -> List[str]:
+    """
+    Do the up-front checks on a whole (non-empty) query string or form body,
+    decoding it if necessary, and split it into its name=value parts.
+    """
+    return _check_fields(
+        qs,
+        encoding=encoding,
+        max_num_fields=max_num_fields,
+        max_input_bytes=max_input_bytes,
+    ).split("&")
+
+
+def _check_fields(
+    qs: Union[str, bytes, memoryview],
+    *,
+    encoding: str = "utf-8",
+    max_num_fields: int = 1000,
+    max_input_bytes: Optional[int] = None,
+) -> str:
+    """
+    Do the up-front checks on a whole (non-empty) query string or form body,
+    returning it decoded if necessary.
+    """
+    if max_input_bytes is not None and max_input_bytes < len(qs):
+        raise exceptions.DataTooLarge(len(qs), max_input_bytes)
+
+    if not isinstance(qs, str):
         # query_string normally contains URL-encoded data, a subset of ASCII.
+        # Buffers (like a memoryview of an mmap) are decoded in place, without
+        # copying them into bytes first.
         try:
-            qs = qs.decode(encoding)
+            qs = str(qs, encoding)
         except UnicodeDecodeError:
             # ... but some user agents are misbehaving :-(
-            qs = qs.decode("iso-8859-1")
+            qs = str(qs, "iso-8859-1")
 
     if max_num_fields:
         num_fields = 1 + qs.count("&")
         if max_num_fields < num_fields:
-            raise TooManyFieldsSent(
+            raise exceptions.TooManyFieldsSent(
                 f"The number of GET/POST parameters exceeded {max_num_fields!r}; received {num_fields!r} parameters"
             )
+    return qs
+
+
+# Saved `PathPlan`s record this, and are only used as they are by a version
+# which has the same one; it must change whenever the file layout does, or
+# `_parse_key` or `_index_or_key` would split or convert a path differently.
+PATH_PLAN_VERSION = 2
+
+
+class PathPlan:
+    """
+    A precompiled set of paths to pull out of a query string with `extract`,
+    given in the same form as the keys themselves, like "utm[source]" or
+    "filters[0][field]".
+
+    Paths are matched against keys exactly as written, so array appends like
+    a[] can't be asked for, and "a" doesn't match a[b]=1.
+
+    Plans can be built ahead of time (from the key shapes of a
+    `profiling.KeyShapeProfiler` summary, or of `forms.NestedForm` classes),
+    written out with `save`, and read back in by every worker as it starts
+    with `PathPlan.load`, which skips compiling the paths again.
+    """
+
+    __slots__ = ("paths", "names", "encoding")
+
+    def __init__(self, paths: Iterable[str], *, encoding: str = "utf-8"):
+        # Where each path would be placed by _set_value, mapped back to how it was asked for.
+        compiled: Dict[Tuple[Union[str, int], ...], str] = {}
+        for path in paths:
+            keys = _parse_key(
+                quote_plus(path, safe="[]", encoding=encoding), encoding=encoding, max_depth=len(path)
+            )
+            if not keys or "" in keys:
+                raise ValueError(f"Cannot extract {path!r}, because it has no fixed location")
+            compiled[_placed_at(keys)] = path
+        self._set(compiled, encoding)
+
+    def _set(self, paths: Dict[Tuple[Union[str, int], ...], str], encoding: str):
+        self.paths = paths
+        self.encoding = encoding
+        # The names before any [, for quickly skipping anything else. These are
+        # compared with `_key_name`, so are always str, even where the path
+        # has them as an index (like 1[a]).
+        self.names = frozenset(path.partition("[")[0] for path in self.paths.values())
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: {sorted(self.paths.values())!r}>"
+
+    @classmethod
+    def from_shapes(
+        cls, shapes: Iterable[str], *, indexes: int = 1, encoding: str = "utf-8"
+    ) -> "PathPlan":
+        """
+        Build a plan from key shapes, where list indexes are written as [N],
+        like "filters[N][field]", which is expanded into a path for each of
+        the first `indexes` indexes (filters[0][field], filters[1][field]...).
+        """
+        paths: Dict[str, None] = {}
+        for shape in shapes:
+            expanded = [""]
+            pieces = shape.split("[N]")
+            for piece in pieces[1:]:
+                expanded = [
+                    f"{prefix}[{index}]{piece}"
+                    for prefix in expanded
+                    for index in range(indexes)
+                ]
+            paths.update(dict.fromkeys(pieces[0] + path for path in expanded))
+        return cls(paths, encoding=encoding)
+
+    @classmethod
+    def from_profile(
+        cls,
+        summary: Dict[str, Any],
+        *,
+        min_count: int = 1,
+        indexes: int = 1,
+        encoding: str = "utf-8",
+    ) -> "PathPlan":
+        """
+        Build a plan (as `from_shapes` does) from the key shapes in a
+        `KeyShapeProfiler.summary()` (or its JSON, loaded again) seen at least
+        `min_count` times. Shapes which couldn't be extracted (such as those
+        of malformed or empty keys) are left out, rather than refusing the
+        whole profile.
+        """
+        paths: Dict[Tuple[Union[str, int], ...], str] = {}
+        for shape, tally in summary["shapes"].items():
+            if tally["count"] < min_count:
+                continue
+            try:
+                plan = cls.from_shapes([shape], indexes=indexes, encoding=encoding)
+            except (ValueError, exceptions.MalformedData):
+                continue
+            paths.update(plan.paths)
+        plan = cls.__new__(cls)
+        plan._set(paths, encoding)
+        return plan
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The compiled plan as a JSON-compatible dictionary, for `from_dict`.
+        """
+        return {
+            "version": PATH_PLAN_VERSION,
+            "encoding": self.encoding,
+            "paths": {path: list(keys) for keys, path in self.paths.items()},
+        }
+
+    @classmethod
+    def from_dict(
+        cls, saved: Dict[str, Any], *, encoding: Optional[str] = None, strict: bool = False
+    ) -> "PathPlan":
+        """
+        Rebuild a plan from `to_dict`, using the compiled paths as they are if
+        it came from the same `PATH_PLAN_VERSION` (and `encoding`, if one is
+        given). Otherwise the paths are compiled again, or with `strict`, a
+        `ValueError` is thrown instead.
+        """
+        version = saved.get("version")
+        saved_encoding = saved.get("encoding", "utf-8")
+        if version == PATH_PLAN_VERSION and encoding in (None, saved_encoding):
+            plan = cls.__new__(cls)
+            plan._set(
+                {tuple(keys): path for path, keys in saved["paths"].items()}, saved_encoding
+            )
+            return plan
+        if strict:
+            raise ValueError(
+                f"Cannot use a plan saved by version {version!r} for {saved_encoding!r}, "
+                f"expected version {PATH_PLAN_VERSION!r}"
+                + ("" if encoding is None else f" for {encoding!r}")
+            )
+        return cls(saved["paths"], encoding=encoding or saved_encoding)
+
+    def save(self, path: Union[str, "os.PathLike"]):
+        """
+        Write the compiled plan to the file at `path`, as JSON.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, "os.PathLike"],
+        *,
+        encoding: Optional[str] = None,
+        strict: bool = False,
+    ) -> "PathPlan":
+        """
+        Read a plan written by `save`, checking it's compatible as `from_dict`
+        does.
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), encoding=encoding, strict=strict)
+
+
+def extract(
+    qs: Union[str, bytes, memoryview],
+    paths: Union[PathPlan, Iterable[str]],
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    budget: Optional[ParseBudget] = None,
+) -> Dict[str, Any]:
+    """
+    Pull out only the values for the given `paths` (or a `PathPlan` of them)
+    from a query string or form body, without parsing the rest of it.
+    Returns a dictionary of each path that was found to its value:
+    extract("a=1&utm[source]=x&b=2", {"utm[source]"}) gives {"utm[source]": "x"}
+
+    Fields whose name (the part before any "[") isn't wanted are skipped
+    without being decoded at all, and scanning stops as soon as every path
+    has been found. That means only the first value for any path is used,
+    whereas `loads` would turn a=1&a=2 into a list, and keep the last value
+    for a[b]=1&a[b]=2.
 
+    The up-front `max_num_fields` and `max_input_bytes` checks are the same
+    as for `loads`, while the nesting, depth, length and malformed key checks
+    are only applied to the fields which get decoded, which are also all that
+    a `budget` is charged for, besides the size of the input.
+    """
+    plan = paths if isinstance(paths, PathPlan) else PathPlan(paths, encoding=encoding)
+    found: Dict[str, Any] = {}
+    # Fast path, empty query-string, or nothing to look for.
+    if not qs or not plan.paths:
+        return found
+
+    if budget is not None:
+        max_num_fields = budget.limit_fields(max_num_fields)
+        max_input_bytes = budget.limit_bytes(max_input_bytes)
+    input_bytes = len(qs)
+    qs = _check_fields(
+        qs,
+        encoding=encoding,
+        max_num_fields=max_num_fields,
+        max_input_bytes=max_input_bytes,
+    )
+    wanted = len(plan.paths)
+    names = plan.names
     seen_fields = 0
-    # Iterate over all name=value pairs.
-    for part in qs.split("&"):
+    start = 0
+    end = 0
+    # Walk along the separators rather than splitting the whole string up
+    # front, because we may well stop early.
+    while end != -1:
+        end = qs.find("&", start)
+        part = qs[start:] if end == -1 else qs[start:end]
+        start = end + 1
         key, sep, val = part.partition("=")
-        if not key:
+        if not key or _key_name(key, encoding) not in names:
             continue
-        obj, seen_fields = _load_key_value(
-            key,
-            val,
-            obj=obj,
-            encoding=encoding,
-            coerce=coerce,
-            max_num_fields=max_num_fields,
-            max_depth=max_depth,
-            seen_fields=seen_fields,
+        keys = _parse_key(
+            key, encoding=encoding, max_depth=max_depth, max_key_length=max_key_length
         )
-    return obj
+        seen_fields += len(keys)
+        if max_num_fields < seen_fields:
+            raise _too_many_nested_fields(max_num_fields, seen_fields)
+        path = plan.paths.get(_placed_at(keys))
+        if path is None or path in found:
+            continue
+        if max_value_length is not None and max_value_length < len(val):
+            raise exceptions.ValueTooLong(key, len(val), max_value_length)
+        # translate value as per urllib.parse.parse_qsl
+        val = unquote(val.replace("+", " "), encoding)
+        if coerce and val:
+            val = _coerce_value(val) if coerce is True else coerce.load(val)
+        found[path] = val
+        if len(found) == wanted:
+            break
+    if budget is not None:
+        budget.charge(fields=seen_fields, input_bytes=input_bytes)
+    return found
+
+
+def _key_name(key: str, encoding: str = "utf-8") -> str:
+    """
+    Get the name part of a raw key, before any "[", only decoding it if
+    it looks like it needs it (e.g. a%5Bb%5D for a[b]).
+    """
+    name = key.partition("[")[0]
+    if "%" in name or "+" in name:
+        name = unquote(name.replace("+", " "), encoding).partition("[")[0]
+    return name
+
+
+def _is_wanted(
+    key: str,
+    encoding: str = "utf-8",
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+) -> bool:
+    """
+    Check the name of a raw key against the `only` and `exclude` sets given
+    to `loads` or `load`.
+    """
+    name = _key_name(key, encoding)
+    if only is not None and name not in only:
+        return False
+    return not (exclude and name in exclude)
+
+
+def _index_or_key(key: str) -> Union[str, int]:
+    """
+    Convert a part of a key to an int if `_set_value` would treat it as an index.
+    """
+    for chr in key:
+        if chr in string.digits:
+            continue
+        else:
+            return key
+    return int(key) if key else key
+
+
+def _placed_at(keys: List[str]) -> Tuple[Union[str, int], ...]:
+    """
+    The path `_set_value` places a value at for a key split by `_parse_key`:
+    numeric parts become indexes, apart from a name on its own (like 0=1),
+    which is always a str key of the result.
+    """
+    if len(keys) == 1:
+        return (keys[0],)
+    return tuple(_index_or_key(key) for key in keys)
 
 
 def load(
     pairs: Iterator[Union[bytes, str]],
     *,
     encoding: str = "utf-8",
-    coerce: bool = True,
+    coerce: Union[bool, "Coercers"] = True,
     max_num_fields: int = 1000,
     max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    count_holes: bool = False,
+    interner: Optional[Interner] = None,
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+    profiler: Optional["KeyShapeProfiler"] = None,
+    budget: Optional[ParseBudget] = None,
 ):
     """
     Takes an iterator or iterable of 2-tuples as input in the form (key, value),
@@ -148,26 +736,53 @@ def load(
 
     By default, coercing to Python-specific types a-la JSON is enabled, so
     that the request may pass around a consistent representation of data.
+
+    The same `max_key_length`, `max_value_length`, `max_keys_per_mapping`,
+    `max_input_bytes` and `count_holes` limits as `loads` are available, though
+    `max_input_bytes` is only the running total of the lengths of the (string)
+    keys and values seen.
+    As with `loads`, keys and short values may be interned with an `interner`,
+    whole fields may be skipped by name with `only` or `exclude`, the
+    result sampled by a `profiler`, and the fields (and, if it limits them,
+    bytes) charged to a `budget`.
     """
     obj: Dict[
         Union[str, int],
         Union[Dict[Union[str, int], Any], List[Any], int, float, bool, None],
     ] = {}
     if not pairs:
+        if profiler is not None:
+            profiler.observe(obj)
         return obj
 
+    if budget is not None:
+        max_num_fields = budget.limit_fields(max_num_fields)
+        max_input_bytes = budget.limit_bytes(max_input_bytes)
+    filtered = only is not None or bool(exclude)
     seen_fields = 0
+    seen_bytes = 0
     for num_fields, pair in enumerate(pairs, start=1):
         key, val = pair
         # Check as we go for overflowing the expected number of fields.
         # We can't call len() on the pairs ahead of time because we may be getting
         # a `dict_itemiterator` or something as input.
         if max_num_fields < num_fields:
-            raise TooManyFieldsSent(
+            raise exceptions.TooManyFieldsSent(
                 f"The number of GET/POST parameters exceeded {max_num_fields!r}; received {num_fields!r} parameters"
             )
+        # Likewise the total size can only be tracked as we go; anything which
+        # isn't a string (like an uploaded file) doesn't count.
+        if max_input_bytes is not None:
+            seen_bytes += len(key)
+            for valpart in val if isinstance(val, list) else (val,):
+                if isinstance(valpart, (str, bytes)):
+                    seen_bytes += len(valpart)
+            if max_input_bytes < seen_bytes:
+                raise exceptions.DataTooLarge(seen_bytes, max_input_bytes)
         if not key:
             continue
+        if filtered and not _is_wanted(key, encoding, only, exclude):
+            continue
         if isinstance(val, list):
             if len(val) > 1:
                 for i, valpart in enumerate(val, start=0):
@@ -199,6 +814,11 @@ def load(
                         max_num_fields=max_num_fields,
                         max_depth=max_depth,
                         seen_fields=seen_fields,
+                        max_key_length=max_key_length,
+                        max_value_length=max_value_length,
+                        max_keys_per_mapping=max_keys_per_mapping,
+                        count_holes=count_holes,
+                        interner=interner,
                     )
             elif val:
 
@@ -228,6 +848,11 @@ def load(
                     max_num_fields=max_num_fields,
                     max_depth=max_depth,
                     seen_fields=seen_fields,
+                    max_key_length=max_key_length,
+                    max_value_length=max_value_length,
+                    max_keys_per_mapping=max_keys_per_mapping,
+                    count_holes=count_holes,
+                    interner=interner,
                 )
         else:
             obj, seen_fields = _load_key_value(
@@ -239,7 +864,16 @@ def load(
                 max_num_fields=max_num_fields,
                 max_depth=max_depth,
                 seen_fields=seen_fields,
+                max_key_length=max_key_length,
+                max_value_length=max_value_length,
+                max_keys_per_mapping=max_keys_per_mapping,
+                count_holes=count_holes,
+                interner=interner,
             )
+    if budget is not None:
+        budget.charge(fields=seen_fields, input_bytes=seen_bytes)
+    if profiler is not None:
+        profiler.observe(obj)
     return obj
 
 
@@ -249,10 +883,17 @@ def _load_key_value(
     obj,
     *,
     encoding: str = "utf-8",
-    coerce: bool = True,
+    coerce: Union[bool, "Coercers"] = True,
     max_num_fields: int = 1000,
     max_depth: int = 5,
     seen_fields: int = 0,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    count_holes: bool = False,
+    interner: Optional[Interner] = None,
+    convert_value: Optional[Callable[[Any], Any]] = None,
+    set_value=None,
 ):
     """
     Convert a single key + value into the nested format, based on the representation
@@ -265,27 +906,258 @@ def _load_key_value(
     within this function or by a caller, this key will throw `TooManyFieldsSent`.
 
     By default, coercing of `val` to a Python-specific type a-la JSON is enabled, so
-    that the request may pass around a consistent representation of data.
+    that the request may pass around a consistent representation of data. A
+    `coercion.Coercers` registry may be given instead of True.
+
+    If given, `max_key_length` and `max_value_length` are checked against the
+    raw (undecoded) key and value before anything else is done with them.
+
+    Every decoded value (including empty ones) may instead be passed through
+    `convert_value`, which replaces coercion entirely.
+
+    Something other than a nested dictionary may be built by giving a
+    `set_value` with the same signature as `_set_value`.
 
     References:
         https://benalman.com/projects/jquery-bbq-plugin/
         https://benalman.com/code/projects/jquery-bbq/examples/deparam/
         https://github.com/cowboy/jquery-bbq/blob/8e0064ba68a34bcd805e15499cb45de3f4cc398d/jquery.ba-bbq.js#L444-L556
     """
+    keys = _parse_key(
+        key, encoding=encoding, max_depth=max_depth, max_key_length=max_key_length
+    )
+    # Skip empty keys (e.g. "&foo=1&&bar=2")
+    if not keys:
+        return obj, seen_fields
+    if (
+        max_value_length is not None
+        and isinstance(val, (str, bytes))
+        and max_value_length < len(val)
+    ):
+        raise exceptions.ValueTooLong(key, len(val), max_value_length)
+    # translate value as per urllib.parse.parse_qsl
+    if isinstance(val, str):
+        val = unquote(val.replace("+", " "), encoding)
+
+    # Always add 1 per part, even if it's a simple key.
+    seen_fields += len(keys)
+    # Prevent any single (nested) key from continuing if it would blow over the limit
+    # This doesn't preclude spamming in a single a[][][][][][][][][][][][]...
+    # and inflating too many items, but I'll handle that via depth checks.
+    if max_num_fields < seen_fields:
+        raise _too_many_nested_fields(max_num_fields, seen_fields)
+
+    if convert_value is not None:
+        val = convert_value(val)
+    elif coerce and val:
+        val = _coerce_value(val) if coerce is True else coerce.load(val)
+
+    if interner is not None:
+        keys = [interner(key) for key in keys]
+        if val and isinstance(val, str):
+            val = interner(val)
+
+    if set_value is None:
+        set_value = _set_value
+    return set_value(
+        obj,
+        keys,
+        val,
+        max_num_fields=max_num_fields,
+        max_keys_per_mapping=max_keys_per_mapping,
+        count_holes=count_holes,
+        seen_fields=seen_fields,
+    )
+
+
+def _prepare_fields(
+    parts: List[str],
+    *,
+    encoding: str = "utf-8",
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+) -> List[Tuple[Optional[List[str]], Any, Optional[Exception]]]:
+    """
+    Decode every name=value pair as `_load_key_value` would, but without
+    coercing the values or placing them into the result, returning a (keys,
+    value, exception) triple for each.
+
+    Rather than throwing, it records the first exception encountered and
+    stops, leaving `_merge_prepared` to throw it at the same point sequential
+    parsing would have done.
+    """
+    filtered = only is not None or bool(exclude)
+    prepared = []
+    # The same keys tend to be repeated (e.g. ids[]=1&ids[]=2&...), so each
+    # distinct one is only decoded and split once. The lists are shared, which
+    # is fine as nothing changes them once they've been made.
+    parsed: Dict[str, List[str]] = {}
+    for part in parts:
+        key, sep, val = part.partition("=")
+        if not key:
+            continue
+        if filtered and not _is_wanted(key, encoding, only, exclude):
+            continue
+        keys = None
+        try:
+            split = parsed.get(key)
+            if split is None:
+                split = parsed[key] = _parse_key(
+                    key,
+                    encoding=encoding,
+                    max_depth=max_depth,
+                    max_key_length=max_key_length,
+                )
+            if not split:
+                continue
+            # Thrown before the fields are counted, as `_load_key_value` does,
+            # so it's recorded without the keys.
+            if max_value_length is not None and max_value_length < len(val):
+                raise exceptions.ValueTooLong(key, len(val), max_value_length)
+            keys = split
+            # translate value as per urllib.parse.parse_qsl
+            val = unquote(val.replace("+", " "), encoding)
+        except Exception as e:
+            prepared.append((keys, None, e))
+            break
+        prepared.append((keys, val, None))
+    return prepared
+
+
+def _coerce_prepared(
+    prepared: List[Tuple[Optional[List[str]], Any, Optional[Exception]]],
+    *,
+    coerce: Union[bool, "Coercers"] = True,
+) -> List[Tuple[Optional[List[str]], Any, Optional[Exception]]]:
+    """
+    Coerce all of the (as yet uncoerced) values output by `_prepare_fields` in
+    one go, rather than value by value.
+
+    Distinct values are only converted once, and plain integers (the most
+    common thing to see in bulk, like ids[]=1&ids[]=2...) are picked out
+    with the str methods and converted in a single batch, leaving only the
+    remainder to go through `_coerce_value` (or the `load` of a `Coercers`
+    registry given as `coerce`, which skips the batch of integers if any of its
+    coercers might want them).
+    """
+    coerce_value = _coerce_value if coerce is True else coerce.load
+    # Preserves first-seen order, which only matters for finding the same
+    # exception as sequential parsing would.
+    converted = dict.fromkeys(val for keys, val, exc in prepared if val)
+    # Equivalent to what NUMBER_RE would match for an integer; a leading zero
+    # is only allowed for "0" itself, otherwise it's left as a special string
+    # like '003532663'
+    integers = []
+    if coerce is True or not coerce.claims_digits:
+        integers = [
+            val
+            for val in converted
+            if val.isascii() and val.isdigit() and (val[0] != "0" or len(val) == 1)
+        ]
+    try:
+        converted.update(zip(integers, map(int, integers)))
+    except ValueError:
+        # Too many digits to convert (see sys.set_int_max_str_digits), so
+        # let the slow path below find which ones.
+        integers = []
+    done = set(integers)
+    failures: Dict[str, Exception] = {}
+    for val in converted:
+        if val in done:
+            continue
+        try:
+            converted[val] = coerce_value(val)
+        except Exception as e:
+            failures[val] = e
+
+    coerced = []
+    for keys, val, exc in prepared:
+        if exc is None and val:
+            if val in failures:
+                coerced.append((keys, None, failures[val]))
+                break
+            val = converted[val]
+        coerced.append((keys, val, exc))
+    return coerced
+
+
+def _merge_prepared(
+    obj,
+    prepared: List[Tuple[Optional[List[str]], Any, Optional[Exception]]],
+    *,
+    max_num_fields: int = 1000,
+    seen_fields: int = 0,
+    max_keys_per_mapping: Optional[int] = None,
+    count_holes: bool = False,
+    interner: Optional[Interner] = None,
+):
+    """
+    Place the output of `_prepare_fields` into `obj` in order, keeping track of
+    `seen_fields` exactly as `_load_key_value` does, such that array appends and
+    indexes end up the same, and return both.
+
+    Interning happens here rather than in `_prepare_fields`, so that only the
+    strings which end up in the result are interned.
+    """
+    for keys, val, exc in prepared:
+        # Failed before the fields could be counted (malformed, too deep,
+        # value too long)
+        if keys is None:
+            raise exc
+        seen_fields += len(keys)
+        if max_num_fields < seen_fields:
+            raise _too_many_nested_fields(max_num_fields, seen_fields)
+        # Failed while coercing, which happens after counting the fields.
+        if exc is not None:
+            raise exc
+        if interner is not None:
+            keys = [interner(key) for key in keys]
+            if val and isinstance(val, str):
+                val = interner(val)
+        obj, seen_fields = _set_value(
+            obj,
+            keys,
+            val,
+            max_num_fields=max_num_fields,
+            max_keys_per_mapping=max_keys_per_mapping,
+            count_holes=count_holes,
+            seen_fields=seen_fields,
+        )
+    return obj, seen_fields
+
+
+def _parse_key(
+    key: str,
+    *,
+    encoding: str = "utf-8",
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+) -> List[str]:
+    """
+    Decode a single key and split it into the parts that make up its path, such
+    that a[][abc] becomes ["a", "", "abc"] and a simple key like abc
+    becomes ["abc"]. An empty key produces an empty list, so that it may be skipped.
+
+    Throws `MalformedData` for keys with nonsensical nesting characters, and
+    `TooManyFieldsSent` if the key goes deeper than `max_depth`, both of which
+    are checked before any splitting is done. Throws `KeyTooLong` if the raw key
+    is longer than `max_key_length`, before even decoding it.
+    """
+    if max_key_length is not None and max_key_length < len(key):
+        raise exceptions.KeyTooLong(key, max_key_length)
     # translate key as per urllib.parse.parse_qsl
     key = unquote(key.replace("+", " "), encoding)
     # Skip empty keys (e.g. "&foo=1&&bar=2")
     if not key:
-        return obj, seen_fields
+        return []
     # Just drop processing immediately if the key looks invalid. Yes there
     # are false positives for if someone tries to do a[[[] expecting a key
     # of "[[" or something, but that may not even be what they're expecting...
     if "[[" in key or "]]" in key or key[0:2] == "[]":
-        raise MalformedData(key)
-        # translate value as per urllib.parse.parse_qsl
-    if isinstance(val, str):
-        val = unquote(val.replace("+", " "), encoding)
-    cur = obj
+        raise exceptions.MalformedData(key)
     # Check whether inflating this key would push us over our expected
     # maximum depth BEFORE doing the inflate, to avoid a[][][][][][][][]...
     # from over-committing memory usage.
@@ -298,9 +1170,15 @@ def _load_key_value(
     # just to then error.
     total_depth = key.count("][") + key[0 : key.find("]")].count("[")
     if max_depth < total_depth:
-        raise TooManyFieldsSent(
-            f"The depth of nested GET/POST parameters exceeded {max_depth!r}; received {total_depth!r} nested parameters"
-        )
+        raise _too_deep(max_depth, total_depth)
+    return _split_key(key)
+
+
+def _split_key(key: str) -> List[str]:
+    """
+    Split an already decoded (and checked) key into the parts that make up
+    its path, as described in `_parse_key`.
+    """
     # If key is more complex than 'foo', like 'a[]' or 'a[b][c]', split it
     # into its component parts.
     keys = key.split("][")
@@ -313,42 +1191,79 @@ def _load_key_value(
         keys[keys_last] = keys[keys_last][:-1]
         # Split first keys part into two parts on the [ and add them back onto
         # the beginning of the keys array.
-        keys = [*keys.pop(0).split("["), *keys]
-        keys_last = len(keys) - 1
-        seen_fields += keys_last + 1
-    else:
-        keys_last = 0
-        # Always add 1, even if it's a simple key.
-        seen_fields += 1
+        return [*keys.pop(0).split("["), *keys]
+    # Not balanced, so it's a simple key, regardless of what's in it.
+    return [key]
 
-    # Prevent any single (nested) key from continuing if it would blow over the limit
-    # This doesn't preclude spamming in a single a[][][][][][][][][][][][]...
-    # and inflating too many items, but I'll handle that via depth checks.
-    if max_num_fields < seen_fields:
-        raise TooManyFieldsSent(
-            f"The number of GET/POST parameters (including nesting) exceeded {max_num_fields!r}; received {seen_fields!r} (possibly nested) parameters"
-        )
 
-    if coerce and val:
-        if val in COERCE_LOAD_CONSTANTS:
-            val = COERCE_LOAD_CONSTANTS[val]
-        elif isinstance(val, str):
-            # using .match would seem to catch "1�" and "3\r\n"
-            # but using .fullmatch doesn't catch '0000000000000000000000'
-            match_number = json.scanner.NUMBER_RE.fullmatch(val)
-            if match_number is not None:
-                integer, frac, exp = match_number.groups()
-                if frac or exp:
-                    val = float(integer + (frac or "") + (exp or ""))
-                else:
-                    val = int(integer)
-            elif all(chr in string.digits for chr in val):
-                if val[0] == "0":
-                    # don't convert, because it's a special string
-                    # like 'account': '003532663'
-                    pass
-                else:
-                    val = int(val)
+def _coerce_value(val: Any) -> Any:
+    """
+    Convert a single (non-empty) value into the Python-specific type it
+    represents a-la JSON, such that "true" becomes True and "1.5" becomes 1.5,
+    leaving anything else alone.
+    """
+    if val in COERCE_LOAD_CONSTANTS:
+        return COERCE_LOAD_CONSTANTS[val]
+    elif isinstance(val, str):
+        # using .match would seem to catch "1�" and "3\r\n"
+        # but using .fullmatch doesn't catch '0000000000000000000000'
+        match_number = json.scanner.NUMBER_RE.fullmatch(val)
+        if match_number is not None:
+            integer, frac, exp = match_number.groups()
+            if frac or exp:
+                return float(integer + (frac or "") + (exp or ""))
+            else:
+                return int(integer)
+        elif all(chr in string.digits for chr in val):
+            if val[0] == "0":
+                # don't convert, because it's a special string
+                # like 'account': '003532663'
+                pass
+            else:
+                return int(val)
+    return val
+
+
+def _too_deep(max_depth: int, depth: int) -> "exceptions.TooManyFieldsSent":
+    return exceptions.TooManyFieldsSent(
+        f"The depth of nested GET/POST parameters exceeded {max_depth!r}; received {depth!r} nested parameters"
+    )
+
+
+def _too_many_nested_fields(max_num_fields: int, seen_fields: int) -> "exceptions.TooManyFieldsSent":
+    return exceptions.TooManyFieldsSent(
+        f"The number of GET/POST parameters (including nesting) exceeded {max_num_fields!r}; received {seen_fields!r} (possibly nested) parameters"
+    )
+
+
+def _set_value(
+    obj,
+    keys: List[str],
+    val: Any,
+    *,
+    max_num_fields: int = 1000,
+    max_keys_per_mapping: Optional[int] = None,
+    count_holes: bool = False,
+    seen_fields: int = 0,
+):
+    """
+    Place an already decoded (and possibly coerced) `val` into `obj` at the
+    path described by `keys`, as produced by `_parse_key`, returning the
+    object and the updated `seen_fields`.
+
+    This is the part of `_load_key_value` which has to happen in order, because
+    array appends (a[]) and repeated simple keys (a=1&a=2) depend on whatever
+    has already been put into `obj`.
+
+    If a dictionary would end up with more than `max_keys_per_mapping` distinct
+    keys, throws `TooManyKeys` instead of adding another.
+
+    With `count_holes`, any holes created by backfilling an array up to a given
+    index, like a[999]=1, count towards `seen_fields`, otherwise many such keys
+    would be able to inflate far more items than `max_num_fields` allows.
+    """
+    cur = obj
+    keys_last = len(keys) - 1
 
     # Complex key, build deep object structure based on a few rules:
     # The 'cur' pointer starts at the object top-level.
@@ -385,10 +1300,8 @@ def _load_key_value(
                         break
                 else:
                     key = int(key)
-                    # TODO: either here or in the while loop to backfill an array,
-                    #   ensure that adding N items also increases the seen_fields?
                     if max_num_fields < key:
-                        raise TooManyFieldsSent(
+                        raise exceptions.TooManyFieldsSent(
                             f"The index [{key}] of parameter exceeded {max_num_fields!r} total allowed parameters"
                         )
 
@@ -418,6 +1331,14 @@ def _load_key_value(
                 bit = val
 
             if isinstance(cur, list):
+                if count_holes:
+                    # Every hole we're about to fill in counts as a field, and
+                    # is checked before doing so.
+                    holes = key - len(cur)
+                    if holes > 0:
+                        seen_fields += holes
+                        if max_num_fields < seen_fields:
+                            raise _too_many_nested_fields(max_num_fields, seen_fields)
                 bit_type = type(bit)
                 # Have to fill up the list if the key isn't 0, because
                 # Python is less lax and it'd be an:
@@ -435,11 +1356,20 @@ def _load_key_value(
                     except TypeError:
                         empty_val = None
                     cur.append(empty_val)
+            elif (
+                max_keys_per_mapping is not None
+                and isinstance(cur, dict)
+                and max_keys_per_mapping <= len(cur)
+                and key not in cur
+            ):
+                raise exceptions.TooManyKeys(key, max_keys_per_mapping)
             cur[key] = cur = bit
+        return obj, seen_fields
 
     # Simple key, even simpler rules, since only scalars and shallow
     # arrays are allowed.
-    elif isinstance(obj, dict) and isinstance(obj.get(key), list):
+    key = keys[0]
+    if isinstance(obj, dict) and isinstance(obj.get(key), list):
         # If we've parsed as second value like foo[]=1&foo[]=2, keep
         # going as an already-made list.
         # If it's not got the array/dict chars, like foo[]=1&foo=2
@@ -453,6 +1383,8 @@ def _load_key_value(
     elif key in obj:
         obj[key] = [obj[key], val]
     # val is a scalar.
+    elif max_keys_per_mapping is not None and max_keys_per_mapping <= len(obj):
+        raise exceptions.TooManyKeys(key, max_keys_per_mapping)
     else:
         obj[key] = val
     return obj, seen_fields
@@ -462,62 +1394,102 @@ def dumps(
     data: Dict[str, Union[Dict[Text, Any], List[Any], int, float, bool, None]],
     *,
     encoding="utf-8",
-    coerce: bool = True,
+    coerce: Union[bool, "Coercers"] = True,
     max_num_fields: int = 1000,
     max_depth: int = 5,
 ):
     """
     Dump a (potentially) nested dictionary into a URL encoded string.
 
+    Given a `coercion.Coercers` registry as `coerce`, values of the types it
+    has coercers for are written in the form they'll be coerced back from.
+
     References:
         https://github.com/jquery/jquery/blob/683ceb8ff067ac53a7cb464ba1ec3f88e353e3f5/src/serialize.js#L55-L91
         https://github.com/knowledgecode/jquery-param/blob/94db6fd4a34107543e4fbad84d119986a155a01f/src/index.js#L10-L48
     """
-    s = []
-
-    def add(key, value):
-        # Allow for coercion to work if re-loading the same value...
-        # The true/false ones have to come before the isinstance test for ints
-        # because isinstance(True, int) is True...
-        if value is True or value is False:
-            value = COERCE_DUMP_CONSTANTS[value]
-        if isinstance(value, int):
-            # Subclasses of int/float may override __repr__, but we still
-            # want to encode them as integers/floats in JSON. One example
-            # within the standard library is IntEnum.
-            value = int.__repr__(value)
-        elif value in COERCE_DUMP_CONSTANTS:
-            value = COERCE_DUMP_CONSTANTS[value]
-        elif isinstance(value, float):
-            # see comment above for int
-            if value != value:
-                value = "NaN"
-            else:
-                value = float.__repr__(value)
-        else:
-            value = str(value)
-        quoted_key = quote_plus(key, encoding=encoding)
-        quoted_value = quote_plus(value, encoding=encoding)
-        return f"{quoted_key}={quoted_value}"
+    return "&".join(iterdumps(data, encoding=encoding, coerce=coerce))
 
-    def build_params(prefix, obj) -> list:
-        if prefix:
 
-            if isinstance(obj, list):
-                for i, value in enumerate(obj):
-                    build_params(f"{prefix}[{i}]", value)
-            elif isinstance(obj, dict):
-                for key, value in obj.items():
-                    build_params(f"{prefix}[{key}]", value)
-            else:
-                s.append(add(prefix, obj))
+def iterdumps(
+    data: Dict[str, Union[Dict[Text, Any], List[Any], int, float, bool, None]],
+    *,
+    encoding: str = "utf-8",
+    coerce: Union[bool, "Coercers"] = True,
+    max_num_fields: Optional[int] = None,
+    max_depth: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield the (URL encoded) key=value pairs `dumps` joins together, one at
+    a time, so that large results (like long lists) can be streamed out
+    without ever holding the whole string.
 
+    Unlike `dumps`, the output can be held to the `max_num_fields` and
+    `max_depth` that `loads` would read it back with, counting each pair as
+    `loads` would (a[0][b] is 3 fields, nested 2 deep), throwing `ValueError`
+    as soon as either would be exceeded; by default, neither is.
+    """
+    dump_value = _dump_value if coerce is True or not coerce else coerce.dump
+    seen_fields = 0
+    # Pairs of (prefix, value, depth) still to be written, last first. Falsy
+    # prefixes (the top level, or keys like "" and 0) are written as they
+    # always have been by dumps: their dictionaries' keys aren't prefixed,
+    # and their lists' items aren't nested any further.
+    stack: List[Tuple[Any, Any, int]] = [("", data, -1)]
+    while stack:
+        prefix, obj, depth = stack.pop()
+        if prefix:
+            if isinstance(obj, list):
+                stack.extend(
+                    (f"{prefix}[{i}]", obj[i], depth + 1)
+                    for i in range(len(obj) - 1, -1, -1)
+                )
+                continue
+            if isinstance(obj, dict):
+                stack.extend(
+                    (f"{prefix}[{key}]", value, depth + 1)
+                    for key, value in reversed(obj.items())
+                )
+                continue
+            items: Iterable[Tuple[Any, Any, int]] = ((prefix, obj, depth),)
         elif isinstance(obj, list):
-            for i, value in enumerate(obj):
-                s.append(add(f"{prefix}[{i}]", value))
+            items = ((f"{prefix}[{i}]", value, depth + 1) for i, value in enumerate(obj))
         else:
-            for key, value in obj.items():
-                build_params(key, value)
-        return s
+            stack.extend((key, value, depth + 1) for key, value in reversed(obj.items()))
+            continue
+        for key, value, depth in items:
+            if max_depth is not None and max_depth < depth:
+                raise ValueError(
+                    f"The depth of nested parameters dumped exceeded {max_depth!r}, which loads would refuse"
+                )
+            seen_fields += depth + 1
+            if max_num_fields is not None and max_num_fields < seen_fields:
+                raise ValueError(
+                    f"The number of parameters (including nesting) dumped exceeded {max_num_fields!r}, which loads would refuse"
+                )
+            yield f"{quote_plus(key, encoding=encoding)}={quote_plus(dump_value(value), encoding=encoding)}"
+
 
-    return "&".join(build_params("", data))
+def _dump_value(value: Any) -> str:
+    """
+    Format a single value as the string `dumps` would write out for it, such
+    that loading it again (with coercion) gives back the same value.
+    """
+    # Allow for coercion to work if re-loading the same value...
+    # The true/false ones have to come before the isinstance test for ints
+    # because isinstance(True, int) is True...
+    if value is True or value is False:
+        return COERCE_DUMP_CONSTANTS[value]
+    if isinstance(value, int):
+        # Subclasses of int/float may override __repr__, but we still
+        # want to encode them as integers/floats in JSON. One example
+        # within the standard library is IntEnum.
+        return int.__repr__(value)
+    elif value in COERCE_DUMP_CONSTANTS:
+        return COERCE_DUMP_CONSTANTS[value]
+    elif isinstance(value, float):
+        # see comment above for int
+        if value != value:
+            return "NaN"
+        return float.__repr__(value)
+    return str(value)
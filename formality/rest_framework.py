@@ -0,0 +1,141 @@
+"""
+Django REST framework parser and renderer classes for nested urlencoded
+data, for projects using DRF alongside (or instead of) `views.RequestParser`.
+
+`NestedFormParser` parses `application/x-www-form-urlencoded` bodies with
+`parsers.parse_urlencoded`, reading them from the request stream a chunk
+at a time, rather than having DRF build the flat `QueryDict` first, so
+`request.data` is a `http.NestedQueryDict` of the nested data; to use it,
+list it in `DEFAULT_PARSER_CLASSES` (instead of DRF's `FormParser`), or in
+a view's `parser_classes`.
+
+`NestedFormRenderer` writes responses in the same form `query.dumps` does.
+DRF always renders a whole response before sending it, so for large
+responses `iter_render` gives the same body in pieces instead, for a
+`StreamingHttpResponse`::
+
+    renderer = NestedFormRenderer()
+    return StreamingHttpResponse(
+        renderer.iter_render(serializer.data),
+        content_type=f"{renderer.media_type}; charset={renderer.charset}",
+    )
+
+Both coerce values as `coerce` says (by default, as `query` does), and are
+held to the same limits as the rest of the library: `max_depth`, and
+`DATA_UPLOAD_MAX_NUMBER_FIELDS` (unless `max_num_fields` is set) for the
+parser; the renderer only to whatever it's given, so that the responses
+are readable by clients parsing with those limits.
+
+Like `views`, this imports Django (and DRF), so is only loaded once it's
+asked for.
+"""
+from typing import TYPE_CHECKING, Any, ClassVar, Iterator, Optional, Union
+
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from . import parsers, query
+from .http import NestedQueryDict
+
+if TYPE_CHECKING:
+    from .coercion import Coercers
+
+__all__ = ["NestedFormParser", "NestedFormRenderer"]
+
+
+class NestedFormParser(BaseParser):
+    """
+    Parse `application/x-www-form-urlencoded` bodies into nested
+    dictionaries, in the charset given by the content type if it has one
+    (otherwise the request's).
+
+    The limits throw the library's usual `SuspiciousOperation` subclasses,
+    which (not being DRF exceptions) Django turns into 400 responses, as
+    it would for its own `QueryDict`.
+    """
+
+    media_type = "application/x-www-form-urlencoded"
+
+    coerce: ClassVar[Union[bool, "Coercers"]] = True
+    max_num_fields: ClassVar[Optional[int]] = None
+    max_depth: ClassVar[int] = 5
+    chunk_size: ClassVar[int] = 65536
+
+    def parse(self, stream, media_type=None, parser_context=None) -> NestedQueryDict:
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        max_num_fields = self.max_num_fields
+        if max_num_fields is None:
+            max_num_fields = settings.DATA_UPLOAD_MAX_NUMBER_FIELDS
+            # Django allows the limit to be disabled entirely.
+            if max_num_fields is None:
+                max_num_fields = float("inf")
+        data = parsers.parse_urlencoded(
+            stream,
+            media_type or self.media_type,
+            encoding=encoding,
+            coerce=self.coerce,
+            max_num_fields=max_num_fields,
+            max_depth=self.max_depth,
+            chunk_size=self.chunk_size,
+        )
+        return NestedQueryDict(data, encoding=encoding, coerced=self.coerce)
+
+
+class NestedFormRenderer(BaseRenderer):
+    """
+    Render responses as `application/x-www-form-urlencoded`, in the form
+    `query.dumps` gives.
+
+    A list at the top level (as a list view without pagination gives) is
+    rendered as the value of `list_key`, so that it has a name to nest
+    under; by default that's "results", as in DRF's paginated responses.
+
+    Given `max_num_fields` or `max_depth`, rendering data which would go
+    over them throws `ValueError` (see `query.iterdumps`), rather than
+    sending something which couldn't be parsed with the same limits.
+    """
+
+    media_type = "application/x-www-form-urlencoded"
+    format = "form"
+    charset = "utf-8"
+
+    coerce: ClassVar[Union[bool, "Coercers"]] = True
+    max_num_fields: ClassVar[Optional[int]] = None
+    max_depth: ClassVar[Optional[int]] = None
+    list_key: ClassVar[str] = "results"
+    chunk_size: ClassVar[int] = 65536
+
+    def render(self, data: Any, accepted_media_type=None, renderer_context=None) -> bytes:
+        return b"".join(self.iter_render(data, accepted_media_type, renderer_context))
+
+    def iter_render(self, data: Any, accepted_media_type=None, renderer_context=None) -> Iterator[bytes]:
+        """
+        Give the rendered body in pieces of about `chunk_size` bytes, with
+        only one piece held at a time.
+        """
+        if data is None:
+            return
+        if isinstance(data, list):
+            data = {self.list_key: data}
+        pairs = query.iterdumps(
+            data,
+            encoding=self.charset,
+            coerce=self.coerce,
+            max_num_fields=self.max_num_fields,
+            max_depth=self.max_depth,
+        )
+        pending = []
+        size = 0
+        separator = ""
+        for pair in pairs:
+            pending.append(pair)
+            size += len(pair)
+            if self.chunk_size <= size:
+                yield (separator + "&".join(pending)).encode("ascii")
+                separator = "&"
+                pending = []
+                size = 0
+        if pending:
+            yield (separator + "&".join(pending)).encode("ascii")
@@ -10,7 +10,29 @@ from .test_query import (
     TestDumpQueries,
     TestRoundTripping,
     TestManyFields,
+    TestPathologicalLimits,
+    TestBatchCoercion,
+    TestInterning,
+    TestExtract,
+    TestOnlyAndExclude,
+    TestParseBudget,
+    TestThreadSafety,
+    TestAsyncRequestParser,
+    TestParseBudgetRequests,
 )
+from .test_complexity import TestLinearComplexity
+from .test_flat import TestPathIndexMatchesNested, TestPathIndexAccess
+from .test_imports import TestImportWithoutDjango, TestLazyExceptions
+from .test_http import TestNestedQueryDict
+from .test_transcode import TestLoadsToJson, TestJsonToUrlencoded
+from .test_forms import TestNestedForms
+from .test_openapi import TestOpenAPI
+from .test_parsers import TestParsers, TestParsersWithDjango
+from .test_coercion import TestCoercers
+from .test_archive import TestArchive
+from .test_profiling import TestKeyShapeProfiler, TestKeyShapeProfilerRequests
+from .test_differential import TestDifferentialCorpora
+from .test_rest_framework import TestRestFramework
 
 __all__ = [
     "TestLoadDjangoQueries",
@@ -21,6 +43,33 @@ __all__ = [
     "TestDumpQueries",
     "TestRoundTripping",
     "TestManyFields",
+    "TestPathologicalLimits",
+    "TestBatchCoercion",
+    "TestInterning",
+    "TestExtract",
+    "TestOnlyAndExclude",
+    "TestParseBudget",
+    "TestThreadSafety",
+    "TestAsyncRequestParser",
+    "TestParseBudgetRequests",
+    "TestLinearComplexity",
+    "TestPathIndexMatchesNested",
+    "TestPathIndexAccess",
+    "TestImportWithoutDjango",
+    "TestLazyExceptions",
+    "TestNestedQueryDict",
+    "TestLoadsToJson",
+    "TestJsonToUrlencoded",
+    "TestNestedForms",
+    "TestOpenAPI",
+    "TestParsers",
+    "TestParsersWithDjango",
+    "TestCoercers",
+    "TestArchive",
+    "TestKeyShapeProfiler",
+    "TestKeyShapeProfilerRequests",
+    "TestDifferentialCorpora",
+    "TestRestFramework",
 ]
 
 if __name__ == "__main__":
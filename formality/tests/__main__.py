@@ -2,6 +2,19 @@ import sys
 import unittest
 
 from .test_query import *
+from .test_complexity import *
+from .test_flat import *
+from .test_imports import *
+from .test_http import *
+from .test_transcode import *
+from .test_forms import *
+from .test_openapi import *
+from .test_parsers import *
+from .test_coercion import *
+from .test_archive import *
+from .test_profiling import *
+from .test_differential import *
+from .test_rest_framework import *
 
 if __name__ == "__main__":
     unittest.main(
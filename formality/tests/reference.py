@@ -0,0 +1,328 @@
+"""
+A frozen copy of the straightforward, one field at a time implementation of
+`query.loads`, `query.load` and `query.dumps`, as the reference every other
+way of parsing (bytes input, batch coercion, interning, `flat`,
+`transcode`, `parsers` and so on) is checked against by
+`test_differential`.
+
+This is deliberately not shared with `query`, and shouldn't be changed to
+match it, or optimised: if `query` needs to behave differently, that's a
+change to the semantics, and this is updated on purpose, separately.
+Only the limits and `coerce` as a bool are supported; everything else is an
+optimisation or an option layered over these semantics.
+"""
+import json.decoder
+import json.scanner
+import string
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import quote_plus, unquote
+
+from formality import exceptions
+
+LOAD_CONSTANTS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "NaN": json.decoder.NaN,
+    "Infinity": json.decoder.PosInf,
+    "-Infinity": json.decoder.NegInf,
+}
+DUMP_CONSTANTS = {
+    True: "true",
+    False: "false",
+    None: "null",
+    json.decoder.PosInf: "Infinity",
+    json.decoder.NegInf: "-Infinity",
+}
+
+
+def loads(
+    qs: Union[str, bytes],
+    *,
+    encoding: str = "utf-8",
+    coerce: bool = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+) -> Dict[Union[str, int], Any]:
+    obj: Dict[Union[str, int], Any] = {}
+    if not qs:
+        return obj
+    if max_input_bytes is not None and max_input_bytes < len(qs):
+        raise exceptions.DataTooLarge(len(qs), max_input_bytes)
+    if not isinstance(qs, str):
+        try:
+            qs = str(qs, encoding)
+        except UnicodeDecodeError:
+            qs = str(qs, "iso-8859-1")
+    if max_num_fields:
+        num_fields = 1 + qs.count("&")
+        if max_num_fields < num_fields:
+            raise exceptions.TooManyFieldsSent(
+                f"The number of GET/POST parameters exceeded {max_num_fields!r}; received {num_fields!r} parameters"
+            )
+    seen_fields = 0
+    for part in qs.split("&"):
+        key, sep, val = part.partition("=")
+        if not key:
+            continue
+        obj, seen_fields = _load_key_value(
+            key,
+            val,
+            obj,
+            encoding=encoding,
+            coerce=coerce,
+            max_num_fields=max_num_fields,
+            max_depth=max_depth,
+            seen_fields=seen_fields,
+            max_key_length=max_key_length,
+            max_value_length=max_value_length,
+            max_keys_per_mapping=max_keys_per_mapping,
+        )
+    return obj
+
+
+def load(
+    pairs,
+    *,
+    encoding: str = "utf-8",
+    coerce: bool = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+) -> Dict[Union[str, int], Any]:
+    obj: Dict[Union[str, int], Any] = {}
+    if not pairs:
+        return obj
+    limits = dict(
+        encoding=encoding,
+        coerce=coerce,
+        max_num_fields=max_num_fields,
+        max_depth=max_depth,
+        max_key_length=max_key_length,
+        max_value_length=max_value_length,
+        max_keys_per_mapping=max_keys_per_mapping,
+    )
+    seen_fields = 0
+    seen_bytes = 0
+    for num_fields, (key, val) in enumerate(pairs, start=1):
+        if max_num_fields < num_fields:
+            raise exceptions.TooManyFieldsSent(
+                f"The number of GET/POST parameters exceeded {max_num_fields!r}; received {num_fields!r} parameters"
+            )
+        if max_input_bytes is not None:
+            seen_bytes += len(key)
+            for valpart in val if isinstance(val, list) else (val,):
+                if isinstance(valpart, (str, bytes)):
+                    seen_bytes += len(valpart)
+            if max_input_bytes < seen_bytes:
+                raise exceptions.DataTooLarge(seen_bytes, max_input_bytes)
+        if not key:
+            continue
+        if not isinstance(val, list):
+            obj, seen_fields = _load_key_value(key, val, obj, seen_fields=seen_fields, **limits)
+        elif len(val) == 1:
+            obj, seen_fields = _load_key_value(key, val[0], obj, seen_fields=seen_fields, **limits)
+        elif val:
+            for i, valpart in enumerate(val):
+                # a[b]: [1, 2] becomes a[b][0]=1&a[b][1]=2, but a[]: [1, 2]
+                # and a[0]: [1, 2] are left as they are.
+                usekey = key
+                if key[-2:] != "[]":
+                    last_open, last_close = key.rfind("["), key.rfind("]")
+                    if last_open and last_close:
+                        subcomponent = key[last_open + 1 : last_close]
+                        if not all(chr in string.digits for chr in subcomponent):
+                            usekey = f"{key}[{i}]"
+                obj, seen_fields = _load_key_value(
+                    usekey, valpart, obj, seen_fields=seen_fields, **limits
+                )
+    return obj
+
+
+def _load_key_value(
+    key: str,
+    val: Any,
+    obj,
+    *,
+    encoding: str,
+    coerce: bool,
+    max_num_fields: int,
+    max_depth: int,
+    seen_fields: int,
+    max_key_length: Optional[int],
+    max_value_length: Optional[int],
+    max_keys_per_mapping: Optional[int],
+):
+    if max_key_length is not None and max_key_length < len(key):
+        raise exceptions.KeyTooLong(key, max_key_length)
+    raw_key = key
+    key = unquote(key.replace("+", " "), encoding)
+    if not key:
+        return obj, seen_fields
+    if "[[" in key or "]]" in key or key[0:2] == "[]":
+        raise exceptions.MalformedData(key)
+    total_depth = key.count("][") + key[0 : key.find("]")].count("[")
+    if max_depth < total_depth:
+        raise exceptions.TooManyFieldsSent(
+            f"The depth of nested GET/POST parameters exceeded {max_depth!r}; received {total_depth!r} nested parameters"
+        )
+    keys = _split_key(key)
+    if max_value_length is not None and isinstance(val, (str, bytes)) and max_value_length < len(val):
+        # Reported with the raw key, as it was given.
+        raise exceptions.ValueTooLong(raw_key, len(val), max_value_length)
+    if isinstance(val, str):
+        val = unquote(val.replace("+", " "), encoding)
+    seen_fields += len(keys)
+    if max_num_fields < seen_fields:
+        raise _too_many_nested_fields(max_num_fields, seen_fields)
+    if coerce and val:
+        val = _coerce_value(val)
+    return _set_value(
+        obj,
+        keys,
+        val,
+        max_num_fields=max_num_fields,
+        max_keys_per_mapping=max_keys_per_mapping,
+        seen_fields=seen_fields,
+    )
+
+
+def _split_key(key: str) -> List[str]:
+    keys = key.split("][")
+    if "[" in keys[0] and keys[-1][-1] == "]":
+        keys[-1] = keys[-1][:-1]
+        return [*keys.pop(0).split("["), *keys]
+    return [key]
+
+
+def _is_index(key: str) -> bool:
+    # Note that "" is an index too (with nothing to convert).
+    return all(chr in string.digits for chr in key)
+
+
+def _coerce_value(val: Any) -> Any:
+    if val in LOAD_CONSTANTS:
+        return LOAD_CONSTANTS[val]
+    if isinstance(val, str):
+        match = json.scanner.NUMBER_RE.fullmatch(val)
+        if match is not None:
+            integer, frac, exp = match.groups()
+            if frac or exp:
+                return float(integer + (frac or "") + (exp or ""))
+            return int(integer)
+        if _is_index(val) and val[0] != "0":
+            return int(val)
+    return val
+
+
+def _too_many_nested_fields(max_num_fields: int, seen_fields: int):
+    return exceptions.TooManyFieldsSent(
+        f"The number of GET/POST parameters (including nesting) exceeded {max_num_fields!r}; received {seen_fields!r} (possibly nested) parameters"
+    )
+
+
+def _set_value(
+    obj,
+    keys: List[str],
+    val: Any,
+    *,
+    max_num_fields: int,
+    max_keys_per_mapping: Optional[int],
+    seen_fields: int,
+):
+    if len(keys) == 1:
+        key = keys[0]
+        if isinstance(obj.get(key), list):
+            obj[key].append(val)
+        elif key in obj:
+            obj[key] = [obj[key], val]
+        elif max_keys_per_mapping is not None and max_keys_per_mapping <= len(obj):
+            raise exceptions.TooManyKeys(key, max_keys_per_mapping)
+        else:
+            obj[key] = val
+        return obj, seen_fields
+
+    cur = obj
+    last = len(keys) - 1
+    for i, key in enumerate(keys):
+        if not key:
+            key = len(cur)
+        elif isinstance(key, str) and _is_index(key):
+            key = int(key)
+            if max_num_fields < key:
+                raise exceptions.TooManyFieldsSent(
+                    f"The index [{key}] of parameter exceeded {max_num_fields!r} total allowed parameters"
+                )
+        if i < last:
+            try:
+                bit = cur[key]
+            except (IndexError, KeyError):
+                # A list if the next part is an index (or an append).
+                bit = [] if _is_index(keys[i + 1]) else {}
+        else:
+            bit = val
+        if isinstance(cur, list):
+            # Backfilled with empty values of the same type, if it has one.
+            while len(cur) <= key:
+                try:
+                    cur.append(type(bit)())
+                except TypeError:
+                    cur.append(None)
+        elif (
+            max_keys_per_mapping is not None
+            and isinstance(cur, dict)
+            and max_keys_per_mapping <= len(cur)
+            and key not in cur
+        ):
+            raise exceptions.TooManyKeys(key, max_keys_per_mapping)
+        cur[key] = cur = bit
+    return obj, seen_fields
+
+
+def dumps(data: Dict[Union[str, int], Any], *, encoding: str = "utf-8") -> str:
+    parts: List[str] = []
+
+    def add(key, value):
+        return f"{quote_plus(key, encoding=encoding)}={quote_plus(_dump_value(value), encoding=encoding)}"
+
+    def build(prefix, value):
+        # Falsy keys (like "" or 0) are treated as the top level.
+        if prefix:
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    build(f"{prefix}[{i}]", item)
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    build(f"{prefix}[{key}]", item)
+            else:
+                parts.append(add(prefix, value))
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                parts.append(add(f"{prefix}[{i}]", item))
+        else:
+            for key, item in value.items():
+                build(key, item)
+
+    build("", data)
+    return "&".join(parts)
+
+
+def _dump_value(value: Any) -> str:
+    if value is True or value is False:
+        return DUMP_CONSTANTS[value]
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if value in DUMP_CONSTANTS:
+        return DUMP_CONSTANTS[value]
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        return float.__repr__(value)
+    return str(value)
@@ -0,0 +1,206 @@
+import json
+import os
+import pickle
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import TestCase, main
+
+import formality
+from formality import exceptions
+from formality.archive import Archive, ParsedRecord, parse_archive
+
+from .test_query import TestLoadJQueryBbqQueries, TestLoadRackQueries
+
+
+class TestArchive(TestCase):
+    records = (
+        *(qs.encode() for qs, _ in TestLoadJQueryBbqQueries.str_examples if qs),
+        *(qs.encode() for qs, _ in TestLoadRackQueries.str_examples if qs),
+        "café=☃".encode(),
+        b"a[[=1",
+        b"&".join(b"a=%d" % i for i in range(2000)),
+    )
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def archives(self):
+        # Only records without newlines can be written one per line.
+        lines = [record for record in self.records if b"\n" not in record]
+        yield "lines", lines, self.write("archive.txt", b"\n".join(lines) + b"\n")
+        yield "lines", lines, self.write("crlf.txt", b"\r\n".join(lines))
+        yield "length-prefixed", list(self.records), self.write(
+            "archive.bin",
+            b"".join(struct.pack("!I", len(record)) + record for record in self.records),
+        )
+
+    def expected(self, record):
+        try:
+            return formality.query.loads(record), None
+        except Exception as e:
+            return None, type(e)
+
+    def test_records(self):
+        for format, records, path in self.archives():
+            with self.subTest(format=format, path=path):
+                with Archive(path, format) as archive:
+                    found = []
+                    for record in archive:
+                        self.assertIsInstance(record, memoryview)
+                        found.append(bytes(record))
+                        record.release()
+                self.assertEqual(found, records)
+
+    def test_parse(self):
+        for format, records, path in self.archives():
+            with self.subTest(format=format, path=path):
+                parsed = list(parse_archive(path, format))
+                self.assertEqual(len(parsed), len(records))
+                for record, outcome in zip(records, parsed):
+                    result, error = self.expected(record)
+                    self.assertEqual(outcome.result, result)
+                    self.assertEqual(type(outcome.error) if outcome.error else None, error)
+                    self.assertEqual(outcome.length, len(record))
+                    self.assertGreaterEqual(outcome.elapsed, 0)
+                self.assertIn(
+                    exceptions.MalformedData, {type(outcome.error) for outcome in parsed}
+                )
+
+    def test_options_and_parser(self):
+        path = self.write("archive.txt", b"a=1&b=2\nc=true\n")
+        self.assertEqual(
+            [p.result for p in parse_archive(path, coerce=False)],
+            [{"a": "1", "b": "2"}, {"c": "true"}],
+        )
+        self.assertEqual(
+            [type(p.error) for p in parse_archive(path, max_num_fields=1)],
+            [exceptions.TooManyFieldsSent, type(None)],
+        )
+        self.assertEqual(
+            [p.result.to_dict() for p in parse_archive(path, parser=formality.flat.loads)],
+            [{"a": 1, "b": 2}, {"c": True}],
+        )
+        self.assertEqual(
+            [p.result for p in parse_archive(path, keep_results=False)], [None, None]
+        )
+
+    def test_spans(self):
+        for format, records, path in self.archives():
+            with Archive(path, format) as archive:
+                expected = [(offset, bytes(record)) for offset, record in archive.records()]
+                for count in (1, 2, 3, 7, 1000):
+                    with self.subTest(format=format, path=path, count=count):
+                        spans = archive.spans(count)
+                        self.assertLessEqual(len(spans), count)
+                        self.assertEqual(spans[0][0], 0)
+                        self.assertEqual(spans[-1][1], len(archive))
+                        found = [
+                            (offset, bytes(record))
+                            for start, end in spans
+                            for offset, record in archive.records(start, end)
+                        ]
+                        self.assertEqual(found, expected)
+
+    def test_executor(self):
+        for format, records, path in self.archives():
+            serial = [(p.offset, p.result, type(p.error)) for p in parse_archive(path, format)]
+            for executor in (ThreadPoolExecutor(max_workers=2), ProcessPoolExecutor(max_workers=2)):
+                with executor:
+                    with self.subTest(format=format, path=path, executor=executor):
+                        parallel = [
+                            (p.offset, p.result, type(p.error))
+                            for p in parse_archive(path, format, executor=executor, spans=5)
+                        ]
+                        self.assertEqual(parallel, serial)
+
+    def test_har(self):
+        har = {
+            "log": {
+                "entries": [
+                    {"request": {"method": "GET", "url": "https://example.com/?a[]=1&a[]=2"}},
+                    {
+                        "request": {
+                            "method": "POST",
+                            "url": "https://example.com/?ignored=1",
+                            "postData": {"mimeType": "application/json", "text": '{"b": {"c": true}}'},
+                        }
+                    },
+                    {
+                        "request": {
+                            "method": "POST",
+                            "url": "https://example.com/",
+                            "postData": {
+                                "mimeType": "application/x-www-form-urlencoded; charset=utf-8",
+                                "text": "d[e]=f",
+                            },
+                        }
+                    },
+                    {
+                        "request": {
+                            "method": "POST",
+                            "url": "https://example.com/",
+                            "postData": {"mimeType": "text/plain", "text": "hello"},
+                        }
+                    },
+                ]
+            }
+        }
+        path = self.write("archive.har", json.dumps(har).encode())
+        parsed = list(parse_archive(path, "har"))
+        self.assertEqual([p.offset for p in parsed], [0, 1, 2, 3])
+        self.assertEqual(
+            [p.result for p in parsed[:3]],
+            [{"a": [1, 2]}, {"b": {"c": True}}, {"d": {"e": "f"}}],
+        )
+        self.assertIsInstance(parsed[3].error, ValueError)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(
+                [p.result for p in parse_archive(path, "har", executor=executor, spans=3)],
+                [p.result for p in parsed],
+            )
+
+    def test_truncated_and_empty(self):
+        path = self.write("truncated.bin", struct.pack("!I", 10) + b"a=1")
+        with Archive(path, "length-prefixed") as archive:
+            with self.assertRaisesRegex(ValueError, "Truncated record at offset 4"):
+                list(archive.records())
+        path = self.write("empty.txt", b"")
+        with Archive(path) as archive:
+            self.assertEqual(list(archive), [])
+            self.assertEqual(archive.spans(4), [])
+        with self.assertRaises(ValueError):
+            Archive(path, "csv")
+
+    def test_loads_memoryview(self):
+        for record in (*self.records[:-2], b"a=%E9", "a=é".encode("latin-1")):
+            with self.subTest(record=record):
+                self.assertEqual(
+                    formality.query.loads(memoryview(record), max_depth=1000),
+                    formality.query.loads(record, max_depth=1000),
+                )
+
+    def test_pickling(self):
+        record = ParsedRecord(3, 4, {"a": 1}, exceptions.MalformedData("a[["), 0.5)
+        copied = pickle.loads(pickle.dumps(record))
+        self.assertEqual(
+            (copied.offset, copied.length, copied.result, type(copied.error), copied.elapsed),
+            (3, 4, {"a": 1}, exceptions.MalformedData, 0.5),
+        )
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
@@ -0,0 +1,172 @@
+import datetime
+import decimal
+import pickle
+import uuid
+from unittest import TestCase, main
+
+import formality
+from formality.coercion import DATE, DATETIME, DECIMAL, UUID, Coercer, Coercers
+from formality.http import NestedQueryDict
+
+from .test_query import (
+    TestLoadJQueryBbqQueries,
+    TestLoadRackQueries,
+    TestLoadOdditiesAndMalformed,
+    TestBatchCoercion,
+)
+
+
+class TestCoercers(TestCase):
+    coercers = Coercers(DATE, DATETIME, DECIMAL, UUID)
+    typed = (
+        ("a=2024-01-31", {"a": datetime.date(2024, 1, 31)}),
+        ("a=2024-01-31T12:30:00", {"a": datetime.datetime(2024, 1, 31, 12, 30)}),
+        (
+            "a=2024-01-31T12:30:00.5%2B01:00",
+            {
+                "a": datetime.datetime(
+                    2024, 1, 31, 12, 30, 0, 500000,
+                    tzinfo=datetime.timezone(datetime.timedelta(hours=1)),
+                )
+            },
+        ),
+        ("a[]=9.99&a[]=-0.5&a[]=10", {"a": [decimal.Decimal("9.99"), decimal.Decimal("-0.5"), 10]}),
+        (
+            "id=12345678-1234-5678-1234-567812345678",
+            {"id": uuid.UUID("12345678-1234-5678-1234-567812345678")},
+        ),
+        # Looks like one, but isn't, so it's coerced as it would be otherwise.
+        ("a=2024-13-31&b=007.5&c=1.5e3&d=123456781234567812345678123456781234", {
+            "a": "2024-13-31", "b": "007.5", "c": 1500.0, "d": 123456781234567812345678123456781234,
+        }),
+        ("a=12345678123456781234567812345678----", {"a": "12345678123456781234567812345678----"}),
+        ("a=true&b=null&c=1&d=", {"a": True, "b": None, "c": 1, "d": ""}),
+    )
+
+    def corpora(self):
+        yield TestBatchCoercion.examples
+        yield (qs for qs, _ in TestLoadJQueryBbqQueries.str_examples)
+        yield (qs for qs, _ in TestLoadRackQueries.str_examples)
+        yield (qs for qs, _ in TestLoadOdditiesAndMalformed.str_examples)
+
+    def test_empty_registry_is_the_default(self):
+        for corpus in self.corpora():
+            for qs in corpus:
+                with self.subTest(data=qs):
+                    self.assertEqual(
+                        formality.query.loads(
+                            qs, coerce=Coercers(), max_depth=1000, max_num_fields=99999
+                        ),
+                        formality.query.loads(qs, max_depth=1000, max_num_fields=99999),
+                    )
+
+    def test_inlined_default_coercion(self):
+        load = Coercers().load
+        for val in ("0", "-0", "-", "1.", ".5", "1e5", "1E-5", "0123", "١٢", "²", "NaN", "true", "x1", b"1", None):
+            with self.subTest(val=val):
+                self.assertEqual(repr(load(val)), repr(formality.query._coerce_value(val)))
+
+    def test_typed_values(self):
+        for qs, expected in self.typed:
+            for options in ({}, {"batch_coerce": True}):
+                with self.subTest(data=qs, **options):
+                    self.assertEqual(
+                        formality.query.loads(qs, coerce=self.coercers, **options), expected
+                    )
+
+    def test_round_trip(self):
+        # Apart from floats, which are written the same way as decimals.
+        for qs, expected in self.typed:
+            if any(isinstance(value, float) for value in expected.values()):
+                continue
+            with self.subTest(data=qs):
+                dumped = formality.query.dumps(expected, coerce=self.coercers)
+                self.assertEqual(formality.query.loads(dumped, coerce=self.coercers), expected)
+        self.assertEqual(
+            formality.query.dumps(
+                {"a": decimal.Decimal("1E+1"), "b": datetime.date(2024, 1, 31)},
+                coerce=self.coercers,
+            ),
+            "a=10.0&b=2024-01-31",
+        )
+
+    def test_order_and_replacing(self):
+        postcode = Coercer("postcode", str, lambda val: f"#{val}", lengths=5, chars="0123456789")
+        coercers = Coercers(postcode, DECIMAL)
+        self.assertIn("postcode", coercers)
+        self.assertEqual(
+            formality.query.loads("a=01234&b=12345&c=123&d=1.5", coerce=coercers),
+            {"a": "#01234", "b": "#12345", "c": 123, "d": decimal.Decimal("1.5")},
+        )
+        coercers.register(Coercer("postcode", str, str.lower, lengths=5, first="AB"))
+        self.assertEqual(list(coercers), [coercers.coercers[0], DECIMAL])
+        self.assertEqual(
+            formality.query.loads("a=ABCDE&b=12345", coerce=coercers), {"a": "abcde", "b": 12345}
+        )
+        with self.assertRaises(ValueError):
+            Coercer("never", str, str, chars="")
+        with self.assertRaises(ValueError):
+            Coercer("never", str, str, contains="ab")
+
+    def test_integers_claimed_in_batches(self):
+        postcode = Coercer("postcode", str, lambda val: f"#{val}", lengths=5, chars="0123456789")
+        upper = Coercer("upper", str, str.lower, first="ABCDEF")
+        self.assertTrue(Coercers(postcode).claims_digits)
+        self.assertTrue(Coercers(upper, Coercer("digits", int, int, chars="0123456789")).claims_digits)
+        self.assertFalse(Coercers(DATE, DATETIME, DECIMAL, UUID).claims_digits)
+        self.assertFalse(Coercers(upper).claims_digits)
+        self.assertFalse(Coercers().claims_digits)
+        qs = "&".join(f"a[]={i}&b[]=A{i}" for i in range(9990, 10010))
+        for coercers in (Coercers(postcode), Coercers(upper), Coercers(DATE, UUID)):
+            with self.subTest(coercers=coercers):
+                self.assertEqual(
+                    formality.query.loads(qs, coerce=coercers, batch_coerce=True),
+                    formality.query.loads(qs, coerce=coercers),
+                )
+
+    def test_other_entry_points(self):
+        qs = "a[b]=2024-01-31&c=9.99&d[]=1"
+        expected = formality.query.loads(qs, coerce=self.coercers)
+        self.assertEqual(
+            formality.query.extract(qs, {"a[b]", "c"}, coerce=self.coercers),
+            {"a[b]": expected["a"]["b"], "c": expected["c"]},
+        )
+        self.assertEqual(formality.flat.loads(qs, coerce=self.coercers).to_dict(), expected)
+        self.assertEqual(
+            formality.query.load([("a[b]", ["2024-01-31"]), ("c", "9.99"), ("d[]", "1")], coerce=self.coercers),
+            expected,
+        )
+        self.assertEqual(
+            formality.parsers.parse(
+                qs.encode(), "application/x-www-form-urlencoded", coerce=self.coercers
+            ),
+            expected,
+        )
+        self.assertEqual(
+            formality.query.loads(qs, coerce=self.coercers, batch_coerce=True),
+            expected,
+        )
+
+    def test_pickling(self):
+        coercers = pickle.loads(pickle.dumps(self.coercers))
+        self.assertEqual([c.name for c in coercers], [c.name for c in self.coercers])
+        for qs, expected in self.typed:
+            with self.subTest(data=qs):
+                self.assertEqual(formality.query.loads(qs, coerce=coercers), expected)
+
+    def test_nested_query_dict(self):
+        qs = "a[b]=2024-01-31&c=9.99&c=1.0"
+        data = NestedQueryDict(formality.query.loads(qs, coerce=self.coercers), coerced=self.coercers)
+        self.assertEqual(data.getlist("a[b]"), ["2024-01-31"])
+        self.assertEqual(data.getlist("c"), ["9.99", "1.0"])
+        self.assertEqual(data.urlencode(), "a%5Bb%5D=2024-01-31&c=9.99&c=1.0")
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
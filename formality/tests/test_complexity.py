@@ -0,0 +1,197 @@
+import sys
+import time
+import tracemalloc
+from unittest import TestCase, main
+import formality
+from django.core.exceptions import SuspiciousOperation
+
+
+# Each family takes a size (roughly the number of fields) and returns the
+# adversarial input for it, along with the limits it's expected to be parsed
+# with. Limits scale with the size, so that the bigger inputs aren't
+# rejected up-front and the actual parsing cost gets measured.
+def deep_nesting(n):
+    return "&".join(f"k{i}[a][b][c][d][e]=1" for i in range(n)), {
+        "max_num_fields": 6 * n,
+    }
+
+
+def huge_indices(n):
+    # A handful of keys, each asking for an array to be backfilled with n
+    # items, and a limit which allows all of them (with `count_holes`, the
+    # holes count towards it, as does each key's own two fields).
+    keys = 10
+    return "&".join(f"k{i}[{n}]=1" for i in range(keys)), {
+        "max_num_fields": keys * (n + 2),
+        "count_holes": True,
+    }
+
+
+def array_appends(n):
+    return "&".join("a[][][][][]=1" for i in range(n)), {
+        "max_num_fields": 6 * n,
+    }
+
+
+def empty_separators(n):
+    return "&" * n + "a=1", {"max_num_fields": n + 1}
+
+
+def giant_key(n):
+    return "k" * (20 * n) + "[" + "v" * (20 * n) + "]=1", {}
+
+
+def long_similar_keys(n):
+    # Not hash collisions: str hashing is randomised per process, so they
+    # can't be prepared ahead of time, and the int keys which could collide
+    # are only ever indexes, which are rejected above `max_num_fields`. Lots
+    # of distinct siblings sharing a long prefix is what can be sent, and is
+    # the worst case for comparing keys.
+    prefix = "x" * 64
+    return "&".join(f"a[{prefix}{i}]=1" for i in range(n)), {
+        "max_num_fields": 2 * n,
+    }
+
+
+FAMILIES = {
+    "deep_nesting": deep_nesting,
+    "huge_indices": huge_indices,
+    "array_appends": array_appends,
+    "empty_separators": empty_separators,
+    "giant_key": giant_key,
+    "long_similar_keys": long_similar_keys,
+}
+
+
+def measure(func, repeat=3):
+    """
+    Return the best time (in seconds) out of `repeat` calls of `func`, and
+    the peak memory (in bytes) allocated during a separate, traced call.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak
+
+
+def count_calls(func):
+    """
+    Return the number of Python and builtin function calls made by `func`,
+    which (unlike how long it takes) is the same on every run.
+    """
+    calls = 0
+
+    def profile(frame, event, arg):
+        nonlocal calls
+        if event == "call" or event == "c_call":
+            calls += 1
+
+    sys.setprofile(profile)
+    try:
+        func()
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+def parse_or_reject(qs, kwargs):
+    try:
+        return formality.query.loads(qs, **kwargs)
+    except SuspiciousOperation:
+        return None
+
+
+class TestLinearComplexity(TestCase):
+    """
+    Going from `small` to `small * growth` sized inputs should only cost
+    `growth` times as many function calls, as much memory and as much time;
+    `slack` leaves room for constant overheads, while still being well below
+    what anything quadratic would need.
+
+    Call counts are exact, but can't see superlinear work inside a builtin
+    (like a str method), so the best of `repeat` timings is checked too, with
+    the larger `timing_slack` as timings are noisy.
+    """
+
+    small = 1000
+    growth = 8
+    slack = 3
+    timing_slack = 5
+    repeat = 5
+
+    def assertLinear(self, name, small, large, slack=None):
+        limit = self.growth * (slack or self.slack)
+        self.assertLess(
+            large / small,
+            limit,
+            f"{name} grew by {large / small:.1f}x for {self.growth}x the input",
+        )
+
+    def test_loads(self):
+        for name, family in FAMILIES.items():
+            with self.subTest(family=name):
+                small_input = family(self.small)
+                large_input = family(self.small * self.growth)
+                small_calls = count_calls(lambda: parse_or_reject(*small_input))
+                large_calls = count_calls(lambda: parse_or_reject(*large_input))
+                small_time, small_peak = measure(
+                    lambda: parse_or_reject(*small_input), repeat=self.repeat
+                )
+                large_time, large_peak = measure(
+                    lambda: parse_or_reject(*large_input), repeat=self.repeat
+                )
+                self.assertLinear(f"{name} calls", small_calls, large_calls)
+                self.assertLinear(f"{name} peak memory", small_peak, large_peak)
+                self.assertLinear(
+                    f"{name} time", small_time, large_time, self.timing_slack
+                )
+
+    def test_dumps(self):
+        for name, family in FAMILIES.items():
+            small = parse_or_reject(*family(self.small))
+            large = parse_or_reject(*family(self.small * self.growth))
+            if not small or not large:
+                continue
+            with self.subTest(family=name):
+                small_calls = count_calls(lambda: formality.query.dumps(small))
+                large_calls = count_calls(lambda: formality.query.dumps(large))
+                small_time, small_peak = measure(
+                    lambda: formality.query.dumps(small), repeat=self.repeat
+                )
+                large_time, large_peak = measure(
+                    lambda: formality.query.dumps(large), repeat=self.repeat
+                )
+                self.assertLinear(f"{name} calls", small_calls, large_calls)
+                self.assertLinear(f"{name} peak memory", small_peak, large_peak)
+                self.assertLinear(
+                    f"{name} time", small_time, large_time, self.timing_slack
+                )
+
+    def test_backfilling_counts_towards_the_limit(self):
+        qs, kwargs = huge_indices(self.small)
+        formality.query.loads(qs, **kwargs)
+        with self.assertRaises(SuspiciousOperation):
+            formality.query.loads(
+                qs, max_num_fields=kwargs["max_num_fields"] - 1, count_holes=True
+            )
+        # Only when asked to, though.
+        formality.query.loads(qs, max_num_fields=kwargs["max_num_fields"] - 1)
+        self.assertEqual(formality.query.loads("a[999]=1")["a"][999], 1)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
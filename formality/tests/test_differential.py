@@ -0,0 +1,293 @@
+import json
+from unittest import TestCase, main
+
+import formality
+from formality.coercion import Coercers
+from formality.profiling import KeyShapeProfiler
+
+# Imported as a module, so the test cases the examples come from aren't
+# collected (and run) a second time from here.
+from . import reference, test_query
+
+try:
+    from hypothesis import example, given, strategies as st, settings as hyposettings
+
+    HAS_HYPOTHESIS = True
+except ModuleNotFoundError:
+    HAS_HYPOTHESIS = False
+
+
+# Every existing query string (or body) from the other tests, with the
+# encoding it's meant to be decoded with.
+CORPUS = (
+    *((qs, encoding) for qs, _, encoding, _ in test_query.TestLoadDjangoQueries.str_examples),
+    *((qs, encoding) for qs, _, encoding, _ in test_query.TestLoadDjangoQueries.bytes_examples),
+    *((qs, encoding) for qs, _, encoding, _ in test_query.TestLoadDjangoQueries.decoding_examples),
+    *((body, encoding) for body, encoding, _ in test_query.TestDjangoFormUrlEncoded.examples),
+    *((qs, "utf-8") for qs, _ in test_query.TestLoadJQueryBbqQueries.str_examples),
+    *((qs, "utf-8") for qs, _ in test_query.TestLoadRackQueries.str_examples),
+    *((qs, "utf-8") for qs, _ in test_query.TestLoadOdditiesAndMalformed.str_examples),
+    *((qs, "utf-8") for qs, _ in test_query.TestStrictlyUnhandledQueries.examples),
+    *((qs, "utf-8") for qs in test_query.TestManyFields.simple_overflow_examples),
+    *((qs, "utf-8") for qs in test_query.TestManyFields.complex_overflow_examples),
+    *((qs, "utf-8") for qs in test_query.TestManyFields.complex_depth_examples),
+    *((qs, "utf-8") for qs in test_query.TestBatchCoercion.examples),
+    *((qs, "utf-8") for _, qs in test_query.TestDumpQueries.examples),
+    ("foo[]=1&foo=2&foo[]=3", "utf-8"),
+    ("a=007&b=00&c=0&d=-0&e=0.50&f=1E3&g=%30%31", "utf-8"),
+    ("2=a&2[x]=b&a[2]=c&a[x]=d", "utf-8"),
+    ("a=1&a[b]=2", "utf-8"),
+    ("a[b]=1&a=2&a[]=3", "utf-8"),
+    ("a[999]=1", "utf-8"),
+    ("caf%C3%A9[%E9]=%FF&é=é", "utf-8"),
+    # A value which is too long, on a key with more parts than fields are
+    # allowed, which must be rejected for its length rather than its parts.
+    ("a[b][c]=12345", "utf-8"),
+    ("a=1&b[c][d]=12345", "utf-8"),
+)
+
+# Each set of limits the whole corpus is run with.
+LIMITS = (
+    {},
+    {"coerce": False},
+    {"max_num_fields": 99999, "max_depth": 1000},
+    {"max_num_fields": 5, "max_depth": 2},
+    {"max_key_length": 6, "max_value_length": 3},
+    {"max_keys_per_mapping": 2, "max_input_bytes": 40},
+    {"max_value_length": 3, "max_num_fields": 2},
+)
+
+# Some name nothing will ever be called, so that `exclude` turns on the
+# filtering without filtering anything.
+UNUSED_NAME = "formality-differential-unused"
+
+
+def outcome(parse, *args, **kwargs):
+    """
+    What calling `parse` gives, in a form where two outcomes are only equal if
+    the results are identical, including the key order, the types and NaNs,
+    or if they threw the same type of exception with the same message.
+
+    Keys which conflict (like a=1&a[b]=2) throw whatever `TypeError` putting
+    one where the other is gives, the message of which depends on how each
+    engine holds the values, so only the type of those is compared.
+    """
+    try:
+        result = parse(*args, **kwargs)
+    except TypeError as e:
+        return "error", type(e)
+    except Exception as e:
+        return "error", type(e), str(e)
+    return "ok", repr(result)
+
+
+def engines(data):
+    """
+    The optimised ways of parsing `data` which must each give the same
+    outcome as `reference.loads`, by name, each taking the same limits.
+    """
+    loads = formality.query.loads
+    parsers = {
+        "loads": loads,
+        "batch_coerce": lambda data, **kw: loads(data, batch_coerce=True, **kw),
+        "interner": lambda data, **kw: loads(data, interner=formality.query.Interner(), **kw),
+        "exclude": lambda data, **kw: loads(data, exclude={UNUSED_NAME}, **kw),
+        "profiler": lambda data, **kw: loads(data, profiler=KeyShapeProfiler(1), **kw),
+        "budget": lambda data, **kw: loads(
+            data,
+            budget=formality.query.ParseBudget(
+                kw.get("max_num_fields", 1000), kw.get("max_input_bytes")
+            ),
+            **kw,
+        ),
+        "flat": lambda data, **kw: formality.flat.loads(data, **kw).to_dict(),
+        "transcode": lambda data, **kw: json.loads(
+            formality.transcode.loads_to_json(data, **kw), object_pairs_hook=_pairs
+        ),
+    }
+    if not isinstance(data, str):
+        parsers["memoryview"] = lambda data, **kw: loads(memoryview(data), **kw)
+        parsers["parse_urlencoded"] = formality.parsers.parse_urlencoded
+    return parsers
+
+
+class _pairs(list):
+    """
+    JSON objects decoded as their pairs in order, so that transcoded JSON can
+    be compared against the reference result dumped and decoded the same way.
+    """
+
+
+def as_json(data):
+    return json.loads(json.dumps(data, separators=(",", ":")), object_pairs_hook=_pairs)
+
+
+def expected_outcome(data, **limits):
+    """
+    The reference outcome, and the same again for comparing against engines
+    which give JSON.
+    """
+    expected = outcome(reference.loads, data, **limits)
+    if expected[0] == "ok":
+        return expected, outcome(lambda: as_json(reference.loads(data, **limits)))
+    return expected, expected
+
+
+class DifferentialMixin:
+    def assertSameAsReference(self, data, **limits):
+        expected, expected_json = expected_outcome(data, **limits)
+        for name, parse in engines(data).items():
+            self.assertEqual(
+                outcome(parse, data, **limits),
+                expected_json if name == "transcode" else expected,
+                f"{name} differs on {data!r} with {limits!r}",
+            )
+        if limits.get("coerce", True):
+            self.assertEqual(
+                outcome(formality.query.loads, data, **{**limits, "coerce": Coercers()}),
+                expected,
+                f"coercers differs on {data!r} with {limits!r}",
+            )
+
+    def assertSameLoad(self, pairs, **limits):
+        self.assertEqual(
+            outcome(formality.query.load, pairs, **limits),
+            outcome(reference.load, pairs, **limits),
+            f"load differs on {pairs!r} with {limits!r}",
+        )
+
+    def assertSameDumps(self, data):
+        expected = outcome(reference.dumps, data)
+        message = f"dumps differs on {data!r}"
+        self.assertEqual(outcome(formality.query.dumps, data), expected, message)
+        self.assertEqual(outcome(formality.query.dumps, data, coerce=Coercers()), expected, message)
+
+
+class TestDifferentialCorpora(DifferentialMixin, TestCase):
+    """
+    Every engine gives the same outcome as the frozen reference on every
+    existing example, whether it's given as a str or bytes, under a range of
+    limits.
+    """
+
+    def test_loads(self):
+        for data, encoding in CORPUS:
+            inputs = (data,)
+            if isinstance(data, str):
+                inputs = (data, data.encode(encoding, "replace"))
+            for given in inputs:
+                for limits in LIMITS:
+                    self.assertSameAsReference(given, encoding=encoding, **limits)
+
+    def test_load(self):
+        for data, encoding in CORPUS:
+            if not isinstance(data, str) or not data:
+                continue
+            # As Django would give them, a list of values per key.
+            pairs = {}
+            for part in data.split("&"):
+                key, _, value = part.partition("=")
+                pairs.setdefault(key, []).append(value)
+            for limits in LIMITS:
+                self.assertSameLoad(list(pairs.items()), **limits)
+                self.assertSameLoad([(key, values[-1]) for key, values in pairs.items()], **limits)
+
+    def test_dumps(self):
+        for data in (
+            *test_query.TestRoundTripping.examples,
+            *(data for data, _ in test_query.TestDumpQueries.examples),
+            *(reference.loads(qs, max_depth=1000) for qs, _ in test_query.TestLoadRackQueries.str_examples),
+            {"": 1},
+            {0: [1, 2]},
+            {"a": float("nan"), "b": float("-inf"), "c": 1.0, "d": True, "e": None},
+        ):
+            self.assertSameDumps(data)
+
+
+if HAS_HYPOTHESIS:
+    names = st.sampled_from(("a", "b", "0", "00", "7", "%5B", "%5D", "+", "é", "%E9", "="))
+    segments = st.sampled_from(("[]", "[0]", "[1]", "[01]", "[x]", "[a]", "[", "]", "[[", "]]", "%5B%5D"))
+    keys = st.builds(
+        lambda name, rest: name + "".join(rest), names, st.lists(segments, max_size=6)
+    )
+    values = st.one_of(
+        st.sampled_from(
+            (
+                "", "1", "0", "007", "-1", "-0", "1.5", "1e3", "1E-3", ".5", "1.",
+                "true", "false", "null", "NaN", "Infinity", "-Infinity",
+                "%ZZ", "%31", "%E9", "+1", "3\r\n", "٣", "①",
+            )
+        ),
+        st.text(max_size=8),
+    )
+    fields = st.builds(lambda key, sep, value: key + sep + value, keys, st.sampled_from(("=", "")), values)
+    query_strings = st.one_of(
+        st.lists(fields, max_size=12).map("&".join),
+        st.text(),
+    )
+    limits = st.fixed_dictionaries(
+        {},
+        optional={
+            "coerce": st.booleans(),
+            "encoding": st.sampled_from(("utf-8", "iso-8859-1")),
+            "max_num_fields": st.integers(min_value=1, max_value=20),
+            "max_depth": st.integers(min_value=0, max_value=6),
+            "max_key_length": st.integers(min_value=0, max_value=12),
+            "max_value_length": st.integers(min_value=0, max_value=6),
+            "max_keys_per_mapping": st.integers(min_value=0, max_value=4),
+            "max_input_bytes": st.integers(min_value=0, max_value=80),
+        },
+    )
+    scalars = st.one_of(
+        st.none(),
+        st.booleans(),
+        st.integers(),
+        st.floats(),
+        st.text(max_size=8),
+    )
+    nested = st.recursive(
+        scalars,
+        lambda children: st.one_of(
+            st.lists(children, max_size=4),
+            st.dictionaries(st.one_of(st.text(max_size=4), st.integers(0, 9)), children, max_size=4),
+        ),
+        max_leaves=12,
+    )
+
+    class TestDifferentialFuzz(DifferentialMixin, TestCase):
+        """
+        Every engine gives the same outcome as the frozen reference on
+        generated query strings, built from the pieces that most often trip
+        up parsing, under generated limits.
+        """
+
+        @given(qs=query_strings, limits=limits, as_bytes=st.booleans())
+        @example(qs="a[b][c]=12345", limits={"max_value_length": 3, "max_num_fields": 2}, as_bytes=False)
+        @example(qs="a[b][c]=12345", limits={"max_value_length": 3, "max_num_fields": 2}, as_bytes=True)
+        @hyposettings(max_examples=300, deadline=None)
+        def test_loads(self, qs, limits, as_bytes):
+            data = qs.encode(limits.get("encoding", "utf-8"), "replace") if as_bytes else qs
+            self.assertSameAsReference(data, **limits)
+
+        @given(
+            pairs=st.lists(st.tuples(keys, st.one_of(values, st.lists(values, max_size=3))), max_size=8),
+            limits=limits,
+        )
+        @hyposettings(max_examples=200, deadline=None)
+        def test_load(self, pairs, limits):
+            self.assertSameLoad(pairs, **limits)
+
+        @given(data=st.dictionaries(st.text(min_size=1, max_size=4), nested, max_size=4))
+        @hyposettings(max_examples=200, deadline=None)
+        def test_dumps(self, data):
+            self.assertSameDumps(data)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
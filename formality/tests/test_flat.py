@@ -0,0 +1,137 @@
+from unittest import TestCase, main
+import formality.flat
+from django.core.exceptions import TooManyFieldsSent
+
+from .test_query import (
+    TestLoadDjangoQueries,
+    TestLoadJQueryBbqQueries,
+    TestLoadRackQueries,
+    TestLoadOdditiesAndMalformed,
+    TestStrictlyUnhandledQueries,
+    TestBatchCoercion,
+)
+
+
+class TestPathIndexMatchesNested(TestCase):
+    examples = (
+        # repeated keys turning a dictionary into a list of it, including
+        # where the dictionary has a 0 key of its own.
+        "a[b]=1&a[0]=2&a=3",
+        "a[b]=1&a=2&a=3&a[1]=9",
+        # overwriting a whole dictionary with a value
+        "a[b][c]=1&a[b]=2&a[b]=3",
+        "a[b]=1&a[]=2&a[2]=5&a[]=7",
+        "a[2][x]=1&a[]=3",
+        "a[0]=1&a=2",
+        "[a]=1&[b]=2",
+        # dictionaries with the same keys, some of the way, in other orders,
+        # and with keys which are numbers.
+        "a[0][x]=1&a[0][y]=2&a[1][x]=3&a[1][z]=4&a[2][x]=5&a[2][z]=6&a[3][y]=7",
+        "a[0][x]=1&a[1][x]=2&a[1][y]=3&a[0][y]=4&a[0][z]=5&a[2][z]=6&a[2][x]=7",
+        "a[x]=1&b[x]=2&b[y]=3&a[1]=4&b[1]=5&c[x]=6&c[y]=7",
+        "a[0][b][x]=1&a[1][x]=2&a[5][x]=3&a[]=4&a[3][y]=5",
+    )
+    maxDiff = None
+
+    def test_to_dict(self):
+        corpora = (
+            self.examples,
+            (qs for qs, *_ in TestLoadDjangoQueries.str_examples),
+            (qs for qs, _ in TestLoadJQueryBbqQueries.str_examples),
+            (qs for qs, _ in TestLoadRackQueries.str_examples),
+            (qs for qs, _ in TestLoadOdditiesAndMalformed.str_examples),
+            TestBatchCoercion.examples,
+        )
+        for corpus in corpora:
+            for qs in corpus:
+                with self.subTest(data=qs):
+                    self.assertEqual(
+                        formality.flat.loads(
+                            qs, max_depth=1000, max_num_fields=99999
+                        ).to_dict(),
+                        formality.query.loads(qs, max_depth=1000, max_num_fields=99999),
+                    )
+
+    def test_same_exceptions(self):
+        examples = (
+            *(qs for qs, _ in TestStrictlyUnhandledQueries.examples),
+            # Indexing into a value, rather than a dictionary or list.
+            "a=1&a[b]=2",
+            "a=xy&a[]=1",
+            "a[]=1&a[b]=2",
+            "a[b]=1&a[b][c]=2",
+        )
+        for qs in examples:
+            with self.subTest(data=qs):
+                with self.assertRaises(Exception) as nested:
+                    formality.query.loads(qs)
+                with self.assertRaises(type(nested.exception)):
+                    formality.flat.loads(qs)
+
+    def test_same_limits(self):
+        with self.assertRaises(TooManyFieldsSent):
+            formality.flat.loads(
+                "a[5]=1&b[5]=1", max_num_fields=10, count_holes=True
+            )
+        with self.assertRaises(TooManyFieldsSent):
+            formality.flat.loads("a[b][c][d][e][f][g]=1")
+        with self.assertRaises(formality.query.TooManyKeys):
+            formality.flat.loads("a[x]=1&a[y]=2&a[z]=3", max_keys_per_mapping=2)
+
+
+class TestPathIndexAccess(TestCase):
+    qs = "filters[][field]=name&filters[][field]=age&filters[1][op]=gt&page=2&empty[]="
+
+    def test_lookup(self):
+        index = formality.flat.loads(self.qs)
+        self.assertEqual(index.lookup("filters", 1, "field"), "age")
+        self.assertEqual(index.lookup("page"), 2)
+        self.assertEqual(index.lookup("filters", 1), {"field": "age", "op": "gt"})
+        self.assertEqual(index.lookup("empty"), [""])
+        self.assertIsNone(index.lookup("filters", 3, default=None))
+        with self.assertRaises(KeyError):
+            index.lookup("filters", 3)
+        self.assertIn(("filters", 0, "field"), index)
+        self.assertEqual(len(index), 3)
+        # Both filters have an "op" key to look up, but only one has a value.
+        self.assertNotIn(("filters", 0, "op"), index)
+        with self.assertRaises(KeyError):
+            index.lookup("filters", 0, "op")
+        self.assertNotIn(("filters", "1"), index)
+        self.assertNotIn(("page", 0), index)
+
+    def test_items(self):
+        index = formality.flat.loads(self.qs)
+        self.assertEqual(
+            list(index.items("filters")),
+            [
+                (("filters", 0, "field"), "name"),
+                (("filters", 1, "field"), "age"),
+                (("filters", 1, "op"), "gt"),
+            ],
+        )
+        self.assertEqual(list(index.items("page")), [(("page",), 2)])
+        self.assertEqual(list(index.items("filters", 1, "op")), [(("filters", 1, "op"), "gt")])
+        self.assertEqual(list(index.items("nothing")), [])
+        self.assertEqual(len(list(index.items())), 5)
+        # In the same order as the nested version, rather than as parsed.
+        index = formality.flat.loads("a[x][0]=1&a[y]=2&a[x][1]=3")
+        self.assertEqual(
+            list(index.items()),
+            [(("a", "x", 0), 1), (("a", "x", 1), 3), (("a", "y"), 2)],
+        )
+
+    def test_empty(self):
+        index = formality.flat.loads("")
+        self.assertFalse(index)
+        self.assertEqual(index.to_dict(), {})
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
@@ -0,0 +1,249 @@
+from io import BytesIO
+from unittest import main
+
+import django
+from django import forms
+from django.test import TestCase as DjangoTestCase, RequestFactory
+
+import formality
+from formality.query import loads
+
+
+class TestNestedForms(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        # Translating the error messages needs the app registry.
+        django.setup()
+        super().setUpClass()
+
+        from formality.forms import NestedForm, FormField, FormSetField
+
+        class AddressForm(NestedForm):
+            street = forms.CharField()
+            number = forms.IntegerField(required=False)
+            document = forms.FileField(required=False)
+
+        class PersonForm(NestedForm):
+            name = forms.CharField()
+            nickname = forms.CharField(required=False)
+            tags = forms.MultipleChoiceField(
+                choices=[("1", "one"), ("2", "two")], required=False
+            )
+            active = forms.BooleanField(required=False)
+            address = FormField(AddressForm)
+            previous = FormSetField(AddressForm, max_num=4, can_delete=True)
+
+            def clean_name(self):
+                return self.cleaned_data["name"].title()
+
+        cls.AddressForm = AddressForm
+        cls.PersonForm = PersonForm
+        cls.FormField = FormField
+        cls.FormSetField = FormSetField
+        cls.NestedForm = NestedForm
+
+    def test_valid(self):
+        form = self.PersonForm(
+            loads(
+                "name=ada+lovelace&nickname=true&tags[]=1&tags[]=2&active=true"
+                "&address[street]=St+James&address[number]=12"
+                "&previous[0][street]=Marylebone&previous[1][street]=Ockham"
+            )
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(
+            form.cleaned_data,
+            {
+                "name": "Ada Lovelace",
+                # Coerced to True by loads, but a CharField wants what was sent.
+                "nickname": "true",
+                "tags": ["1", "2"],
+                "active": True,
+                "address": {"street": "St James", "number": 12, "document": None},
+                "previous": [
+                    {"street": "Marylebone", "number": None, "document": None},
+                    {"street": "Ockham", "number": None, "document": None},
+                ],
+            },
+        )
+
+    def test_scalar_fields_take_the_last_value(self):
+        form = self.PersonForm(
+            loads("name=a&name=b&tags=1&address[street]=x")
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["name"], "B")
+        self.assertEqual(form.cleaned_data["tags"], ["1"])
+
+    def test_scalar_fields_reject_containers(self):
+        form = self.PersonForm(loads("name[first]=a&address[street]=x"))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["name"][0], "Enter a valid value.")
+
+    def test_nested_errors(self):
+        form = self.PersonForm(
+            loads("name=a&address[number]=x&previous[0][street]=y&previous[1][number]=z")
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {"address", "previous"})
+        self.assertEqual(
+            form.nested["address"].errors,
+            {
+                "street": ["This field is required."],
+                "number": ["Enter a whole number."],
+            },
+        )
+        first, second = form.nested["previous"]
+        self.assertEqual(first.errors, {})
+        self.assertEqual(set(second.errors), {"street", "number"})
+
+    def test_required_form_field(self):
+        form = self.PersonForm(loads("name=a"))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["address"], ["This field is required."])
+        self.assertNotIn("address", form.nested)
+
+    def test_invalid_shapes(self):
+        form = self.PersonForm(loads("name=a&address=x&previous[a]=b"))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["address"], ["Correct the errors below."])
+        self.assertEqual(form.errors["previous"], ["Correct the errors below."])
+
+    def test_skipped_rows(self):
+        form = self.PersonForm(
+            loads(
+                "name=a&address[street]=x&previous[1][street]=y"
+                "&previous[2][street]=z&previous[2][DELETE]=on&previous[3][street]=w"
+            )
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(
+            [row["street"] for row in form.cleaned_data["previous"]], ["y", "w"]
+        )
+        self.assertEqual(
+            [row is None for row in form.nested["previous"]],
+            [True, False, True, False],
+        )
+
+    def test_too_many_rows_are_not_bound(self):
+        form = self.PersonForm(
+            loads("name=a&address[street]=x&previous[4][street]=y")
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["previous"], ["Please submit at most 4 forms."])
+        self.assertNotIn("previous", form.nested)
+
+    def test_too_few_rows(self):
+        field = self.FormSetField(self.AddressForm, min_num=2)
+        self.assertEqual(len(field.clean([{"street": "a"}, {"street": "b"}])), 2)
+        with self.assertRaisesMessage(
+            forms.ValidationError, "Please submit at least 2 forms."
+        ):
+            field.clean([{"street": "a"}, {}])
+
+    def test_must_be_nested_forms(self):
+        with self.assertRaises(TypeError):
+            self.FormField(forms.Form)
+        with self.assertRaises(TypeError):
+            self.FormSetField(forms.Form)
+
+    def test_fields_added_to_an_instance(self):
+        form = self.PersonForm(
+            loads("name=a&address[street]=x&extra[]=1&extra[]=2")
+        )
+        form.fields["extra"] = forms.MultipleChoiceField(choices=[("1", "1"), ("2", "2")])
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["extra"], ["1", "2"])
+
+    def test_bound_fields(self):
+        form = self.PersonForm(loads("name=a&active=true&tags[]=2&address[street]=x"))
+        self.assertEqual(form["name"].value(), "a")
+        self.assertEqual(form["tags"].value(), ["2"])
+        self.assertIn('value="a"', str(form["name"]))
+        self.assertTrue(form.has_changed())
+
+    def test_prefix(self):
+        form = self.AddressForm({"street": "x"}, prefix="home")
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form["street"].value(), "x")
+        self.assertIn('name="home-street"', str(form["street"]))
+
+    def test_copy_fields(self):
+        class SharedForm(self.NestedForm):
+            copy_fields = False
+            street = forms.CharField()
+
+        class CopiedForm(SharedForm):
+            copy_fields = True
+
+        self.assertIs(SharedForm().fields, SharedForm.base_fields)
+        self.assertIsNot(CopiedForm().fields, CopiedForm.base_fields)
+        self.assertIsNot(
+            self.AddressForm().fields["street"], self.AddressForm.base_fields["street"]
+        )
+        form = SharedForm({"street": "x"})
+        self.assertTrue(form.is_valid())
+        self.assertFalse(SharedForm({}).is_valid())
+
+    def test_key_shapes(self):
+        shapes = self.PersonForm.key_shapes()
+        self.assertEqual(
+            shapes,
+            [
+                "name",
+                "nickname",
+                "tags[N]",
+                "active",
+                "address[street]",
+                "address[number]",
+                "previous[N][street]",
+                "previous[N][number]",
+            ],
+        )
+        plan = formality.query.PathPlan.from_shapes(shapes, indexes=2)
+        self.assertEqual(
+            formality.query.extract(
+                "name=ada&tags[]=1&address[street]=St+James&previous[1][number]=4", plan
+            ),
+            {"name": "ada", "address[street]": "St James", "previous[1][number]": 4},
+        )
+
+    def test_request_files(self):
+        request = RequestFactory().post(
+            path="/",
+            data={
+                "name": "a",
+                "address[street]": "x",
+                "address[document]": BytesIO(b"deeds"),
+                "previous[0][street]": "y",
+                "previous[1][street]": "z",
+                "previous[1][document]": BytesIO(b"lease"),
+            },
+        )
+        formality.views.RequestParser.process_request(request)
+        form = self.PersonForm(request.POST, request.FILES)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["address"]["document"].read(), b"deeds")
+        first, second = form.cleaned_data["previous"]
+        self.assertIsNone(first["document"])
+        self.assertEqual(second["document"].read(), b"lease")
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
@@ -0,0 +1,175 @@
+import copy
+import pickle
+from unittest import TestCase, main
+import formality
+from formality.http import NestedQueryDict
+
+
+class TestNestedQueryDict(TestCase):
+    qs = "c=1&c=2&a[b][]=true&a[b][]=x&x[0][y]=1.5&n=&z[q]=null"
+
+    def setUp(self):
+        self.data = NestedQueryDict(formality.query.loads(self.qs))
+
+    def test_is_the_nested_data(self):
+        self.assertEqual(self.data, formality.query.loads(self.qs))
+        self.assertEqual(self.data["a"], {"b": [True, "x"]})
+        self.assertEqual(list(self.data), ["c", "a", "x", "n", "z"])
+
+    def test_lists(self):
+        self.assertEqual(
+            list(self.data.lists()),
+            [
+                ("c", ["1", "2"]),
+                ("a[b][0]", ["true"]),
+                ("a[b][1]", ["x"]),
+                ("x[0][y]", ["1.5"]),
+                ("n", [""]),
+                ("z[q]", ["null"]),
+            ],
+        )
+
+    def test_getlist(self):
+        examples = (
+            ("c", ["1", "2"]),
+            ("c[1]", ["2"]),
+            ("a[b]", ["true", "x"]),
+            ("a[b][]", ["true", "x"]),
+            ("a[b][1]", ["x"]),
+            ("x[0][y]", ["1.5"]),
+            ("n", [""]),
+            ("z[q]", ["null"]),
+            # Dictionaries and lists of them aren't values.
+            ("a", []),
+            ("x", []),
+            ("x[0]", []),
+            ("a[b][2]", []),
+            ("c[x]", []),
+            ("n[0]", []),
+            ("missing", []),
+            ("", []),
+        )
+        for key, expected in examples:
+            with self.subTest(key=key):
+                self.assertEqual(self.data.getlist(key), expected)
+        self.assertEqual(self.data.getlist("missing", ["default"]), ["default"])
+
+    def test_uncoerced_values_are_as_given(self):
+        uploaded = object()
+        data = NestedQueryDict(
+            {"a": "1", "b": {"c": [uploaded, uploaded]}}, coerced=False
+        )
+        self.assertEqual(data.getlist("a"), ["1"])
+        self.assertEqual(data.getlist("b[c]"), [uploaded, uploaded])
+        self.assertEqual(dict(data.lists())["b[c][1]"], [uploaded])
+
+    def test_dict(self):
+        self.assertEqual(self.data.dict()["c"], "2")
+        self.assertEqual(self.data.dict()["a[b][1]"], "x")
+
+    def test_not_a_querydict_when_getting_items(self):
+        # Unlike QueryDict, items are the nested values, and the flat keys
+        # with their last values as strings are in dict().
+        data = NestedQueryDict(formality.query.loads("q=123&q=456&s=x"))
+        self.assertEqual(data.get("q"), [123, 456])
+        self.assertEqual(data.dict().get("q", "").strip(), "456")
+        self.assertEqual(data.getlist("q"), ["123", "456"])
+        self.assertEqual(data.get("s"), "x")
+
+    def test_setlist(self):
+        data = self.data.copy()
+        examples = (
+            ("c", ["3", "4"]),
+            ("n", ["x"]),
+            ("a[b][]", ["1", "null", ""]),
+            ("a[b][1]", ["false"]),
+            ("new[x][0]", ["1.5"]),
+            ("empty", []),
+        )
+        for key, values in examples:
+            with self.subTest(key=key):
+                data.setlist(key, values)
+                self.assertEqual(data.getlist(key), values)
+        # Stored as parsing them would have.
+        self.assertEqual(data["c"], [3, 4])
+        self.assertEqual(data["n"], "x")
+        self.assertEqual(data["a"], {"b": [1, False, ""]})
+        self.assertEqual(data["new"], {"x": [1.5]})
+        self.assertEqual(data["empty"], [])
+
+    def test_appendlist(self):
+        data = self.data.copy()
+        data.appendlist("c", "3")
+        data.appendlist("n", "x")
+        data.appendlist("z[q]", "1")
+        data.appendlist("new", "true")
+        self.assertEqual(data["c"], [1, 2, 3])
+        self.assertEqual(data["n"], ["", "x"])
+        self.assertEqual(data["z"], {"q": [None, 1]})
+        self.assertEqual(data["new"], True)
+        self.assertEqual(data.getlist("c"), ["1", "2", "3"])
+        uncoerced = NestedQueryDict({"a": "1"}, mutable=True, coerced=False)
+        uncoerced.appendlist("a", "2")
+        self.assertEqual(uncoerced["a"], ["1", "2"])
+
+    def test_urlencode_round_trips(self):
+        self.assertEqual(formality.query.loads(self.data.urlencode()), self.data)
+        self.assertEqual(
+            NestedQueryDict({"a": {"b": "c d"}}).urlencode(),
+            "a%5Bb%5D=c+d",
+        )
+        self.assertEqual(
+            NestedQueryDict({"a": {"b": "c/d"}}).urlencode(safe="[]/"),
+            "a[b]=c/d",
+        )
+
+    def test_immutable(self):
+        operations = (
+            lambda data: data.__setitem__("a", 1),
+            lambda data: data.__delitem__("a"),
+            lambda data: data.__ior__({"a": 1}),
+            lambda data: data.clear(),
+            lambda data: data.pop("a"),
+            lambda data: data.popitem(),
+            lambda data: data.setdefault("new", 1),
+            lambda data: data.update(new=1),
+            lambda data: data.setlist("a", ["1"]),
+            lambda data: data.appendlist("a", "1"),
+        )
+        for operation in operations:
+            with self.subTest(operation=operation):
+                with self.assertRaises(AttributeError):
+                    operation(self.data)
+        self.assertEqual(self.data, formality.query.loads(self.qs))
+
+    def test_copies_are_mutable(self):
+        for copied in (self.data.copy(), copy.copy(self.data), copy.deepcopy(self.data)):
+            with self.subTest(copied=copied):
+                self.assertIsInstance(copied, NestedQueryDict)
+                self.assertEqual(copied, self.data)
+                copied["new"] = 1
+                self.assertNotIn("new", self.data)
+        deep = self.data.copy()
+        deep["a"]["b"].append(1)
+        self.assertEqual(self.data["a"]["b"], [True, "x"])
+
+    def test_pickling(self):
+        mutable = NestedQueryDict({"a": "1"}, mutable=True, encoding="iso-8859-1", coerced=False)
+        for data in (self.data, mutable):
+            with self.subTest(data=data):
+                unpickled = pickle.loads(pickle.dumps(data))
+                self.assertIsInstance(unpickled, NestedQueryDict)
+                self.assertEqual(unpickled, data)
+                self.assertEqual(unpickled._mutable, data._mutable)
+                self.assertEqual(unpickled.encoding, data.encoding)
+                self.assertEqual(unpickled.coerced, data.coerced)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
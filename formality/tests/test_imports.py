@@ -0,0 +1,106 @@
+import pickle
+import subprocess
+import sys
+from unittest import TestCase, main
+import formality
+from django.core.exceptions import SuspiciousOperation, TooManyFieldsSent
+
+
+def run_isolated(code):
+    """
+    Run `code` in a fresh interpreter, so that nothing this process has
+    already imported (like Django, for the other tests) is visible to it.
+    """
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+    )
+
+
+class TestImportWithoutDjango(TestCase):
+    def test_query_does_not_import_django(self):
+        for module in ("formality", "formality.query", "formality.flat", "formality.http", "formality.transcode", "formality.parsers", "formality.coercion", "formality.archive", "formality.profiling"):
+            with self.subTest(module=module):
+                result = run_isolated(
+                    f"import sys, {module}\n"
+                    "print(sorted(name for name in sys.modules if name.split('.')[0] == 'django'))"
+                )
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_parsing_without_django_installed(self):
+        # A None entry in sys.modules makes importing it raise ImportError,
+        # exactly as if it weren't installed.
+        result = run_isolated(
+            "import sys\n"
+            "sys.modules['django'] = None\n"
+            "import formality.query\n"
+            "assert formality.query.loads('a[b]=1&c[]=2') == {'a': {'b': 1}, 'c': [2]}\n"
+            "assert formality.query.dumps({'a': {'b': 1}}) == 'a%5Bb%5D=1'\n"
+            "try:\n"
+            "    formality.query.loads('a[[b]=1')\n"
+            "except formality.query.SuspiciousOperation as e:\n"
+            "    assert isinstance(e, formality.query.MalformedData)\n"
+            "else:\n"
+            "    raise AssertionError('not raised')\n"
+            "try:\n"
+            "    formality.query.loads('a=1&b=2', max_num_fields=1)\n"
+            "except formality.query.TooManyFieldsSent:\n"
+            "    pass\n"
+            "else:\n"
+            "    raise AssertionError('not raised')\n"
+            "print(formality.query.SuspiciousOperation.__module__)\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "formality.exceptions")
+
+
+class TestLazyExceptions(TestCase):
+    def test_django_exceptions_when_installed(self):
+        self.assertIs(formality.query.TooManyFieldsSent, TooManyFieldsSent)
+        self.assertIs(formality.query.SuspiciousOperation, SuspiciousOperation)
+        for name in (
+            "MalformedData",
+            "KeyTooLong",
+            "ValueTooLong",
+            "TooManyKeys",
+            "DataTooLarge",
+            "MalformedJSON",
+        ):
+            with self.subTest(name=name):
+                exc = getattr(formality.query, name)
+                self.assertIs(exc, getattr(formality.exceptions, name))
+                self.assertTrue(issubclass(exc, SuspiciousOperation))
+
+    def test_pickling(self):
+        examples = (
+            formality.exceptions.MalformedData("a[[b]"),
+            formality.exceptions.KeyTooLong("a" * 100, 10),
+            formality.exceptions.ValueTooLong("a", 100, 10),
+            formality.exceptions.TooManyKeys("b", 10),
+            formality.exceptions.DataTooLarge(100, 10),
+            formality.exceptions.MalformedJSON("Expecting value: line 1 column 1 (char 0)"),
+        )
+        for exc in examples:
+            with self.subTest(exc=exc):
+                unpickled = pickle.loads(pickle.dumps(exc))
+                self.assertIs(type(unpickled), type(exc))
+                self.assertEqual(unpickled.args, exc.args)
+                self.assertEqual(str(unpickled), str(exc))
+
+    def test_unknown_attributes(self):
+        for module in (formality, formality.query, formality.exceptions):
+            with self.subTest(module=module.__name__):
+                with self.assertRaises(AttributeError):
+                    module.DoesNotExist
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
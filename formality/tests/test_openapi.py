@@ -0,0 +1,262 @@
+import os
+import tempfile
+from unittest import main, mock
+
+import django
+from django import forms
+from django.test import TestCase as DjangoTestCase, RequestFactory
+
+
+class TestOpenAPI(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        django.setup()
+        super().setUpClass()
+
+        from django.urls import include, path, re_path
+        from django.views.generic import FormView
+        from formality import openapi
+        from formality.forms import NestedForm, FormField, FormSetField
+
+        class LineForm(NestedForm):
+            """
+            One line of an order.
+            """
+
+            sku = forms.CharField(max_length=12, help_text="Stock keeping unit")
+            quantity = forms.IntegerField(min_value=1, initial=1)
+            price = forms.DecimalField(max_value=1000, required=False)
+
+        class AddressForm(NestedForm):
+            street = forms.CharField()
+            proof = forms.FileField(required=False)
+
+        class OrderForm(NestedForm):
+            email = forms.EmailField()
+            gift = forms.BooleanField(required=False)
+            colour = forms.ChoiceField(
+                choices=[("", "---"), ("red", "Red"), ("Dark", [("black", "Black")])]
+            )
+            lines = FormSetField(LineForm, min_num=1, max_num=50)
+
+        class ShippingForm(NestedForm):
+            address = FormField(AddressForm)
+
+        class SearchForm(NestedForm):
+            q = forms.CharField(required=False)
+            tags = forms.MultipleChoiceField(choices=[("a", "A"), ("b", "B")], required=False)
+            line = FormField(LineForm, required=False)
+
+        class OrderView(FormView):
+            """
+            Place an order.
+            """
+
+            form_class = OrderForm
+
+        def search(request):
+            pass
+
+        search.query_form_class = SearchForm
+
+        def undocumented(request):
+            pass
+
+        class urls:
+            urlpatterns = [
+                path("orders/", OrderView.as_view()),
+                path(
+                    "shops/<int:shop>/",
+                    include(
+                        [
+                            path("search/", search),
+                            path(
+                                "shipping/<uuid:order>/",
+                                FormView.as_view(form_class=ShippingForm),
+                            ),
+                        ]
+                    ),
+                ),
+                re_path(r"^legacy/(?P<year>[0-9]{4})/orders\.html$", OrderView.as_view()),
+                path("about/", undocumented),
+            ]
+
+        cls.openapi = openapi
+        cls.urls = urls
+
+    def setUp(self):
+        self.openapi._schemas.clear()
+
+    def test_paths(self):
+        document = self.openapi.generate(self.urls, title="Shop", version="2")
+        self.assertEqual(document["openapi"], "3.1.0")
+        self.assertEqual(document["info"], {"title": "Shop", "version": "2"})
+        self.assertEqual(
+            list(document["paths"]),
+            [
+                "/orders/",
+                "/shops/{shop}/search/",
+                "/shops/{shop}/shipping/{order}/",
+                "/legacy/{year}/orders.html",
+            ],
+        )
+        self.assertEqual(
+            set(document["paths"]["/orders/"]), {"get", "post", "put"}
+        )
+        self.assertEqual(set(document["paths"]["/shops/{shop}/search/"]), {"get"})
+        self.assertEqual(
+            document["paths"]["/orders/"]["post"]["description"], "Place an order."
+        )
+        self.assertEqual(
+            document["paths"]["/legacy/{year}/orders.html"]["post"]["operationId"],
+            "OrderView_post_2",
+        )
+        shipping = document["paths"]["/shops/{shop}/shipping/{order}/"]["post"]
+        self.assertEqual(
+            shipping["parameters"],
+            [
+                {"name": "shop", "in": "path", "required": True, "schema": {"type": "integer"}},
+                {
+                    "name": "order",
+                    "in": "path",
+                    "required": True,
+                    "schema": {"type": "string", "format": "uuid"},
+                },
+            ],
+        )
+        # Files anywhere inside the form need multipart.
+        self.assertEqual(
+            list(shipping["requestBody"]["content"]), ["multipart/form-data"]
+        )
+
+    def test_request_body(self):
+        document = self.openapi.generate(self.urls)
+        body = document["paths"]["/orders/"]["post"]["requestBody"]
+        self.assertEqual(
+            body,
+            {
+                "required": True,
+                "content": {
+                    "application/x-www-form-urlencoded": {
+                        "schema": {"$ref": "#/components/schemas/OrderForm"},
+                        "encoding": {"lines": {"style": "deepObject", "explode": True}},
+                    }
+                },
+            },
+        )
+        schemas = document["components"]["schemas"]
+        self.assertEqual(
+            schemas["OrderForm"],
+            {
+                "type": "object",
+                "properties": {
+                    "email": {"type": "string", "format": "email", "maxLength": 320},
+                    "gift": {"type": "boolean"},
+                    "colour": {"type": "string", "enum": ["red", "black"]},
+                    "lines": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/LineForm"},
+                        "minItems": 1,
+                        "maxItems": 50,
+                    },
+                },
+                "required": ["email", "colour"],
+            },
+        )
+        self.assertEqual(
+            schemas["LineForm"],
+            {
+                "type": "object",
+                "properties": {
+                    "sku": {"type": "string", "maxLength": 12, "description": "Stock keeping unit"},
+                    "quantity": {"type": "integer", "minimum": 1, "default": 1},
+                    "price": {"type": "number", "maximum": 1000},
+                },
+                "required": ["sku", "quantity"],
+                "description": "One line of an order.",
+            },
+        )
+
+    def test_query_parameters(self):
+        document = self.openapi.generate(self.urls)
+        search = document["paths"]["/shops/{shop}/search/"]["get"]
+        self.assertEqual(
+            search["parameters"][1:],
+            [
+                {"name": "q", "in": "query", "schema": {"type": "string"}},
+                {
+                    "name": "tags[]",
+                    "in": "query",
+                    "schema": {"type": "array", "items": {"type": "string", "enum": ["a", "b"]}},
+                    "style": "form",
+                    "explode": True,
+                },
+                {
+                    "name": "line",
+                    "in": "query",
+                    "schema": {"$ref": "#/components/schemas/LineForm"},
+                    "style": "deepObject",
+                    "explode": True,
+                },
+            ],
+        )
+
+    def test_cached(self):
+        with mock.patch.object(
+            self.openapi, "generate", wraps=self.openapi.generate
+        ) as generate:
+            schema = self.openapi.get_schema(self.urls)
+            self.assertIs(self.openapi.get_schema(self.urls), schema)
+            self.assertIsNot(self.openapi.get_schema(self.urls, title="Other"), schema)
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(schema.document, self.openapi.generate(self.urls))
+
+    def test_artifact(self):
+        schema = self.openapi.Schema.from_document(self.openapi.generate(self.urls))
+        with tempfile.TemporaryDirectory() as directory:
+            artifact = os.path.join(directory, "openapi.json")
+            schema.save(artifact)
+            with mock.patch.object(self.openapi, "generate") as generate:
+                loaded = self.openapi.get_schema(self.urls, artifact=artifact)
+            generate.assert_not_called()
+        self.assertEqual(loaded.content, schema.content)
+        self.assertEqual(loaded.etag, schema.etag)
+
+    def test_view(self):
+        view = self.openapi.SchemaView.as_view(urlconf=self.urls)
+        response = view(RequestFactory().get("/openapi.json"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi+json")
+        etag = response["ETag"]
+        self.assertEqual(etag, self.openapi.get_schema(self.urls).etag)
+        self.assertEqual(response.content, self.openapi.get_schema(self.urls).content)
+
+        response = view(RequestFactory().get("/openapi.json", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        response = view(RequestFactory().get("/openapi.json", HTTP_IF_NONE_MATCH='"stale"'))
+        self.assertEqual(response.status_code, 200)
+        response = view(RequestFactory().post("/openapi.json"))
+        self.assertEqual(response.status_code, 405)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
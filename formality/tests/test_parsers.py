@@ -0,0 +1,276 @@
+import json
+from io import BytesIO
+from unittest import TestCase, main, mock
+
+from django.core.exceptions import SuspiciousOperation, TooManyFieldsSent
+from django.test import TestCase as DjangoTestCase, RequestFactory
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+import formality
+from formality import exceptions, parsers, query
+
+
+def _chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+class TestParsers(TestCase):
+    documents = (
+        {},
+        {"a": 1},
+        {"a": [{"b": 1, "c": [True, None, 1.5, "x"]}, {"b": -2}], "d": {"e": "f"}},
+        {"a": {"b": {"c": {"d": {"e": {"f": "deep"}}}}}},
+        {"é": ["ünïcode", "☃", "\"quoted\"\n"], "n": [0, -0.5, 1e300, 12345678901234]},
+        {"empty": {}, "none": [], "nested": {"x": [[], {}]}},
+    )
+
+    def sources(self, data):
+        """
+        The same document as bytes, str, a file, and a few sizes of chunks.
+        """
+        body = json.dumps(data).encode()
+        yield "bytes", body
+        yield "str", body.decode()
+        yield "file", BytesIO(body)
+        for size in (1, 3, 7, 64):
+            yield f"chunks of {size}", _chunked(body, size)
+
+    def test_get_parser(self):
+        for content_type, parser in (
+            ("application/x-www-form-urlencoded", parsers.parse_urlencoded),
+            ("application/x-www-form-urlencoded; charset=latin-1", parsers.parse_urlencoded),
+            ("Application/JSON", parsers.parse_json),
+            ("application/json; charset=utf-8", parsers.parse_json),
+            ("application/vnd.api+json", parsers.parse_json),
+            ("multipart/form-data; boundary=abc", parsers.parse_multipart),
+            ("text/plain", None),
+            ("", None),
+        ):
+            with self.subTest(content_type=content_type):
+                self.assertIs(parsers.get_parser(content_type), parser)
+        with self.assertRaisesRegex(ValueError, "text/plain"):
+            parsers.parse(b"a", "text/plain; charset=utf-8")
+
+    def test_urlencoded(self):
+        qs = "a[b][]=1&a[b][]=2&c=true&d=%E9"
+        self.assertEqual(
+            parsers.parse(qs.encode(), "application/x-www-form-urlencoded"),
+            query.loads(qs),
+        )
+        self.assertEqual(
+            parsers.parse(
+                BytesIO(qs.encode()), "application/x-www-form-urlencoded; charset=latin-1"
+            ),
+            {"a": {"b": [1, 2]}, "c": True, "d": "é"},
+        )
+        with self.assertRaises(exceptions.DataTooLarge):
+            parsers.parse(
+                _chunked(qs.encode(), 4),
+                "application/x-www-form-urlencoded",
+                max_input_bytes=10,
+            )
+
+    def test_json(self):
+        for data in self.documents:
+            for label, source in self.sources(data):
+                with self.subTest(data=data, source=label):
+                    self.assertEqual(
+                        parsers.parse(source, "application/json", max_depth=10), data
+                    )
+
+    def test_json_without_orjson(self):
+        with mock.patch.object(parsers, "_json_loads", parsers._stdlib_json_loads):
+            for data in self.documents:
+                with self.subTest(data=data):
+                    self.assertEqual(
+                        parsers.parse_json(json.dumps(data).encode(), max_depth=10), data
+                    )
+
+    def test_non_finite_numbers(self):
+        backends = {"json": parsers._stdlib_json_loads}
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            backends["orjson"] = orjson.loads
+        for body in (b'{"a": NaN}', b'{"a": [1, Infinity]}', b'{"a": {"b": -Infinity}}', b'{"a": 1e999}', b'{"a": -1.5e400}'):
+            for name, json_loads in backends.items():
+                with self.subTest(body=body, backend=name):
+                    with mock.patch.object(parsers, "_json_loads", json_loads):
+                        with self.assertRaises(exceptions.MalformedJSON):
+                            parsers.parse_json(body)
+            with self.subTest(body=body, backend="streamed"):
+                with self.assertRaises(exceptions.MalformedJSON):
+                    parsers.parse_json(BytesIO(body))
+        # Only the numbers.
+        self.assertEqual(parsers.parse_json(BytesIO(b'{"a": "NaN"}')), {"a": "NaN"})
+        self.assertEqual(parsers.parse_json(b'{"a": "NaN"}'), {"a": "NaN"})
+
+    def test_json_backend(self):
+        try:
+            import orjson
+        except ImportError:
+            self.assertEqual(parsers.JSON_BACKEND, "json")
+        else:
+            self.assertEqual(parsers.JSON_BACKEND, "orjson")
+            self.assertIs(parsers._json_loads, orjson.loads)
+
+    def test_same_limits_as_loads(self):
+        # Anything without empty objects or arrays can be written as a query
+        # string, so the limits should be hit at exactly the same points.
+        for data in self.documents:
+            if not data or "empty" in data:
+                continue
+            qs = query.dumps(data)
+            for max_num_fields in range(0, 40):
+                for max_depth in range(0, 7):
+                    limits = dict(max_num_fields=max_num_fields, max_depth=max_depth)
+                    try:
+                        query.loads(qs, **limits)
+                    except TooManyFieldsSent:
+                        expected = False
+                    else:
+                        expected = True
+                    for label, source in self.sources(data):
+                        with self.subTest(data=data, source=label, **limits):
+                            try:
+                                parsers.parse_json(source, **limits)
+                            except TooManyFieldsSent:
+                                self.assertFalse(expected)
+                            else:
+                                self.assertTrue(expected)
+
+    def test_empty_containers_count(self):
+        # One field each for "a" and "b", and two for "c[0]".
+        data = {"a": {}, "b": [], "c": [{}]}
+        for label, source in self.sources(data):
+            with self.subTest(source=label):
+                self.assertEqual(parsers.parse_json(source, max_num_fields=4), data)
+        for label, source in self.sources(data):
+            with self.subTest(source=label):
+                with self.assertRaises(TooManyFieldsSent):
+                    parsers.parse_json(source, max_num_fields=3)
+
+    def test_other_limits(self):
+        for limits, data, error in (
+            (dict(max_keys_per_mapping=2), {"a": {"b": 1, "c": 2, "d": 3}}, exceptions.TooManyKeys),
+            (dict(max_key_length=3), {"a": {"abcd": 1}}, exceptions.KeyTooLong),
+            (dict(max_value_length=3), {"a": ["abc", "abcd"]}, exceptions.ValueTooLong),
+            (dict(max_input_bytes=10), {"a": "0123456789"}, exceptions.DataTooLarge),
+        ):
+            for label, source in self.sources(data):
+                with self.subTest(limits=limits, source=label):
+                    with self.assertRaises(error):
+                        parsers.parse_json(source, **limits)
+            with self.subTest(limits=limits, within=True):
+                key, value = next(iter(limits.items()))
+                self.assertEqual(
+                    parsers.parse_json(json.dumps(data).encode(), **{key: value * 100}),
+                    data,
+                )
+
+    def test_streaming_stops_early(self):
+        read = []
+
+        def chunks():
+            yield b'{"a": ['
+            for i in range(1000):
+                read.append(i)
+                yield b"1, "
+            yield b"1]}"
+
+        with self.assertRaises(TooManyFieldsSent):
+            parsers.parse_json(chunks(), max_num_fields=100)
+        self.assertLess(len(read), 200)
+
+    def test_malformed_json(self):
+        for body in (b"", b"[1, 2]", b'"a"', b'{"a": }', b'{"a": 1', b'{"a": 1}}', b"\xff{}", b"[" * 5000):
+            for label, source in (("bytes", body), ("file", BytesIO(body))):
+                with self.subTest(body=body[:10], source=label):
+                    with self.assertRaises(exceptions.MalformedJSON) as raised:
+                        parsers.parse_json(source)
+                    self.assertIsInstance(raised.exception, SuspiciousOperation)
+
+
+class TestParsersWithDjango(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        super().setUpClass()
+
+    def test_multipart(self):
+        body = encode_multipart(
+            BOUNDARY,
+            {
+                "a[]": [1, 2],
+                "b[name]": "test",
+                "b[file]": BytesIO(b"mybinarydata"),
+            },
+        )
+        data = parsers.parse(body, MULTIPART_CONTENT)
+        self.assertEqual(data["a"], [1, 2])
+        self.assertEqual(data["b"]["name"], "test")
+        self.assertEqual(data["b"]["file"].read(), b"mybinarydata")
+        with self.assertRaises(TooManyFieldsSent):
+            parsers.parse(body, MULTIPART_CONTENT, max_num_fields=3)
+        with self.assertRaises(exceptions.DataTooLarge):
+            parsers.parse(BytesIO(body), MULTIPART_CONTENT, max_input_bytes=100)
+
+    def test_json_request(self):
+        request = RequestFactory().post(
+            path="/?page=2",
+            data=b'{"a": [{"b": 1}, {"b": true}], "c": "true"}',
+            content_type="application/json",
+        )
+        formality.views.RequestParser.process_request(request)
+        self.assertEqual(request.GET, {"page": 2})
+        self.assertEqual(request.POST, {"a": [{"b": 1}, {"b": True}], "c": "true"})
+        self.assertEqual(request.POST.getlist("a[1][b]"), ["true"])
+
+    def test_json_request_limits(self):
+        from django.conf import settings
+
+        request = RequestFactory().post(
+            path="/",
+            data=json.dumps({"a": list(range(settings.DATA_UPLOAD_MAX_NUMBER_FIELDS))}),
+            content_type="application/json",
+        )
+        with self.assertRaises(TooManyFieldsSent):
+            formality.views.RequestParser.process_request(request)
+        # The body is read as a stream, so it stops at the limit, before
+        # getting to whatever follows (which would throw MalformedJSON).
+        fields = list(range(settings.DATA_UPLOAD_MAX_NUMBER_FIELDS + 1))
+        request = RequestFactory().post(
+            path="/",
+            data=json.dumps({"a": fields})[:-1] + ", !",
+            content_type="application/json",
+        )
+        with self.assertRaises(TooManyFieldsSent):
+            formality.views.RequestParser.process_request(request)
+        self.assertTrue(request.body.startswith(b'{"a": [0, 1'))
+
+    def test_unknown_content_type(self):
+        request = RequestFactory().post(path="/", data=b"a=1", content_type="text/plain")
+        formality.views.RequestParser.process_request(request)
+        self.assertEqual(dict(request.POST), {})
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
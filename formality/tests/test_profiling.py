@@ -0,0 +1,150 @@
+import json
+import threading
+from unittest import TestCase, main
+
+import django
+from django.test import TestCase as DjangoTestCase, RequestFactory
+
+import formality
+from formality.profiling import KeyShapeProfiler
+
+
+class TestKeyShapeProfiler(TestCase):
+    qs = "q=shoes&page=2&filters[0][field]=size&filters[1][field]=colour&filters[1][value]=red&ids[]=1&ids[]=2&ids[]=3&empty[]="
+
+    def test_shapes(self):
+        profiler = KeyShapeProfiler(1)
+        formality.query.loads(self.qs, profiler=profiler)
+        formality.query.loads("q=boots&filters[0][value]=1.5&other={}", profiler=profiler)
+        summary = profiler.summary()
+        self.assertEqual(
+            summary["shapes"],
+            {
+                "ids[N]": {"count": 3, "types": {"int": 3}},
+                "q": {"count": 2, "types": {"str": 2}},
+                "filters[N][field]": {"count": 2, "types": {"str": 2}},
+                "filters[N][value]": {"count": 2, "types": {"str": 1, "float": 1}},
+                "empty[N]": {"count": 1, "types": {"str": 1}},
+                "other": {"count": 1, "types": {"str": 1}},
+                "page": {"count": 1, "types": {"int": 1}},
+            },
+        )
+        self.assertEqual((summary["observed"], summary["sampled"]), (2, 2))
+        self.assertEqual(summary["depth"], {"0": 4, "1": 4, "2": 4})
+        # filters, its second row and ids have 2 or 3 items; everything else 1
+        self.assertEqual(summary["width"], {"1": 4, "2-3": 3})
+        self.assertEqual(summary["fields"], {"2-3": 1, "8-15": 1})
+        self.assertEqual(json.loads(profiler.to_json()), summary)
+
+    def test_empty_containers_and_other_types(self):
+        profiler = KeyShapeProfiler(1)
+        profiler.record({"a": {}, "b": [], "c": {0: None, "d": [True]}})
+        self.assertEqual(
+            profiler.summary()["shapes"],
+            {
+                "a": {"count": 1, "types": {"dict": 1}},
+                "b": {"count": 1, "types": {"list": 1}},
+                "c[N]": {"count": 1, "types": {"NoneType": 1}},
+                "c[d][N]": {"count": 1, "types": {"bool": 1}},
+            },
+        )
+
+    def test_load(self):
+        profiler = KeyShapeProfiler(1)
+        formality.query.load([("a[b]", ["1", "2"]), ("c", "x")], profiler=profiler)
+        formality.query.load([], profiler=profiler)
+        formality.query.loads("", profiler=profiler)
+        summary = profiler.summary()
+        self.assertEqual(list(summary["shapes"]), ["a[b][N]", "c"])
+        self.assertEqual(summary["fields"], {"0": 2, "2-3": 1})
+
+    def test_sampling(self):
+        profiler = KeyShapeProfiler(0)
+        for i in range(100):
+            formality.query.loads(self.qs, profiler=profiler)
+        self.assertEqual((profiler.observed, profiler.sampled, profiler.shapes), (100, 0, {}))
+
+        profiler = KeyShapeProfiler(0.1, seed=1)
+        for i in range(10000):
+            formality.query.loads("a=1", profiler=profiler)
+        self.assertEqual(profiler.observed, 10000)
+        self.assertAlmostEqual(profiler.sampled, 1000, delta=150)
+        self.assertEqual(profiler.summary()["shapes"]["a"]["count"], profiler.sampled)
+        with self.assertRaises(ValueError):
+            KeyShapeProfiler(1.5)
+
+    def test_bounded(self):
+        profiler = KeyShapeProfiler(1, max_shapes=10)
+        for i in range(100):
+            formality.query.loads(f"a[key{i}]=1&b=2", profiler=profiler)
+        summary = profiler.summary()
+        self.assertEqual(len(summary["shapes"]), 10)
+        self.assertEqual(summary["shapes"]["b"]["count"], 100)
+        self.assertEqual(summary["other_shapes"], 91)
+        profiler.reset()
+        self.assertEqual(profiler.summary()["shapes"], {})
+        self.assertEqual(profiler.sampled, 0)
+
+    def test_threads(self):
+        profiler = KeyShapeProfiler(1)
+
+        def work():
+            for i in range(200):
+                formality.query.loads(self.qs, profiler=profiler)
+
+        threads = [threading.Thread(target=work) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = profiler.summary()
+        self.assertEqual(summary["sampled"], 1600)
+        self.assertEqual(summary["shapes"]["ids[N]"]["count"], 4800)
+
+
+class TestKeyShapeProfilerRequests(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        super().setUpClass()
+
+    def test_request_parser(self):
+        class RequestParser(formality.views.RequestParser):
+            profiler = KeyShapeProfiler(1)
+
+        factory = RequestFactory()
+        RequestParser.process_request(factory.get("/?page=2&sort[dir]=asc"))
+        RequestParser.process_request(
+            factory.post("/", data=b'{"a": [{"b": 1}]}', content_type="application/json")
+        )
+        RequestParser.process_request(factory.post("/?page=3", data={"c[]": ["1", "2"]}))
+        self.assertEqual(
+            RequestParser.profiler.summary()["shapes"],
+            {
+                "c[N]": {"count": 2, "types": {"int": 2}},
+                "page": {"count": 2, "types": {"int": 2}},
+                "sort[dir]": {"count": 1, "types": {"str": 1}},
+                "a[N][b]": {"count": 1, "types": {"int": 1}},
+            },
+        )
+        # Three query strings (one empty) and two bodies.
+        self.assertEqual(RequestParser.profiler.observed, 5)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
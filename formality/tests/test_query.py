@@ -1,10 +1,16 @@
+import asyncio
+import json
+import os
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from io import BytesIO
 from unittest import TestCase, main
 import formality
-from django.core.exceptions import TooManyFieldsSent
+from django.core.exceptions import SuspiciousOperation, TooManyFieldsSent
 from django.test import TestCase as DjangoTestCase, RequestFactory
 from django.core.files import File
+from asgiref.sync import iscoroutinefunction
 
 try:
     from hypothesis import given, strategies as st, settings as hyposettings
@@ -696,6 +702,28 @@ class TestDumpQueries(TestCase):
             with self.subTest(data=qs):
                 self.assertEqual(formality.query.dumps(data), qs)
 
+    def test_iterdumps(self):
+        for data, qs in self.examples:
+            with self.subTest(data=qs):
+                pairs = formality.query.iterdumps(data)
+                self.assertEqual(next(pairs), qs.split("&")[0])
+                self.assertEqual(list(pairs), qs.split("&")[1:])
+
+    def test_iterdumps_limits(self):
+        data = {"a": [{"b": 1}, {"b": 2}], "c": 3}
+        # a[0][b] and a[1][b] are 3 fields each, nested 2 deep.
+        self.assertEqual(
+            list(formality.query.iterdumps(data, max_num_fields=7, max_depth=2)),
+            ["a%5B0%5D%5Bb%5D=1", "a%5B1%5D%5Bb%5D=2", "c=3"],
+        )
+        pairs = formality.query.iterdumps(data, max_num_fields=6)
+        self.assertEqual(next(pairs), "a%5B0%5D%5Bb%5D=1")
+        self.assertEqual(next(pairs), "a%5B1%5D%5Bb%5D=2")
+        with self.assertRaisesRegex(ValueError, re.escape("exceeded 6, which loads")):
+            next(pairs)
+        with self.assertRaisesRegex(ValueError, re.escape("depth of nested parameters dumped exceeded 1")):
+            list(formality.query.iterdumps(data, max_depth=1))
+
 
 class TestRoundTripping(TestCase):
     examples = (
@@ -818,6 +846,484 @@ class TestManyFields(TestCase):
                     formality.query.loads(data)
 
 
+class TestPathologicalLimits(TestCase):
+    def test_key_length(self):
+        formality.query.loads("abcde[f]=1", max_key_length=8)
+        for qs in ("abcdef[g]=1", "a=1&abc%5Bde%5D=1"):
+            with self.subTest(data=qs):
+                with self.assertRaisesRegex(
+                    formality.query.KeyTooLong, "exceeded 8"
+                ):
+                    formality.query.loads(qs, max_key_length=8)
+        with self.assertRaises(formality.query.KeyTooLong):
+            formality.query.load([("abcdef[g]", "1")], max_key_length=8)
+
+    def test_value_length(self):
+        formality.query.loads("a=1234", max_value_length=4)
+        with self.assertRaisesRegex(
+            formality.query.ValueTooLong,
+            re.escape("Value of length 5 for key 'a' exceeded 4"),
+        ):
+            formality.query.loads("a=12345", max_value_length=4)
+        with self.assertRaises(formality.query.ValueTooLong):
+            formality.query.load([("a", ["1", "12345"])], max_value_length=4)
+        with self.assertRaises(formality.query.ValueTooLong):
+            formality.query.loads(
+                "a=1&b=2&c=12345", max_value_length=4, batch_coerce=True
+            )
+
+    def test_value_length_before_num_fields(self):
+        # The value is checked before the key's fields are counted, however
+        # it's parsed.
+        qs = "a[b][c]=12345"
+        limits = {"max_value_length": 3, "max_num_fields": 2}
+        parses = {
+            "loads": lambda: formality.query.loads(qs, **limits),
+            "batch_coerce": lambda: formality.query.loads(qs, batch_coerce=True, **limits),
+            "bytes": lambda: formality.query.loads(qs.encode(), **limits),
+            "load": lambda: formality.query.load([("a[b][c]", ["12345"])], **limits),
+            "flat": lambda: formality.flat.loads(qs, **limits),
+            "transcode": lambda: formality.transcode.loads_to_json(qs, **limits),
+            "urlencoded": lambda: formality.parsers.parse_urlencoded(qs.encode(), **limits),
+        }
+        for name, parse in parses.items():
+            with self.subTest(name=name):
+                with self.assertRaises(formality.query.ValueTooLong):
+                    parse()
+
+    def test_keys_per_mapping(self):
+        self.assertEqual(
+            formality.query.loads(
+                "a[x]=1&a[y]=2&a[x]=3&b=4", max_keys_per_mapping=2
+            ),
+            {"a": {"x": 3, "y": 2}, "b": 4},
+        )
+        examples = (
+            "a[x]=1&a[y]=2&a[z]=3",
+            "a[x][y]=1&a[y][y]=2&a[z][y]=3",
+            "a=1&b=2&c=3",
+            "a[x]=1&b=2&c[]=3",
+        )
+        for qs in examples:
+            with self.subTest(data=qs):
+                with self.assertRaisesRegex(
+                    formality.query.TooManyKeys, "exceeded 2 keys in a single mapping"
+                ):
+                    formality.query.loads(qs, max_keys_per_mapping=2)
+                with self.assertRaises(formality.query.TooManyKeys):
+                    formality.query.loads(
+                        qs, max_keys_per_mapping=2, batch_coerce=True
+                    )
+
+    def test_lists_are_not_mappings(self):
+        self.assertEqual(
+            formality.query.loads("a[]=1&a[]=2&a[]=3", max_keys_per_mapping=1),
+            {"a": [1, 2, 3]},
+        )
+
+    def test_input_bytes(self):
+        formality.query.loads(b"a=1&b=2", max_input_bytes=7)
+        with self.assertRaisesRegex(
+            formality.query.DataTooLarge, re.escape("Input of length 8 exceeded 7")
+        ):
+            formality.query.loads(b"a=1&b=22", max_input_bytes=7)
+        formality.query.load([("a", "1"), ("b", ["2", "3"])], max_input_bytes=5)
+        with self.assertRaises(formality.query.DataTooLarge):
+            formality.query.load(
+                [("a", "1"), ("b", ["2", "3"]), ("c", "")], max_input_bytes=5
+            )
+
+    def test_each_is_suspicious(self):
+        for exc in (
+            formality.query.KeyTooLong,
+            formality.query.ValueTooLong,
+            formality.query.TooManyKeys,
+            formality.query.DataTooLarge,
+        ):
+            with self.subTest(exception=exc):
+                self.assertTrue(issubclass(exc, SuspiciousOperation))
+
+
+class TestBatchCoercion(TestCase):
+    examples = (
+        "a[]=1&a[]=2&a[]=3&a[]=4&a[]=5&a[]=6&a[]=7",
+        "a=1&b=2&a=3&c[x]=4&a=5&c[y][]=6&c[y][]=7&a[]=8",
+        "a[2]=3&a[4]=1&a[]=5&a[0]=9&b[][x]=1&b[][x]=2&b[1][y]=3",
+        "xyz[2][][y][][woo]=4&abc=1&&&xyz[2][][y][][woo]=5&abc=true",
+        "key1&key2&key3&key4=yep&counter=0000000000000000000000&f=1.5e3",
+        "ids[]=1&ids[]=2&ids[]=1&ids[]=0&ids[]=00&ids[]=007&ids[]=-3&ids[]=1e3",
+        "a=true&b=false&c=null&d=NaN&e=Infinity&f=-Infinity&g=true&h=",
+        "a=3\r\n&b=%31%32&c=+1&d=1.&e=.5&f=%E2%91%A0",
+    )
+
+    def test_same_result_as_value_by_value(self):
+        corpora = (
+            self.examples,
+            (qs for qs, _ in TestLoadJQueryBbqQueries.str_examples),
+            (qs for qs, _ in TestLoadRackQueries.str_examples),
+            (qs for qs, _ in TestLoadOdditiesAndMalformed.str_examples),
+        )
+        for corpus in corpora:
+            for qs in corpus:
+                with self.subTest(data=qs):
+                    self.assertEqual(
+                        formality.query.loads(
+                            qs, batch_coerce=True, max_depth=1000, max_num_fields=99999
+                        ),
+                        formality.query.loads(qs, max_depth=1000, max_num_fields=99999),
+                    )
+
+    def test_max_num_fields(self):
+        with self.assertRaisesRegex(
+            TooManyFieldsSent,
+            re.escape(
+                "parameters (including nesting) exceeded 5; received 6 (possibly nested) parameters"
+            ),
+        ):
+            formality.query.loads("a[b]&c[d]&e[f]", batch_coerce=True, max_num_fields=5)
+
+    def test_first_error_wins(self):
+        # The malformed key at the end doesn't get thrown, because
+        # sequentially the nesting limit is hit first.
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.loads(
+                "a[b]&c[d]&e[f]&g[[]", batch_coerce=True, max_num_fields=5
+            )
+        with self.assertRaisesRegex(formality.query.MalformedData, re.escape("'g[[]'")):
+            formality.query.loads("a[b]&c[d]&g[[]&e[f]", batch_coerce=True)
+
+    def test_conversion_errors_happen_in_order(self):
+        too_long = "1" * 5000
+        with self.assertRaises(formality.query.MalformedData):
+            formality.query.loads(f"a[[=1&b={too_long}", batch_coerce=True)
+        with self.assertRaises(ValueError):
+            formality.query.loads(f"b={too_long}&a[[=1", batch_coerce=True)
+
+
+class TestInterning(TestCase):
+    def test_keys_and_values_are_shared_between_calls(self):
+        interner = formality.query.Interner()
+        # Built at runtime, so that they're not already the same object as
+        # the literals in the test.
+        qs = "&".join(("sort[field]=name", "sort[dir]=" + "".join(("a", "s", "c"))))
+        first = formality.query.loads(qs, interner=interner)
+        second = formality.query.loads(qs, interner=interner)
+        self.assertEqual(first, {"sort": {"field": "name", "dir": "asc"}})
+        self.assertEqual(first, second)
+        self.assertIs(first["sort"]["dir"], second["sort"]["dir"])
+        self.assertIs(
+            next(iter(first["sort"])), next(iter(second["sort"]))
+        )
+        self.assertIn("sort", interner)
+        self.assertIn("asc", interner)
+
+    def test_other_paths(self):
+        interner = formality.query.Interner()
+        qs = "a[]=x&b=y"
+        formality.query.loads(qs, interner=interner, batch_coerce=True)
+        formality.query.load([("c", ["z", "w"])], interner=interner)
+        for value in ("a", "b", "c", "x", "y", "z", "w"):
+            with self.subTest(value=value):
+                self.assertIn(value, interner)
+
+    def test_bounded(self):
+        interner = formality.query.Interner(max_size=4, max_length=3)
+        formality.query.loads("a=1&bb=long&c=2&d=3", interner=interner)
+        self.assertEqual(len(interner), 4)
+        self.assertNotIn("long", interner)
+        formality.query.loads("e=1", interner=interner)
+        self.assertEqual(len(interner), 3)
+        self.assertNotIn("a", interner)
+        self.assertNotIn("bb", interner)
+        interner.clear()
+        self.assertEqual(len(interner), 0)
+        # Too small to hold even one generation.
+        interner = formality.query.Interner(max_size=1)
+        interner("a")
+        self.assertEqual(len(interner), 0)
+
+    def test_junk_does_not_stop_interning(self):
+        interner = formality.query.Interner(max_size=10)
+        hot = "".join(("p", "a", "g", "e"))
+        self.assertIs(interner(hot), hot)
+        for i in range(100):
+            interner(f"junk{i}")
+            # Used again every so often, so stays interned throughout.
+            self.assertIs(interner("".join(("p", "a", "g", "e"))), hot)
+        # New strings are still being interned after all of that.
+        fresh = "".join(("s", "o", "r", "t"))
+        self.assertIs(interner(fresh), fresh)
+        self.assertIs(interner("".join(("s", "o", "r", "t"))), fresh)
+        self.assertLessEqual(len(interner), 10)
+
+
+class TestExtract(TestCase):
+    qs = "a=1&utm%5Bsource%5D=goo+gle&b[x]=2&ctx[tenant]=7&ctx[tenant]=8&filters[0][field]=n"
+
+    def test_finds_the_same_values_as_loads(self):
+        paths = {"utm[source]", "ctx[tenant]", "filters[0][field]", "b[x]", "a"}
+        loaded = formality.query.loads(self.qs)
+        self.assertEqual(
+            formality.query.extract(self.qs, paths),
+            {
+                "utm[source]": loaded["utm"]["source"],
+                # The first one, whereas loads keeps the last.
+                "ctx[tenant]": 7,
+                "filters[0][field]": loaded["filters"][0]["field"],
+                "b[x]": loaded["b"]["x"],
+                "a": loaded["a"],
+            },
+        )
+
+    def test_missing_paths(self):
+        self.assertEqual(
+            formality.query.extract(self.qs, {"ctx[user]", "b", "a[x]"}), {}
+        )
+        self.assertEqual(formality.query.extract("", {"a"}), {})
+        self.assertEqual(
+            formality.query.extract(self.qs, {"a"}, coerce=False), {"a": "1"}
+        )
+
+    def test_numeric_names(self):
+        qs = "0=1&1[a]=2&2[0]=x&00=3"
+        loaded = formality.query.loads(qs)
+        self.assertEqual(loaded, {"0": 1, 1: {"a": 2}, 2: ["x"], "00": 3})
+        self.assertEqual(
+            formality.query.extract(qs, {"0", "1[a]", "2[0]", "00"}),
+            {"0": loaded["0"], "1[a]": loaded[1]["a"], "2[0]": loaded[2][0], "00": loaded["00"]},
+        )
+        self.assertEqual(formality.query.extract(qs, {"1"}), {})
+        plan = formality.query.PathPlan(["0", "1[a]"])
+        self.assertEqual(plan.names, {"0", "1"})
+        self.assertEqual(formality.query.PathPlan.from_dict(plan.to_dict(), strict=True).names, plan.names)
+
+    def test_plans_are_reusable(self):
+        plan = formality.query.PathPlan(["ctx[tenant]", "utm[source]"])
+        self.assertEqual(len(plan), 2)
+        for _ in range(2):
+            self.assertEqual(
+                formality.query.extract(self.qs, plan),
+                {"ctx[tenant]": 7, "utm[source]": "goo gle"},
+            )
+
+    def test_saved_plans(self):
+        plan = formality.query.PathPlan(["ctx[tenant]", "utm[source]", "filters[0][field]", "café"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "plan.json")
+            plan.save(path)
+            loaded = formality.query.PathPlan.load(path, strict=True)
+        self.assertEqual(loaded.paths, plan.paths)
+        self.assertEqual(loaded.names, plan.names)
+        self.assertEqual(
+            formality.query.extract(self.qs, loaded),
+            {"ctx[tenant]": 7, "utm[source]": "goo gle", "filters[0][field]": "n"},
+        )
+
+    def test_incompatible_plans(self):
+        saved = formality.query.PathPlan(["a[0][b]", "é"]).to_dict()
+        # Whatever it says the paths compile to, they're compiled again.
+        outdated = {**saved, "version": 0, "paths": {path: ["x"] for path in saved["paths"]}}
+        self.assertEqual(
+            formality.query.PathPlan.from_dict(outdated).paths,
+            {("a", 0, "b"): "a[0][b]", ("é",): "é"},
+        )
+        with self.assertRaisesRegex(ValueError, "saved by version 0"):
+            formality.query.PathPlan.from_dict(outdated, strict=True)
+        latin = formality.query.PathPlan.from_dict(saved, encoding="iso-8859-1")
+        self.assertEqual(latin.encoding, "iso-8859-1")
+        self.assertEqual(formality.query.extract("%E9=1", latin, encoding="iso-8859-1"), {"é": 1})
+        with self.assertRaises(ValueError):
+            formality.query.PathPlan.from_dict(saved, encoding="iso-8859-1", strict=True)
+
+    def test_plans_from_shapes(self):
+        plan = formality.query.PathPlan.from_shapes(["q", "filters[N][field]", "m[N][N]"], indexes=2)
+        self.assertEqual(
+            sorted(plan.paths.values()),
+            ["filters[0][field]", "filters[1][field]", "m[0][0]", "m[0][1]", "m[1][0]", "m[1][1]", "q"],
+        )
+        profile = {
+            "shapes": {
+                "q": {"count": 10, "types": {"str": 10}},
+                "filters[N][field]": {"count": 4, "types": {"str": 4}},
+                "rare": {"count": 1, "types": {"str": 1}},
+                "junk[[": {"count": 5, "types": {"str": 5}},
+                "a[]": {"count": 5, "types": {"str": 5}},
+            }
+        }
+        plan = formality.query.PathPlan.from_profile(profile, min_count=2, indexes=3)
+        self.assertEqual(
+            sorted(plan.paths.values()),
+            ["filters[0][field]", "filters[1][field]", "filters[2][field]", "q"],
+        )
+
+    def test_unanswerable_paths(self):
+        for path in ("a[]", "a[][b]", "", "a[[b]"):
+            with self.subTest(path=path):
+                with self.assertRaises((ValueError, formality.query.MalformedData)):
+                    formality.query.PathPlan([path])
+
+    def test_unwanted_fields_are_not_decoded(self):
+        # None of these get looked at beyond their name.
+        qs = "junk[[=1&other[]]=2&ctx[tenant]=7"
+        self.assertEqual(formality.query.extract(qs, {"ctx[tenant]"}), {"ctx[tenant]": 7})
+        with self.assertRaises(formality.query.MalformedData):
+            formality.query.extract(qs, {"junk"})
+
+    def test_stops_once_everything_is_found(self):
+        qs = "ctx[tenant]=7&ctx[[=1&ctx[a][b][c][d][e][f]=1"
+        self.assertEqual(formality.query.extract(qs, {"ctx[tenant]"}), {"ctx[tenant]": 7})
+        with self.assertRaises(formality.query.MalformedData):
+            formality.query.extract(qs, {"ctx[tenant]", "ctx[user]"})
+
+    def test_limits(self):
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.extract("a=1&b=2&c=3", {"c"}, max_num_fields=2)
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.extract("a[b][c][d][e][f][g]=1", {"a[b]"})
+        with self.assertRaises(formality.query.ValueTooLong):
+            formality.query.extract("a=12345", {"a"}, max_value_length=4)
+        with self.assertRaises(formality.query.KeyTooLong):
+            formality.query.extract("abcdef[g]=1", {"abcdef[g]"}, max_key_length=4)
+
+
+class TestOnlyAndExclude(TestCase):
+    qs = "q=shoes&page=2&utm_source=mail&utm%5Bcampaign%5D=x&fbclid=abc&filters[0][field]=size"
+
+    def test_only(self):
+        expected = {"q": "shoes", "filters": [{"field": "size"}]}
+        self.assertEqual(
+            formality.query.loads(self.qs, only={"q", "filters"}), expected
+        )
+        self.assertEqual(
+            formality.query.loads(self.qs, only={"q", "filters"}, batch_coerce=True),
+            expected,
+        )
+        self.assertEqual(
+            formality.query.load(
+                [("q", "shoes"), ("fbclid", "abc"), ("filters[0][field]", ["size"])],
+                only={"q", "filters"},
+            ),
+            expected,
+        )
+        self.assertEqual(formality.query.loads(self.qs, only=set()), {})
+
+    def test_exclude(self):
+        self.assertEqual(
+            formality.query.loads(self.qs, exclude={"utm", "utm_source", "fbclid"}),
+            {"q": "shoes", "page": 2, "filters": [{"field": "size"}]},
+        )
+        self.assertEqual(
+            formality.query.loads(
+                self.qs, exclude={"utm", "utm_source", "fbclid"}, batch_coerce=True
+            ),
+            {"q": "shoes", "page": 2, "filters": [{"field": "size"}]},
+        )
+
+    def test_skipped_fields_are_not_looked_at(self):
+        qs = "junk[[=1&junk[a][b][c][d][e][f]=1&" + "&".join(
+            f"junk[{i}]=1" for i in range(10)
+        )
+        self.assertEqual(
+            formality.query.loads(qs + "&a=1", exclude={"junk"}, max_num_fields=20),
+            {"a": 1},
+        )
+        # But the up-front check for the number of fields still applies.
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.loads(qs, exclude={"junk"}, max_num_fields=5)
+
+
+class TestParseBudget(TestCase):
+    def test_shared_between_calls(self):
+        budget = formality.query.ParseBudget(10)
+        formality.query.loads("a=1&b=2", budget=budget)
+        formality.query.loads("c[d][e]=1", budget=budget)
+        self.assertEqual(budget.fields, 5)
+        # Each call is limited to what's left, on top of its own limit.
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.loads("a=1&b=2&c=3&d=4&e=5&f=6", budget=budget)
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.loads("a=1&b=2", max_num_fields=1, budget=budget)
+        formality.query.loads("a=1&b=2&c=3&d=4&e=5", budget=budget)
+        self.assertEqual(budget.fields, 10)
+        self.assertEqual(formality.query.loads("", budget=budget), {})
+        with self.assertRaises(TooManyFieldsSent):
+            formality.query.loads("a=1", budget=budget)
+
+    def test_bytes(self):
+        budget = formality.query.ParseBudget(max_input_bytes=10)
+        formality.query.loads(b"a=1&b=2", budget=budget)
+        self.assertEqual(budget.input_bytes, 7)
+        with self.assertRaises(formality.query.DataTooLarge):
+            formality.query.loads("c=123", budget=budget)
+        with self.assertRaises(formality.query.DataTooLarge):
+            budget.charge(input_bytes=4)
+
+    def test_every_entry_point_charges_the_same(self):
+        qs = "a[0][b]=1&a[0][c]=2&a[1][b]=3&d=true&e[]=x"
+        expected = formality.query.ParseBudget()
+        formality.query.loads(qs, budget=expected)
+        self.assertEqual(expected.fields, 12)
+        parses = {
+            "batch_coerce": lambda budget: formality.query.loads(qs, batch_coerce=True, budget=budget),
+            "flat": lambda budget: formality.flat.loads(qs, budget=budget),
+            "transcode": lambda budget: formality.transcode.loads_to_json(qs, budget=budget),
+            "urlencoded": lambda budget: formality.parsers.parse_urlencoded(qs.encode(), budget=budget),
+            "json": lambda budget: formality.parsers.parse_json(
+                json.dumps(formality.query.loads(qs)).encode(), budget=budget
+            ),
+            "json stream": lambda budget: formality.parsers.parse_json(
+                BytesIO(json.dumps(formality.query.loads(qs)).encode()), chunk_size=4, budget=budget
+            ),
+        }
+        for name, parse in parses.items():
+            with self.subTest(name=name):
+                budget = formality.query.ParseBudget()
+                parse(budget)
+                self.assertEqual(budget.fields, expected.fields)
+                limited = formality.query.ParseBudget(expected.fields - 1)
+                with self.assertRaises(TooManyFieldsSent):
+                    parse(limited)
+
+    def test_load_and_extract(self):
+        budget = formality.query.ParseBudget(10, max_input_bytes=30)
+        # a[b][0], a[b][1] and c; the keys and values.
+        formality.query.load([("a[b]", ["1", "2"]), ("c", "x")], budget=budget)
+        self.assertEqual((budget.fields, budget.input_bytes), (7, 8))
+        # Only the field which was decoded, but all of the input.
+        formality.query.extract("a=1&utm[source]=x&b=2", {"utm[source]"}, budget=budget)
+        self.assertEqual((budget.fields, budget.input_bytes), (9, 29))
+        with self.assertRaises(formality.query.DataTooLarge):
+            formality.query.load([("d", "1")], budget=budget)
+
+    def test_files(self):
+        budget = formality.query.ParseBudget(max_files=2)
+        budget.charge(files=2)
+        with self.assertRaisesRegex(formality.exceptions.TooManyFilesSent, "exceeded 2"):
+            budget.charge(files=1)
+
+
+class TestThreadSafety(TestCase):
+    def test_concurrent_loads_and_dumps(self):
+        interner = formality.query.Interner(max_size=50)
+        inputs = [
+            f"a[{i % 3}][]={i}&b[x{i % 40}]=v{i % 60}&c=true&c={i}" for i in range(400)
+        ]
+        expected = [formality.query.loads(qs) for qs in inputs]
+
+        def roundtrip(qs):
+            data = formality.query.loads(qs, interner=interner)
+            return data, formality.query.loads(formality.query.dumps(data))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(roundtrip, inputs))
+        for qs, result, (data, reloaded) in zip(inputs, expected, results):
+            with self.subTest(data=qs):
+                self.assertEqual(data, result)
+                self.assertEqual(reloaded, result)
+        # Racing threads may each add one more before seeing it's full.
+        self.assertLessEqual(len(interner), 50 + 8)
+
+
 class TestMultipartParsing(DjangoTestCase):
     @classmethod
     def setUpClass(cls):
@@ -879,6 +1385,27 @@ class TestMultipartParsing(DjangoTestCase):
         self.assertEqual(request.POST, {'b': 'test'})
         self.assertEqual(request.FILES["b"].read(), b'mybinarydata')
 
+    def test_querydict_api(self):
+        rf = RequestFactory()
+        request = rf.post(
+            path='/?page=2&sort[]=name&sort[]=age',
+            data={
+                'a[b]': [1, 2],
+                'c': 'true',
+                'd[test]': BytesIO(b'mybinarydata'),
+            }
+        )
+        formality.views.RequestParser.process_request(request)
+        self.assertEqual(request.GET.getlist('page'), ['2'])
+        self.assertEqual(request.GET.getlist('sort'), ['name', 'age'])
+        self.assertEqual(request.POST.getlist('c'), ['true'])
+        self.assertEqual(request.POST['c'], True)
+        with self.assertRaises(AttributeError):
+            request.POST['c'] = False
+        [uploaded] = request.FILES.getlist('d[test]')
+        self.assertEqual(uploaded.read(), b'mybinarydata')
+        request.FILES['e'] = uploaded
+
     def test_deeply_nested_collision(self):
         rf = RequestFactory()
         request = rf.post(
@@ -894,6 +1421,121 @@ class TestMultipartParsing(DjangoTestCase):
         self.assertEqual(request.FILES["b"]["test"]["best"]["other"].read(), b'mybinarydata')
 
 
+
+class _CountingExecutor(ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class TestAsyncRequestParser(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        super().setUpClass()
+
+    def parser(self, **attrs):
+        return type("Parser", (formality.views.RequestParser,), attrs)
+
+    def urlencoded(self):
+        return RequestFactory().post(
+            path='/?page=2&sort[]=name',
+            data='a[0][b]=1&a[0][c]=2&a[1][b]=3&d=true',
+            content_type='application/x-www-form-urlencoded',
+        )
+
+    def test_small_bodies_are_parsed_inline(self):
+        request = self.urlencoded()
+        with _CountingExecutor(max_workers=1) as executor:
+            parser = self.parser(executor=executor)
+            asyncio.run(parser.aprocess_request(request))
+        self.assertEqual(executor.submitted, 0)
+        self.assertEqual(request.GET, {'page': 2, 'sort': ['name']})
+        self.assertEqual(request.POST, {'a': [{'b': 1, 'c': 2}, {'b': 3}], 'd': True})
+
+    def test_large_bodies_are_offloaded(self):
+        request = self.urlencoded()
+        with _CountingExecutor(max_workers=1) as executor:
+            parser = self.parser(executor=executor, offload_threshold=0)
+            asyncio.run(parser.aprocess_request(request))
+        self.assertEqual(executor.submitted, 1)
+        self.assertEqual(request.GET, {'page': 2, 'sort': ['name']})
+        self.assertEqual(request.POST, {'a': [{'b': 1, 'c': 2}, {'b': 3}], 'd': True})
+        with self.assertRaises(AttributeError):
+            request.POST['d'] = False
+
+    def test_process_executor(self):
+        request = self.urlencoded()
+        multipart = RequestFactory().post(
+            path='/',
+            data={'a[]': [1, 2], 'b[test]': BytesIO(b'mybinarydata')},
+        )
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            parser = self.parser(executor=executor, offload_threshold=0)
+            asyncio.run(parser.aprocess_request(request))
+            # Can't be sent to another process, so uses the default executor.
+            asyncio.run(parser.aprocess_request(multipart))
+        self.assertEqual(request.GET, {'page': 2, 'sort': ['name']})
+        self.assertEqual(request.POST, {'a': [{'b': 1, 'c': 2}, {'b': 3}], 'd': True})
+        self.assertEqual(multipart.POST, {'a': [1, 2]})
+        self.assertEqual(multipart.FILES['b']['test'].read(), b'mybinarydata')
+        # Charged in the other process: 3 for GET, and 10 for POST.
+        self.assertEqual(request.parse_budget.fields, 13)
+
+    def test_process_executor_streams_json(self):
+        # Stops at the limit, before getting to the malformed end.
+        json_request = RequestFactory().post(
+            path='/',
+            data=json.dumps({'a': list(range(1001))})[:-1] + ', !',
+            content_type='application/json',
+        )
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            parser = self.parser(executor=executor, offload_threshold=0)
+            with self.assertRaises(TooManyFieldsSent):
+                asyncio.run(parser.aprocess_request(json_request))
+
+    def test_errors_come_back(self):
+        request = RequestFactory().post(
+            path='/',
+            data='a[[b]=1',
+            content_type='application/x-www-form-urlencoded',
+        )
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            parser = self.parser(executor=executor, offload_threshold=0)
+            with self.assertRaises(SuspiciousOperation):
+                asyncio.run(parser.aprocess_request(request))
+
+    def test_async_middleware(self):
+        seen = []
+
+        async def view(request):
+            seen.append((request.GET, request.POST))
+            return 'response'
+
+        middleware = self.parser(offload_threshold=0)(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(asyncio.run(middleware(self.urlencoded())), 'response')
+        self.assertEqual(
+            seen,
+            [({'page': 2, 'sort': ['name']}, {'a': [{'b': 1, 'c': 2}, {'b': 3}], 'd': True})],
+        )
+
+    def test_sync_middleware(self):
+        middleware = self.parser()(lambda request: request.POST)
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(self.urlencoded())['d'], True)
+
 if HAS_HYPOTHESIS:
 
     class TestFuzzLoads(TestCase):
@@ -908,6 +1550,64 @@ if HAS_HYPOTHESIS:
                 self.assertIsInstance(data, dict)
 
 
+
+class TestParseBudgetRequests(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        super().setUpClass()
+
+    def test_shared_by_get_and_post(self):
+        rf = RequestFactory()
+        with self.settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=10):
+            request = rf.post('/?a=1&b=2&c=3&d=4', data='e=5&f=6&g=7&h=8',
+                              content_type='application/x-www-form-urlencoded')
+            formality.views.RequestParser.process_request(request)
+            self.assertEqual(request.parse_budget.fields, 8)
+            # Either would be fine on its own.
+            request = rf.post('/?a=1&b=2&c=3&d=4&e=5&f=6', data='g=7&h=8&i=9&j=10&k=11&l=12',
+                              content_type='application/x-www-form-urlencoded')
+            with self.assertRaises(TooManyFieldsSent):
+                formality.views.RequestParser.process_request(request)
+            request = rf.post('/?a=1&b=2&c=3&d=4&e=5&f=6', data=b'{"g": [7, 8, 9], "h": 10}',
+                              content_type='application/json')
+            with self.assertRaises(TooManyFieldsSent):
+                formality.views.RequestParser.process_request(request)
+
+    def test_multipart(self):
+        class RequestParser(formality.views.RequestParser):
+            @classmethod
+            def get_budget(cls, request):
+                return formality.query.ParseBudget(11, max_input_bytes=10000, max_files=2)
+
+        rf = RequestFactory()
+        request = rf.post('/?a=1', data={'b[c]': [1, 2], 'd[]': [BytesIO(b'x'), BytesIO(b'y')]})
+        RequestParser.process_request(request)
+        # a; b[c][0] and b[c][1]; d[0] and d[1]
+        self.assertEqual((request.parse_budget.fields, request.parse_budget.files), (1 + 6 + 4, 2))
+        request = rf.post('/', data={'d[]': [BytesIO(b'x'), BytesIO(b'y'), BytesIO(b'z')]})
+        with self.assertRaises(formality.exceptions.TooManyFilesSent):
+            RequestParser.process_request(request)
+        request = rf.post('/', data={'d': 'x' * 10000})
+        with self.assertRaises(formality.exceptions.DataTooLarge):
+            RequestParser.process_request(request)
+
+    def test_parse_multipart(self):
+        request = RequestFactory().post('/', data={'a': '1', 'b[]': [BytesIO(b'x'), BytesIO(b'y')]})
+        budget = formality.query.ParseBudget(max_files=1)
+        with self.assertRaises(formality.exceptions.TooManyFilesSent):
+            formality.parsers.parse_multipart(request.body, request.META['CONTENT_TYPE'], budget=budget)
+
+
 if __name__ == "__main__":
     main(
         verbosity=2,
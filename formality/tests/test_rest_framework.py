@@ -0,0 +1,123 @@
+from io import BytesIO
+from unittest import main, skipUnless
+import formality
+from django.core.exceptions import TooManyFieldsSent
+from django.test import TestCase as DjangoTestCase, RequestFactory, override_settings
+from formality.coercion import Coercers, Coercer
+from formality.http import NestedQueryDict
+
+try:
+    import rest_framework
+
+    HAS_DRF = True
+except ModuleNotFoundError:
+    HAS_DRF = False
+
+
+@skipUnless(HAS_DRF, "Django REST framework isn't installed")
+class TestRestFramework(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure(
+                DATABASES={
+                    "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                }
+                }
+            )
+        # Importing DRF's parsers and renderers reads its settings.
+        import formality.rest_framework
+        super().setUpClass()
+
+    def test_parser(self):
+        parser = formality.rest_framework.NestedFormParser()
+        data = parser.parse(
+            BytesIO(b"a[][b]=1&a[][b]=true&c=x"),
+            "application/x-www-form-urlencoded",
+            {"encoding": "utf-8"},
+        )
+        self.assertIsInstance(data, NestedQueryDict)
+        self.assertEqual(data, {"a": [{"b": 1}, {"b": True}], "c": "x"})
+        self.assertEqual(data.getlist("a[1][b]"), ["true"])
+        # The charset of the content type wins over the request's.
+        self.assertEqual(
+            parser.parse(
+                BytesIO(b"name=Espa%F1a"),
+                "application/x-www-form-urlencoded; charset=iso-8859-1",
+                {"encoding": "utf-8"},
+            ),
+            {"name": "España"},
+        )
+
+    def test_parser_limits(self):
+        parser = formality.rest_framework.NestedFormParser()
+        with override_settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=2):
+            with self.assertRaises(TooManyFieldsSent):
+                parser.parse(BytesIO(b"a[b]=1&c=2"), "application/x-www-form-urlencoded")
+        with self.assertRaises(TooManyFieldsSent):
+            parser.parse(BytesIO(b"a[b][c][d][e][f][g]=1"), "application/x-www-form-urlencoded")
+
+        class Parser(formality.rest_framework.NestedFormParser):
+            coerce = False
+            max_depth = 6
+
+        self.assertEqual(
+            Parser().parse(BytesIO(b"a[b][c][d][e][f][g]=1"), "application/x-www-form-urlencoded"),
+            {"a": {"b": {"c": {"d": {"e": {"f": {"g": "1"}}}}}}},
+        )
+
+    def test_request_data(self):
+        from rest_framework.request import Request
+
+        request = Request(
+            RequestFactory().post(
+                "/",
+                data="a[]=1&a[]=2&b[c]=d",
+                content_type="application/x-www-form-urlencoded",
+            ),
+            parsers=[formality.rest_framework.NestedFormParser()],
+        )
+        self.assertEqual(request.data, {"a": [1, 2], "b": {"c": "d"}})
+
+    def test_renderer(self):
+        renderer = formality.rest_framework.NestedFormRenderer()
+        data = {"a": [{"b": 1}, {"b": True}], "c": "x"}
+        self.assertEqual(renderer.render(data), formality.query.dumps(data).encode())
+        self.assertEqual(renderer.render(None), b"")
+        self.assertEqual(
+            renderer.render([{"id": 1}, {"id": 2}]),
+            b"results%5B0%5D%5Bid%5D=1&results%5B1%5D%5Bid%5D=2",
+        )
+
+    def test_renderer_streams(self):
+        class Renderer(formality.rest_framework.NestedFormRenderer):
+            chunk_size = 100
+
+        data = {"items": [{"id": i, "name": f"item {i}"} for i in range(100)]}
+        chunks = list(Renderer().iter_render(data))
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 200 for chunk in chunks))
+        self.assertEqual(b"".join(chunks), formality.query.dumps(data).encode())
+        self.assertEqual(formality.query.loads(b"".join(chunks), max_num_fields=1000), data)
+
+    def test_renderer_limits_and_coercion(self):
+        class Renderer(formality.rest_framework.NestedFormRenderer):
+            max_num_fields = 5
+            coerce = Coercers(Coercer("upper", str, lambda val: val, lambda value: value.upper()))
+
+        self.assertEqual(Renderer().render({"a": "x", "b": [1, 2]}), b"a=X&b%5B0%5D=1&b%5B1%5D=2")
+        with self.assertRaises(ValueError):
+            Renderer().render({"a": [1, 2, 3]})
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
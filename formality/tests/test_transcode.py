@@ -0,0 +1,250 @@
+import codecs
+import io
+import json
+import tracemalloc
+from unittest import TestCase, main
+import formality.transcode
+from django.core.exceptions import TooManyFieldsSent
+
+from .test_query import (
+    TestLoadDjangoQueries,
+    TestLoadJQueryBbqQueries,
+    TestLoadRackQueries,
+    TestLoadOdditiesAndMalformed,
+    TestStrictlyUnhandledQueries,
+    TestBatchCoercion,
+)
+
+
+def expected_json(qs, **kwargs):
+    return json.dumps(
+        formality.query.loads(qs, **kwargs), separators=(",", ":")
+    ).encode("ascii")
+
+
+class TestLoadsToJson(TestCase):
+    examples = (
+        "",
+        # backfilling with the empty value of each type
+        "a[3]=1&b[2]=1.5&c[1]=true&d[1]=null&e[2]=x&f[1][g]=1&h[1][]=1",
+        # numbers are written as json.dumps would write the coerced value
+        "a=1e5&b=-0&c=1E-2&d=1e999&e=-1e999&f=NaN&g=Infinity&h=-Infinity&i=007",
+        # integer keys in dictionaries
+        "a[b]=1&a[0]=2",
+        # repeated simple keys
+        "a=1&a=2&a=3",
+        "a[b]=1&a=2",
+        # strings needing escaping
+        'a="quoted"&b=\\&c=%0A&d=caf%C3%A9&e=%F0%9F%98%80',
+        "a=&b[]=&c[x]=",
+        # long enough to have to be checked by converting them
+        "a=" + "9" * 700 + "&b=-" + "9" * 700,
+    )
+    maxDiff = None
+
+    def test_matches_loads(self):
+        corpora = (
+            self.examples,
+            (qs for qs, *_ in TestLoadDjangoQueries.str_examples),
+            (qs for qs, _ in TestLoadJQueryBbqQueries.str_examples),
+            (qs for qs, _ in TestLoadRackQueries.str_examples),
+            (qs for qs, _ in TestLoadOdditiesAndMalformed.str_examples),
+            TestBatchCoercion.examples,
+        )
+        for corpus in corpora:
+            for qs in corpus:
+                for coerce in (True, False):
+                    with self.subTest(data=qs, coerce=coerce):
+                        kwargs = {
+                            "max_depth": 1000,
+                            "max_num_fields": 99999,
+                            "coerce": coerce,
+                        }
+                        self.assertEqual(
+                            formality.transcode.loads_to_json(qs, **kwargs),
+                            expected_json(qs, **kwargs),
+                        )
+
+    def test_bytes(self):
+        self.assertEqual(
+            formality.transcode.loads_to_json(b"a[]=caf%E9", encoding="iso-8859-1"),
+            b'{"a":["caf\\u00e9"]}',
+        )
+
+    def test_stream(self):
+        for qs in self.examples:
+            with self.subTest(data=qs):
+                stream = io.BytesIO()
+                self.assertIsNone(
+                    formality.transcode.loads_to_json(qs, stream=stream)
+                )
+                self.assertEqual(stream.getvalue(), expected_json(qs))
+
+    def test_stream_integer_keys(self):
+        # 2[x] gives the top level an integer key, as a[2] does one below it.
+        for qs in ("2[x]=b", "a=1&2[x]=b&3[]=c"):
+            with self.subTest(data=qs):
+                stream = io.BytesIO()
+                formality.transcode.loads_to_json(qs, stream=stream)
+                self.assertEqual(stream.getvalue(), expected_json(qs))
+                self.assertEqual(stream.getvalue(), formality.transcode.loads_to_json(qs))
+
+    def test_same_exceptions(self):
+        examples = (
+            *(qs for qs, _ in TestStrictlyUnhandledQueries.examples),
+            "a=1&a[b]=2",
+            "a=xy&a[]=1",
+            "a[]=1&a[b]=2",
+            "a[b]=1&a[b][c]=2",
+            # more digits than int() allows
+            "a=" + "9" * 5000,
+        )
+        for qs in examples:
+            with self.subTest(data=qs):
+                with self.assertRaises(Exception) as nested:
+                    formality.query.loads(qs)
+                with self.assertRaises(type(nested.exception)):
+                    formality.transcode.loads_to_json(qs)
+
+    def test_same_limits(self):
+        with self.assertRaises(TooManyFieldsSent):
+            formality.transcode.loads_to_json(
+                "a[5]=1&b[5]=1", max_num_fields=10, count_holes=True
+            )
+        with self.assertRaises(TooManyFieldsSent):
+            formality.transcode.loads_to_json("a[b][c][d][e][f][g]=1")
+        with self.assertRaises(formality.query.TooManyKeys):
+            formality.transcode.loads_to_json(
+                "a[x]=1&a[y]=2&a[z]=3", max_keys_per_mapping=2
+            )
+        with self.assertRaises(formality.query.ValueTooLong):
+            formality.transcode.loads_to_json("a=12345", max_value_length=4)
+        self.assertEqual(
+            formality.transcode.loads_to_json(
+                "q=shoes&utm_source=mail", exclude={"utm_source"}
+            ),
+            b'{"q":"shoes"}',
+        )
+
+
+class TestJsonToUrlencoded(TestCase):
+    examples = (
+        "{}",
+        '{"a": 1, "b": [1, 2.5, {"c": true, "d": null}], "e": {"f": "x y", "g": []}, "h": {}}',
+        '{"a": "caf\\u00e9 \\"q\\"", "b": "\\ud83d\\ude00", "c": "&=[]%+"}',
+        '{"n": [NaN, Infinity, -Infinity, -0, 1e5, 1E-2, 12345678901234567890]}',
+        ' \n{ "a" : [ [ 1 , 2 ] , [ ] , [3] ] }\t',
+        '{"a": {"b": {"c": {"d": {"e": [false]}}}}}',
+    )
+    maxDiff = None
+
+    def chunked(self, doc, size):
+        return [doc[i : i + size] for i in range(0, len(doc), size)]
+
+    def test_matches_dumps(self):
+        corpora = (
+            self.examples,
+            (
+                json.dumps(formality.query.loads(qs, max_depth=1000, max_num_fields=99999))
+                for qs, *_ in TestLoadDjangoQueries.str_examples
+            ),
+            (
+                json.dumps(formality.query.loads(qs, max_depth=1000, max_num_fields=99999))
+                for qs, _ in TestLoadRackQueries.str_examples
+            ),
+        )
+        for corpus in corpora:
+            for doc in corpus:
+                expected = formality.query.dumps(json.loads(doc))
+                for size in (1, 3, 64, 65536):
+                    sources = (
+                        io.BytesIO(doc.encode("utf-8")),
+                        io.StringIO(doc),
+                        self.chunked(doc.encode("utf-8"), size),
+                        self.chunked(doc, size),
+                    )
+                    for source in sources:
+                        with self.subTest(data=doc, size=size, source=type(source)):
+                            self.assertEqual(
+                                formality.transcode.json_to_urlencoded(
+                                    source, chunk_size=size
+                                ),
+                                expected,
+                            )
+
+    def test_whole_documents_and_bom(self):
+        doc = '{"a": [1, "\u00e9"]}'
+        expected = "a%5B0%5D=1&a%5B1%5D=%C3%A9"
+        for source in (doc, doc.encode("utf-8"), codecs.BOM_UTF8 + doc.encode("utf-8")):
+            with self.subTest(source=source):
+                self.assertEqual(formality.transcode.json_to_urlencoded(source), expected)
+
+    def test_stream(self):
+        doc = json.dumps({"ids": list(range(1000)), "q": "shoes"})
+        expected = formality.query.dumps(json.loads(doc))
+        for size in (1, 100, 65536):
+            with self.subTest(size=size):
+                stream = io.BytesIO()
+                self.assertIsNone(
+                    formality.transcode.json_to_urlencoded(
+                        io.BytesIO(doc.encode("utf-8")), stream=stream, chunk_size=size
+                    )
+                )
+                self.assertEqual(stream.getvalue().decode("ascii"), expected)
+
+    def test_invalid(self):
+        examples = (
+            "",
+            "[1]",
+            '"a"',
+            "1",
+            '{"a": 1,}',
+            '{"a" 1}',
+            '{"a": 1}}',
+            '{"a": [1}',
+            '{"a": tru}',
+            '{"a": 1',
+            '{"a": "x\x01"}',
+            '{"a": 1} x',
+            '{"a": 01}',
+            '{"a": "\\u12"}',
+            '{"a": [1 2]}',
+            '{1: 2}',
+        )
+        for doc in examples:
+            for size in (1, 3, 65536):
+                with self.subTest(data=doc, size=size):
+                    with self.assertRaises(ValueError):
+                        formality.transcode.json_to_urlencoded(
+                            self.chunked(doc, size), chunk_size=size
+                        )
+
+    def test_memory_depends_on_depth_not_size(self):
+        def document(items):
+            yield '{"a": {"b": ['
+            for i in range(items):
+                yield f'{"," if i else ""}{{"c": [{i}, "{"x" * 100}"]}}'
+            yield "]}}"
+
+        peaks = []
+        for items in (1000, 10000):
+            tracemalloc.start()
+            try:
+                for _ in formality.transcode.iter_json_to_urlencoded(document(items)):
+                    pass
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peaks.append(peak)
+        small, large = peaks
+        self.assertLess(large, small * 2)
+
+
+if __name__ == "__main__":
+    main(
+        verbosity=2,
+        catchbreak=True,
+        tb_locals=True,
+        failfast=False,
+        buffer=False,
+    )
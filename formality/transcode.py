@@ -0,0 +1,455 @@
+import codecs
+import json.decoder
+import json.scanner
+import re
+from functools import partial
+from json.encoder import encode_basestring_ascii
+from urllib.parse import quote_plus
+from typing import (
+    AbstractSet,
+    Any,
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .query import (
+    COERCE_DUMP_CONSTANTS,
+    COERCE_LOAD_CONSTANTS,
+    ParseBudget,
+    _dump_value,
+    _is_wanted,
+    _load_key_value,
+    _split_fields,
+)
+
+
+class _Fragment(str):
+    """
+    A leaf value which has already been encoded as JSON, so is written out
+    as it is. Each subclass stands in for one of the types `query.loads` would
+    have coerced to; calling one without arguments (as backfilling arrays like
+    a[2]=1 does) gives an empty fragment, which is written as the JSON for that
+    type's empty value instead, so that it works out the same ([0, 0, 1]).
+    """
+
+    __slots__ = ()
+    empty = ""
+
+
+class _String(_Fragment):
+    __slots__ = ()
+    empty = '""'
+
+
+class _Integer(_Fragment):
+    __slots__ = ()
+    empty = "0"
+
+
+class _Float(_Fragment):
+    __slots__ = ()
+    empty = "0.0"
+
+
+class _Boolean(_Fragment):
+    __slots__ = ()
+    empty = "false"
+
+
+class _Null(_Fragment):
+    __slots__ = ()
+    empty = "null"
+
+
+_FRAGMENT_TYPES = {
+    bool: _Boolean,
+    type(None): _Null,
+    float: _Float,
+}
+# The JSON for each of these is the same as the text it's coerced from.
+_CONSTANTS = {
+    text: _FRAGMENT_TYPES[type(value)](text)
+    for text, value in COERCE_LOAD_CONSTANTS.items()
+}
+_EMPTY = _String('""')
+
+
+def _fragment(val: str) -> _Fragment:
+    """
+    The JSON equivalent of `query._coerce_value`, giving the JSON for whatever
+    `val` would have been coerced into.
+    """
+    if not val:
+        return _EMPTY
+    if val in _CONSTANTS:
+        return _CONSTANTS[val]
+    match_number = json.scanner.NUMBER_RE.fullmatch(val)
+    if match_number is not None:
+        integer, frac, exp = match_number.groups()
+        if frac or exp:
+            # Goes via a float so that it's written the way json.dumps would
+            # (1e5 becomes 100000.0, 1e999 becomes Infinity)
+            return _Float(_dump_value(float(integer + (frac or "") + (exp or ""))))
+        # Integers are already written the way json.dumps would, apart from
+        # -0, and any long enough to hit the limit on converting them (of at
+        # least 640 digits), which have to be converted to find out.
+        if integer != "-0" and len(integer) < 640:
+            return _Integer(integer)
+        return _Integer(_dump_value(int(integer)))
+    # Anything else, including all-digit strings with a leading zero (like
+    # '003532663') is left as a string.
+    return _String(encode_basestring_ascii(val))
+
+
+def _string_fragment(val: str) -> _Fragment:
+    return _String(encode_basestring_ascii(val)) if val else _EMPTY
+
+
+def _encode_key(key: Union[str, int]) -> str:
+    # Only strings and (for a[0] on a dictionary) integers can be keys.
+    return encode_basestring_ascii(key) if isinstance(key, str) else f'"{key!r}"'
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, _Fragment):
+        # Real JSON is never empty, so this is a backfilled hole.
+        return value or value.empty
+    if isinstance(value, dict):
+        return "{%s}" % ",".join(
+            [
+                f"{_encode_key(key)}:{_encode(item)}"
+                for key, item in value.items()
+            ]
+        )
+    return "[%s]" % ",".join([_encode(item) for item in value])
+
+
+def loads_to_json(
+    qs: Union[str, bytes, memoryview],
+    *,
+    stream: Optional[BinaryIO] = None,
+    encoding: str = "utf-8",
+    coerce: bool = True,
+    max_num_fields: int = 1000,
+    max_depth: int = 5,
+    max_key_length: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    max_keys_per_mapping: Optional[int] = None,
+    max_input_bytes: Optional[int] = None,
+    count_holes: bool = False,
+    only: Optional[AbstractSet[str]] = None,
+    exclude: Optional[AbstractSet[str]] = None,
+    budget: Optional[ParseBudget] = None,
+) -> Optional[bytes]:
+    """
+    Parse a string or bytestring straight into (compact, ASCII) JSON, giving
+    the same bytes as json.dumps(query.loads(qs), separators=(",", ":")) would,
+    with the same nesting, coercion, limits (and `budget`) and exceptions as
+    `query.loads`.
+
+    Only the dictionaries and lists are built; each value is encoded as JSON
+    as it's parsed, rather than being coerced into a Python object which
+    then has to be encoded.
+
+    Returns the JSON, unless a binary `stream` (anything with a `write`, like
+    a file, `io.BytesIO` or `HttpResponse`) is given, in which case it's
+    written there, one top-level key at a time.
+    """
+    obj = {}
+    if qs:
+        if budget is not None:
+            max_num_fields = budget.limit_fields(max_num_fields)
+            max_input_bytes = budget.limit_bytes(max_input_bytes)
+        parts = _split_fields(
+            qs,
+            encoding=encoding,
+            max_num_fields=max_num_fields,
+            max_input_bytes=max_input_bytes,
+        )
+        convert_value = _fragment if coerce else _string_fragment
+        filtered = only is not None or bool(exclude)
+        seen_fields = 0
+        for part in parts:
+            key, sep, val = part.partition("=")
+            if not key:
+                continue
+            if filtered and not _is_wanted(key, encoding, only, exclude):
+                continue
+            obj, seen_fields = _load_key_value(
+                key,
+                val,
+                obj=obj,
+                encoding=encoding,
+                max_num_fields=max_num_fields,
+                max_depth=max_depth,
+                seen_fields=seen_fields,
+                max_key_length=max_key_length,
+                max_value_length=max_value_length,
+                max_keys_per_mapping=max_keys_per_mapping,
+                count_holes=count_holes,
+                convert_value=convert_value,
+            )
+        if budget is not None:
+            budget.charge(fields=seen_fields, input_bytes=len(qs))
+
+    if stream is None:
+        return _encode(obj).encode("ascii")
+
+    stream.write(b"{")
+    separator = b""
+    for key, item in obj.items():
+        stream.write(separator)
+        stream.write(f"{_encode_key(key)}:{_encode(item)}".encode("ascii"))
+        separator = b","
+    stream.write(b"}")
+    return None
+
+
+# The literals json.loads accepts, written as `query.dumps` would write the
+# values they load as.
+_LITERALS = (
+    ("true", COERCE_DUMP_CONSTANTS[True]),
+    ("false", COERCE_DUMP_CONSTANTS[False]),
+    ("null", COERCE_DUMP_CONSTANTS[None]),
+    ("NaN", "NaN"),
+    ("Infinity", COERCE_DUMP_CONSTANTS[json.decoder.PosInf]),
+    ("-Infinity", COERCE_DUMP_CONSTANTS[json.decoder.NegInf]),
+)
+# Whatever could still turn out to be part of a number, if there were more.
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+_STRING = "string"
+_VALUE = "value"
+
+
+def _chunks(
+    source: Union[BinaryIO, Iterable[Union[bytes, str]], bytes, str], chunk_size: int
+) -> Iterator[str]:
+    """
+    Yield the text of `source`, which may be a (binary or text) file-like
+    object, an iterable of chunks, or the whole document.
+    """
+    if isinstance(source, (bytes, str)):
+        chunks = (source,)
+    elif hasattr(source, "read"):
+        chunks = iter(partial(source.read, chunk_size), source.read(0))
+    else:
+        chunks = source
+    # As with json.loads, bytes are UTF-8, and may start with a BOM.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _json_tokens(chunks: Iterator[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Split the JSON arriving in `chunks` into tokens, without ever holding more
+    of it than the current token (and the rest of the chunk it's in). Each
+    token is a (kind, value) pair: punctuation is given as itself, strings
+    as (_STRING, value) and numbers and literals as (_VALUE, value) with the
+    value already written as `query.dumps` would write it.
+
+    Strings are decoded with json.decoder.scanstring, and numbers found with
+    json.scanner.NUMBER_RE, exactly as json.loads does, so the same documents
+    are accepted.
+    """
+    buf = ""
+    pos = 0
+    eof = False
+    whitespace = json.decoder.WHITESPACE.match
+    number = json.scanner.NUMBER_RE.match
+    scanstring = json.decoder.scanstring
+    while True:
+        pos = whitespace(buf, pos).end()
+        if pos == len(buf) and eof:
+            return
+        if pos < len(buf):
+            char = buf[pos]
+            if char in "{}[]:,":
+                yield char, None
+                pos += 1
+                continue
+            if char == '"':
+                try:
+                    value, pos = scanstring(buf, pos + 1, True)
+                except json.JSONDecodeError as e:
+                    # Only give up if it's not just that the rest of the string
+                    # (or an escape in it) is still to come.
+                    if eof or not (
+                        e.msg.startswith("Unterminated") or len(buf) < e.pos + 6
+                    ):
+                        raise
+                    # No point trying again until there's another quote.
+                    for chunk in chunks:
+                        buf += chunk
+                        if '"' in chunk:
+                            break
+                    else:
+                        eof = True
+                    continue
+                yield _STRING, value
+                continue
+            match_number = number(buf, pos)
+            if match_number is not None and (
+                eof or _NUMBER_TAIL.match(buf, match_number.end()) is None
+            ):
+                integer, frac, exp = match_number.groups()
+                if frac or exp:
+                    # Goes via a float so that it's written the way
+                    # json.loads then query.dumps would (1e5 becomes 100000.0)
+                    value = _dump_value(float(integer + (frac or "") + (exp or "")))
+                elif integer != "-0" and len(integer) < 640:
+                    # See _fragment for why integers are left alone.
+                    value = integer
+                else:
+                    value = _dump_value(int(integer))
+                yield _VALUE, value
+                pos = match_number.end()
+                continue
+            if match_number is None:
+                for literal, value in _LITERALS:
+                    if buf.startswith(literal, pos):
+                        break
+                else:
+                    literal = None
+                if literal is not None:
+                    yield _VALUE, value
+                    pos += len(literal)
+                    continue
+                rest = buf[pos:]
+                if eof or not any(literal.startswith(rest) for literal, _ in _LITERALS):
+                    raise json.JSONDecodeError("Expecting value", buf, pos)
+                # Could be the start of one of them, so read more to find out.
+        # Need more; drop everything already consumed while adding it.
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf = buf[pos:] + chunk
+            pos = 0
+
+
+def iter_json_to_urlencoded(
+    source: Union[BinaryIO, Iterable[Union[bytes, str]], bytes, str],
+    *,
+    encoding: str = "utf-8",
+    chunk_size: int = 65536,
+) -> Iterator[str]:
+    """
+    Yield the (URL encoded) key=value pairs `query.dumps` would produce for a
+    JSON object, without ever loading the whole document. The `source` may be
+    a file-like object (binary or text), which is read `chunk_size` at a time,
+    any iterable of bytes or str chunks, or simply a bytes or str.
+
+    Only the path to the current value is kept, so memory use depends on how
+    deeply nested the document is, rather than how big it is. Because nothing
+    else is kept, repeated keys in the same object are all written out, where
+    json.loads would only keep the last.
+
+    The top level has to be an object, otherwise `ValueError` is thrown,
+    as it is (or `json.JSONDecodeError`, a subclass) for invalid JSON.
+    """
+    tokens = _json_tokens(_chunks(source, chunk_size))
+    kind, value = next(tokens, (None, None))
+    if kind != "{":
+        raise ValueError(
+            f"The top level of the JSON must be an object, not {kind or 'nothing'!r}"
+        )
+    # For each open object or array, its (URL encoded) path, whether it's an
+    # array, and the index of the current item if so.
+    stack: List[List[Any]] = [["", False, 0]]
+    expecting = "key_or_end"
+    path = ""
+    for kind, value in tokens:
+        if expecting == "value" or expecting == "value_or_end":
+            if kind == _STRING or kind == _VALUE or kind == "{" or kind == "[":
+                prefix, is_array, index = stack[-1]
+                if is_array:
+                    path = prefix + quote_plus(f"[{index}]", encoding=encoding)
+                if kind == "{":
+                    stack.append([path, False, 0])
+                    expecting = "key_or_end"
+                elif kind == "[":
+                    stack.append([path, True, 0])
+                    expecting = "value_or_end"
+                else:
+                    yield f"{path}={quote_plus(value, encoding=encoding)}"
+                    expecting = "comma_or_end"
+                continue
+        elif expecting == "key" or expecting == "key_or_end":
+            if kind == _STRING:
+                prefix = stack[-1][0]
+                if prefix:
+                    path = prefix + quote_plus(f"[{value}]", encoding=encoding)
+                else:
+                    path = quote_plus(value, encoding=encoding)
+                expecting = "colon"
+                continue
+        elif expecting == "colon":
+            if kind == ":":
+                expecting = "value"
+                continue
+        elif expecting == "comma_or_end":
+            if kind == ",":
+                if stack[-1][1]:
+                    stack[-1][2] += 1
+                    expecting = "value"
+                else:
+                    expecting = "key"
+                continue
+
+        # Anything else has to be closing the current object or array, and
+        # only where that's allowed.
+        if expecting.endswith("_or_end") and kind == ("]" if stack[-1][1] else "}"):
+            stack.pop()
+            expecting = "comma_or_end" if stack else "nothing"
+            continue
+        raise ValueError(f"Unexpected {kind!r} when expecting {expecting}")
+    if stack:
+        raise ValueError(f"Unexpected end of the JSON when expecting {expecting}")
+
+
+def json_to_urlencoded(
+    source: Union[BinaryIO, Iterable[Union[bytes, str]], bytes, str],
+    *,
+    stream: Optional[BinaryIO] = None,
+    encoding: str = "utf-8",
+    chunk_size: int = 65536,
+) -> Optional[str]:
+    """
+    Convert a JSON object, from any `source` `iter_json_to_urlencoded` accepts,
+    into the same URL encoded string `query.dumps` would give for it.
+
+    Returns the string, unless a binary `stream` (anything with a `write`) is
+    given, in which case it's written there in pieces of about `chunk_size`.
+    """
+    pairs = iter_json_to_urlencoded(source, encoding=encoding, chunk_size=chunk_size)
+    if stream is None:
+        return "&".join(pairs)
+
+    pending: List[str] = []
+    size = 0
+    separator = b""
+    for pair in pairs:
+        pending.append(pair)
+        size += len(pair)
+        if chunk_size <= size:
+            stream.write(separator)
+            stream.write("&".join(pending).encode("ascii"))
+            separator = b"&"
+            pending = []
+            size = 0
+    if pending:
+        stream.write(separator)
+        stream.write("&".join(pending).encode("ascii"))
+    return None
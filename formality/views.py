@@ -0,0 +1,249 @@
+"""
+The Django side of things, replacing the flat `QueryDict` instances on
+a request with the nested dictionaries `query` (or `parsers`) produces.
+
+Importing this imports Django (and needs settings configuring before it's
+used), which is why it's only loaded once it's actually asked for.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+from typing import TYPE_CHECKING, ClassVar, Optional, Union
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import exceptions, parsers, query
+from .http import NestedQueryDict
+
+if TYPE_CHECKING:
+    from .coercion import Coercers
+    from .profiling import KeyShapeProfiler
+
+
+class RequestParser:
+    """
+    Middleware which parses `request.GET`, and for POST requests
+    `request.POST` and `request.FILES`, into nested dictionaries, applying
+    the same `DATA_UPLOAD_MAX_NUMBER_FIELDS` limit Django itself would.
+    Besides the forms Django handles, bodies of any other type `parsers` can
+    parse (such as JSON) become `request.POST` too, with the same limits.
+    They're handed over as a stream, so that JSON is checked against them as
+    it's read, rather than being decoded in full first.
+
+    Each is a `NestedQueryDict`, so code expecting Django's `QueryDict` or
+    `MultiValueDict` (`getlist()`, `urlencode()` etc.) keeps working, without
+    holding on to the flat version as well; except for getting items, which
+    gives the nested values rather than the last string for a flat key.
+
+    Under ASGI, bodies larger than `offload_threshold` bytes are parsed in
+    `executor` (the event loop's default thread pool unless set), so that one
+    huge form doesn't hold up every other request on the event loop; smaller
+    ones are parsed inline as usual. Either way, everything is parsed by the
+    time the view is called. With a `ProcessPoolExecutor`, multipart bodies
+    can't be sent to it, as they're read from the request itself; those are
+    parsed in the default thread pool instead.
+
+    Values are coerced as `query.loads` does by default; setting `coerce` to
+    a `coercion.Coercers` registry coerces them to its types too, or False
+    leaves them all as strings. Setting `profiler` to a
+    `profiling.KeyShapeProfiler` samples the shapes of the keys in every
+    `request.GET` and `request.POST`.
+
+    The limits are for the request as a whole, rather than for each of
+    `request.GET`, `request.POST` and `request.FILES`: everything is parsed
+    against a single `query.ParseBudget` from `get_budget`, which is left on
+    the request as `request.parse_budget`, for anything else parsed while
+    handling it to share.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    offload_threshold: ClassVar[int] = 256 * 1024
+    executor: ClassVar[Optional[Executor]] = None
+    coerce: ClassVar[Union[bool, "Coercers"]] = True
+    profiler: ClassVar[Optional["KeyShapeProfiler"]] = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await self.aprocess_request(request)
+        return await self.get_response(request)
+
+    @classmethod
+    async def aprocess_request(cls, request):
+        """
+        The asynchronous version of `process_request`, which hands the parsing
+        of POST bodies over `offload_threshold` bytes to `executor`.
+        """
+        if (
+            request.method != "POST"
+            or _content_length(request) <= cls.offload_threshold
+        ):
+            cls.process_request(request)
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = cls.executor
+        if not isinstance(executor, ProcessPoolExecutor):
+            await loop.run_in_executor(executor, cls.process_request, request)
+            return
+        content_type = request.META.get("CONTENT_TYPE", "")
+        if (
+            request.content_type == "multipart/form-data"
+            or parsers.get_parser(content_type) is None
+        ):
+            await loop.run_in_executor(None, cls.process_request, request)
+            return
+
+        encoding, max_num_fields = _limits(request)
+        budget = request.parse_budget = cls.get_budget(request)
+        cls._process_get(request, encoding, max_num_fields, budget)
+        post, request.parse_budget = await loop.run_in_executor(
+            executor,
+            partial(
+                _parse_charging,
+                _body_stream(request),
+                content_type,
+                encoding=encoding,
+                coerce=cls.coerce,
+                max_num_fields=max_num_fields,
+                budget=budget,
+            ),
+        )
+        if cls.profiler is not None:
+            cls.profiler.observe(post)
+        request._post = NestedQueryDict(post, encoding=encoding, coerced=cls.coerce)
+
+    @classmethod
+    def get_budget(cls, request) -> query.ParseBudget:
+        """
+        Make the budget for everything parsed for `request`, which by default
+        allows `DATA_UPLOAD_MAX_NUMBER_FIELDS` fields and
+        `DATA_UPLOAD_MAX_NUMBER_FILES` files, and any number of bytes (as
+        Django limits the size of bodies itself).
+        """
+        _, max_num_fields = _limits(request)
+        return query.ParseBudget(
+            max_num_fields,
+            max_files=getattr(settings, "DATA_UPLOAD_MAX_NUMBER_FILES", None),
+        )
+
+    @classmethod
+    def process_request(cls, request):
+        encoding, max_num_fields = _limits(request)
+        budget = request.parse_budget = cls.get_budget(request)
+        cls._process_get(request, encoding, max_num_fields, budget)
+        if request.method == "POST":
+            cls._process_post(request, encoding, max_num_fields, budget)
+
+    @classmethod
+    def _process_get(cls, request, encoding, max_num_fields, budget):
+        request.GET = NestedQueryDict(
+            query.loads(
+                request.META.get("QUERY_STRING", ""),
+                encoding=encoding,
+                coerce=cls.coerce,
+                max_num_fields=max_num_fields,
+                profiler=cls.profiler,
+                budget=budget,
+            ),
+            encoding=encoding,
+            coerced=cls.coerce,
+        )
+
+    @classmethod
+    def _process_post(cls, request, encoding, max_num_fields, budget):
+        if request.content_type == "multipart/form-data":
+            # As with parsers.parse_multipart, the body is only checked
+            # against the budget, while the fields and files are charged.
+            max_input_bytes = budget.limit_bytes(None)
+            if max_input_bytes is not None and max_input_bytes < _content_length(request):
+                raise exceptions.DataTooLarge(_content_length(request), max_input_bytes)
+            # Accessing either of these runs Django's multipart parser, which
+            # sets both .POST and .FILES from the same pass. The flat versions
+            # are dropped as soon as the nested ones replace them. Unlike
+            # parsers.parse_multipart, the files are kept apart, as Django's are.
+            post, files = request.POST, request.FILES
+            budget.charge(files=sum(len(uploads) for name, uploads in files.lists()))
+            request._post = NestedQueryDict(
+                query.load(
+                    post.lists(),
+                    encoding=encoding,
+                    coerce=cls.coerce,
+                    max_num_fields=max_num_fields,
+                    profiler=cls.profiler,
+                    budget=budget,
+                ),
+                encoding=encoding,
+                coerced=cls.coerce,
+            )
+            # Like Django's, the files may be changed by whatever's handling
+            # the request, and are never coerced.
+            request._files = NestedQueryDict(
+                query.load(
+                    files.lists(),
+                    encoding=encoding,
+                    coerce=False,
+                    max_num_fields=max_num_fields,
+                    budget=budget,
+                ),
+                mutable=True,
+                encoding=encoding,
+                coerced=False,
+            )
+            return
+
+        content_type = request.META.get("CONTENT_TYPE", "")
+        parser = parsers.get_parser(content_type)
+        if parser is not None:
+            post = parser(
+                _body_stream(request),
+                content_type,
+                encoding=encoding,
+                coerce=cls.coerce,
+                max_num_fields=max_num_fields,
+                budget=budget,
+            )
+            if cls.profiler is not None:
+                cls.profiler.observe(post)
+            request._post = NestedQueryDict(post, encoding=encoding, coerced=cls.coerce)
+
+
+def _parse_charging(body, content_type, *, budget, **kwargs):
+    # Run in another process, where the budget charged is a copy of the
+    # request's, so it has to be sent back along with the result.
+    return parsers.parse(body, content_type, budget=budget, **kwargs), budget
+
+
+def _body_stream(request):
+    # Rather than the request itself, so that the body can still be read
+    # (as request.body) by whatever's handling it.
+    return BytesIO(request.body)
+
+
+def _limits(request):
+    encoding = request.encoding or settings.DEFAULT_CHARSET
+    max_num_fields = settings.DATA_UPLOAD_MAX_NUMBER_FIELDS
+    # Django allows the limit to be disabled entirely.
+    if max_num_fields is None:
+        max_num_fields = float("inf")
+    return encoding, max_num_fields
+
+
+def _content_length(request) -> int:
+    try:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return 0